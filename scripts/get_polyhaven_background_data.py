@@ -20,7 +20,7 @@ data = response.json()
 # Step 2: Iterate over the keys (IDs) of the JSON object
 for id, asset_data in data.items():
     # Check if the ID is already in the JSON file
-    if id in hdri_data:
+    if id in hdri_data and "urls" in hdri_data[id]:
         print(f"Skipping ID: {id} (already exists in the JSON file)")
         continue
 
@@ -29,8 +29,14 @@ for id, asset_data in data.items():
     file_response = requests.get(file_url)
     file_data = file_response.json()
 
-    # Step 4: Extract the URL associated with the HDR file inside the 8k hdri key'd value
+    # Step 4: Extract the URL associated with the HDR file inside the 8k hdri key'd value,
+    # and the URLs of the smaller resolutions so renders can download only what they need
     hdr_url = file_data["hdri"]["8k"]["hdr"]["url"]
+    hdr_urls = {
+        resolution: file_data["hdri"][resolution]["hdr"]["url"]
+        for resolution in ["1k", "2k", "4k", "8k"]
+        if resolution in file_data["hdri"]
+    }
 
     # Step 5: Extract the name, categories, and tags from the asset data
     name = asset_data["name"]
@@ -40,6 +46,7 @@ for id, asset_data in data.items():
     # Step 6: Add the ID, URL, name, categories, and tags to the dictionary
     hdri_data[id] = {
         "url": hdr_url,
+        "urls": hdr_urls,
         "name": name,
         "categories": categories,
         "tags": tags,
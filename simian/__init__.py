@@ -1,11 +1,26 @@
+from .animation import *
+from .asset_cache import *
 from .background import *
 from .batch import *
 from .camera import *
+from .caption_store import *
+from .captions import *
 from .distributed import *
 from .combiner import *
+from .fetch import *
+from .geometry import *
+from .journal import *
+from .layout import *
 from .object import *
+from .object_cache import *
+from .object_index import *
 from .postprocessing import *
+from .prefetch import *
+from .preprocess import *
 from .render import *
+from .render_server import *
+from .sampling import *
 from .scene import *
+from .store import *
 from .transform import *
 from .worker import *
@@ -0,0 +1,86 @@
+from typing import Sequence
+
+import bpy
+import numpy as np
+
+
+def get_action(datablock: bpy.types.ID) -> bpy.types.Action:
+    """
+    Returns the action animating a data-block, creating and assigning one if needed.
+
+    Args:
+        datablock (bpy.types.ID): The object, camera or other data-block.
+
+    Returns:
+        bpy.types.Action: The action of the data-block.
+    """
+    animation_data = datablock.animation_data or datablock.animation_data_create()
+    if animation_data.action is None:
+        animation_data.action = bpy.data.actions.new(f"{datablock.name}Action")
+    return animation_data.action
+
+
+def ensure_fcurve(datablock: bpy.types.ID, data_path: str, index: int = 0) -> bpy.types.FCurve:
+    """
+    Returns the F-Curve animating a property of a data-block, creating it if needed.
+
+    Args:
+        datablock (bpy.types.ID): The data-block.
+        data_path (str): Path of the property, such as "location".
+        index (int): Index of the component of a vector property.
+
+    Returns:
+        bpy.types.FCurve: The F-Curve.
+    """
+    action = get_action(datablock)
+    # Blender 4.4 moved F-Curves into the slots of layered actions, and Blender 5 dropped
+    # Action.fcurves
+    if hasattr(action, "fcurve_ensure_for_datablock"):
+        return action.fcurve_ensure_for_datablock(datablock, data_path, index=index)
+    return action.fcurves.find(data_path, index=index) or action.fcurves.new(
+        data_path, index=index
+    )
+
+
+def set_keyframes(
+    datablock: bpy.types.ID,
+    data_path: str,
+    frames: Sequence[float],
+    values: Sequence,
+    interpolation: str = "BEZIER",
+) -> None:
+    """
+    Keyframes a property at many frames at once.
+
+    The keyframes of each component are written into its F-Curve with one `foreach_set`,
+    instead of one `keyframe_insert` per frame, so the cost barely grows with the number
+    of frames. Keys the F-Curves already had are replaced.
+
+    Args:
+        datablock (bpy.types.ID): The data-block.
+        data_path (str): Path of the property, such as "location".
+        frames (Sequence[float]): The frames to key, of length n.
+        values (Sequence): The value at each frame, of shape (n,) for a single value or
+            (n, components) for a vector property.
+        interpolation (str): Interpolation between the keys, such as "BEZIER" like
+            `keyframe_insert`, or "LINEAR".
+
+    Returns:
+        None
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float32).reshape(len(frames), -1)
+
+    for index in range(values.shape[1]):
+        fcurve = ensure_fcurve(datablock, data_path, index)
+        points = fcurve.keyframe_points
+        while len(points):
+            points.remove(points[-1], fast=True)
+
+        points.add(len(frames))
+        points.foreach_set("co", np.column_stack((frames, values[:, index])).ravel())
+        if interpolation != "BEZIER":
+            for point in points:
+                point.interpolation = interpolation
+        # sorts the keys and computes their handles
+        fcurve.update()
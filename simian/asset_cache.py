@@ -0,0 +1,581 @@
+import argparse
+import contextlib
+import hashlib
+import logging
+import os
+import posixpath
+import sqlite3
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Callable, Dict, Iterator, List, Optional
+
+from .fetch import MAX_CONNECTIONS, download_file
+from .vendor import objaverse
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the cache falls back to unlocked downloads
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# the renders read their cache settings from the environment, so batch runs can hand
+# them to every render process
+CACHE_DIR_ENV = "SIMIAN_CACHE_DIR"
+CACHE_SIZE_ENV = "SIMIAN_CACHE_SIZE"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "simian")
+
+_INDEX_FILE = "index.sqlite"
+_CHUNK_SIZE = 1 << 20
+STAT_NAMES = ["hits", "misses", "bytes_downloaded", "evictions", "bytes_evicted"]
+
+
+def get_file_hash(path: str) -> str:
+    """
+    Hashes the contents of a file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: The SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_current(lock_file: IO, path: str) -> bool:
+    # a lock file removed by another process after it was opened here no longer guards
+    # its path
+    try:
+        return os.path.samestat(os.fstat(lock_file.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+def _open_locked(path: str, operation: int) -> IO:
+    # locks a lock file, opening it again if it was removed while waiting for the lock
+    while True:
+        lock_file = open(path, "a")
+        try:
+            fcntl.flock(lock_file, operation)
+        except BlockingIOError:
+            lock_file.close()
+            raise
+        if _is_current(lock_file, path):
+            return lock_file
+        lock_file.close()
+
+
+def _remove_lock_file(path: str) -> bool:
+    # only removed while no process holds it, processes locking it check it wasn't
+    # removed in the meantime
+    try:
+        lock_file = open(path, "rb")
+    except FileNotFoundError:
+        return False
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        if not _is_current(lock_file, path):
+            return False
+        os.remove(path)
+    return True
+
+
+class AssetCache:
+    """
+    Disk cache of the downloaded objects, background HDRs and stage textures.
+
+    Files are stored under `root/<kind>/` by a hash of their URL, so the same asset is
+    downloaded once whichever process or working directory asks for it, and two assets
+    never share a path. The cache is addressed by URL, not by content: the same file
+    served from two URLs is stored twice. A SQLite index in the root records the size and last access of
+    every file. When the files go over `max_bytes`, the least recently used ones are
+    deleted.
+
+    The cache is safe to share between processes: an asset is downloaded under a lock
+    file, so concurrent requests for it wait for one download instead of each starting
+    their own, and files are renamed into place once complete. Hits, misses, downloaded
+    and evicted bytes are counted in the index across every process using the cache.
+
+    Fetched files are pinned with a shared lock on their pin file until `release` is
+    called, and eviction skips pinned files, so a render never loses an asset it fetched
+    but hasn't loaded yet to another process going over the budget. The locks are
+    dropped by the system when a process dies.
+
+    Args:
+        root (Optional[str]): Directory of the cache. Defaults to $SIMIAN_CACHE_DIR, or
+            ~/.cache/simian.
+        max_bytes (Optional[int]): Size budget of the cached files. Defaults to
+            $SIMIAN_CACHE_SIZE; unlimited if neither is set.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+        self.root = root or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+        if max_bytes is None and os.environ.get(CACHE_SIZE_ENV):
+            max_bytes = int(os.environ[CACHE_SIZE_ENV])
+        self.max_bytes = max_bytes
+
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # open pin file and fetch count of each pinned path
+        self._pins = {}
+        self._pins_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections can't be shared with forked processes, each opens its own
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            connection = sqlite3.connect(
+                os.path.join(self.root, _INDEX_FILE),
+                timeout=60,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "path TEXT PRIMARY KEY, url TEXT NOT NULL, size INTEGER NOT NULL, "
+                "last_access REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS digests ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                "digest TEXT NOT NULL)"
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _count(self, connection: sqlite3.Connection, **counts: int) -> None:
+        connection.executemany(
+            "INSERT INTO stats VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            counts.items(),
+        )
+
+    def get_path(self, url: str, kind: str) -> str:
+        """
+        Returns the path an asset is cached at.
+
+        Args:
+            url (str): URL of the asset.
+            kind (str): Kind of asset, the subdirectory of the cache it is stored in,
+                such as "objects", "backgrounds" or "textures".
+
+        Returns:
+            str: The path, keeping the extension of the URL so loaders can tell the format.
+        """
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        extension = posixpath.splitext(urllib.parse.urlparse(url).path)[1]
+        return os.path.join(self.root, kind, digest[:2], digest + extension)
+
+    def get_file_hash(self, path: str) -> str:
+        """
+        Hashes the contents of a file, remembering the digest in the index.
+
+        The digest is reused for as long as the file keeps its size and modification
+        time, so hashing a cached model again only costs a stat and a lookup.
+
+        Args:
+            path (str): Path to the file.
+
+        Returns:
+            str: The SHA-256 hex digest of the file.
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT digest FROM digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row is not None:
+            return row[0]
+
+        digest = get_file_hash(path)
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest),
+            )
+        return digest
+
+    @contextlib.contextmanager
+    def _locked(self, path: str) -> Iterator[None]:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with _open_locked(path + ".lock", fcntl.LOCK_EX):
+            yield
+
+    def _pin(self, path: str) -> None:
+        if fcntl is None:
+            return
+        with self._pins_lock:
+            if path in self._pins:
+                self._pins[path][1] += 1
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # pin files are separate from lock files, so a process can download an asset
+            # again while holding a pin on it
+            self._pins[path] = [_open_locked(path + ".pin", fcntl.LOCK_SH), 1]
+
+    def release(self, path: Optional[str] = None) -> None:
+        """
+        Releases a pinned asset, so it can be evicted again.
+
+        Args:
+            path (Optional[str]): Path returned by `fetch` or `lookup`, released once for
+                every time it was fetched. Releases every asset if None.
+
+        Returns:
+            None
+        """
+        with self._pins_lock:
+            paths = list(self._pins) if path is None else [path]
+            for pinned_path in paths:
+                pin = self._pins.get(pinned_path)
+                if pin is None:
+                    continue
+                pin[1] -= 1
+                if path is None or pin[1] <= 0:
+                    # closing the file drops the lock
+                    pin[0].close()
+                    del self._pins[pinned_path]
+
+    def _lock_unpinned(self, path: str) -> Optional[IO]:
+        # an exclusive lock is only granted while no process holds a pin on the file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            return _open_locked(path + ".pin", fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+    def _hit(self, url: str, path: str) -> None:
+        relative_path = os.path.relpath(path, self.root)
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            updated = connection.execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE path = ?",
+                (time.time(), relative_path),
+            ).rowcount
+            if not updated:
+                # a file left by a process that died before recording it
+                connection.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, 1)",
+                    (relative_path, url, os.path.getsize(path), time.time()),
+                )
+            self._count(connection, hits=1)
+            connection.execute("COMMIT")
+
+    def lookup(self, url: str, kind: str) -> Optional[str]:
+        """
+        Finds a cached asset without downloading it. A found asset is pinned until it is
+        released.
+
+        Args:
+            url (str): URL of the asset.
+            kind (str): Kind of asset.
+
+        Returns:
+            Optional[str]: Path of the cached file, None if it isn't cached.
+        """
+        path = self.get_path(url, kind)
+        if not os.path.exists(path):
+            return None
+        self._pin(path)
+        if not os.path.exists(path):
+            # evicted just before it was pinned
+            self.release(path)
+            return None
+        self._hit(url, path)
+        return path
+
+    def fetch(
+        self,
+        url: str,
+        kind: str,
+        download: Optional[Callable[[str, str, Optional[Callable[[int], None]]], object]] = None,
+        throttle: Optional[Callable[[int], None]] = None,
+    ) -> str:
+        """
+        Returns the path of a cached asset, downloading it first on a miss. The asset is
+        pinned until it is released.
+
+        Args:
+            url (str): URL of the asset.
+            kind (str): Kind of asset, such as "objects", "backgrounds" or "textures".
+            download (Optional[Callable]): Called with the URL, the path and the throttle
+                to download the asset to its path, atomically. Defaults to download_file.
+            throttle (Optional[Callable[[int], None]]): Called with the size of every
+                downloaded chunk, to limit the bandwidth.
+
+        Returns:
+            str: Path of the cached file.
+        """
+        path = self.get_path(url, kind)
+        # pinned before looking for the file, so it can't be evicted from here on
+        self._pin(path)
+        if os.path.exists(path):
+            self._hit(url, path)
+            return path
+
+        with self._locked(path):
+            # another process may have downloaded it while this one waited for the lock
+            if os.path.exists(path):
+                self._hit(url, path)
+                return path
+
+            logger.info(f"Downloading {url} to {path}")
+            try:
+                (download or download_file)(url, path, throttle)
+            except Exception:
+                self.release(path)
+                raise
+            size = os.path.getsize(path)
+            with self._lock:
+                connection = self._connect()
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, 0)",
+                    (os.path.relpath(path, self.root), url, size, time.time()),
+                )
+                self._count(connection, misses=1, bytes_downloaded=size)
+                connection.execute("COMMIT")
+
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes, keep=path)
+        return path
+
+    def fetch_many(
+        self, urls: List[str], kind: str, max_workers: int = MAX_CONNECTIONS
+    ) -> Dict[str, str]:
+        """
+        Fetches several assets at the same time.
+
+        Args:
+            urls (List[str]): URLs of the assets.
+            kind (str): Kind of the assets.
+            max_workers (int): Maximum number of downloads running at the same time.
+
+        Returns:
+            Dict[str, str]: Path of the cached file of each URL.
+
+        Raises:
+            Exception: The error of the first URL that failed, once every download ended.
+        """
+        urls = list(dict.fromkeys(urls))
+        if len(urls) <= 1:
+            return {url: self.fetch(url, kind) for url in urls}
+
+        with ThreadPoolExecutor(min(max_workers, len(urls))) as executor:
+            futures = [executor.submit(self.fetch, url, kind) for url in urls]
+        return {url: future.result() for url, future in zip(urls, futures)}
+
+    def fetch_object(self, uid: str, throttle: Optional[Callable[[int], None]] = None) -> str:
+        """
+        Returns the path of a cached Objaverse object, downloading it first on a miss.
+
+        Args:
+            uid (str): The object uid.
+            throttle (Optional[Callable[[int], None]]): Called with the size of every
+                downloaded chunk, to limit the bandwidth.
+
+        Returns:
+            str: Path of the cached GLB file.
+
+        Raises:
+            KeyError: If the uid isn't in Objaverse.
+        """
+        url = objaverse.get_object_urls([uid])[uid]
+        return self.fetch(url, "objects", objaverse.download_file, throttle)
+
+    def size(self) -> int:
+        """
+        Returns the total size of the cached files.
+
+        Returns:
+            int: Size in bytes.
+        """
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self, max_bytes: int, keep: Optional[str] = None) -> int:
+        """
+        Deletes the least recently used files until the cache fits in a size budget.
+        Files pinned by a process are skipped.
+
+        Args:
+            max_bytes (int): Size budget in bytes.
+            keep (Optional[str]): Path of a file not to delete, such as the one just
+                fetched.
+
+        Returns:
+            int: Number of bytes freed.
+        """
+        keep = os.path.relpath(keep, self.root) if keep else ""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            excess = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - max_bytes
+            evicted = []
+            # pin files locked for deletion, held until the files are removed
+            locks = []
+            if excess > 0:
+                for path, size in connection.execute(
+                    "SELECT path, size FROM entries WHERE path != ? ORDER BY last_access", (keep,)
+                ).fetchall():
+                    if excess <= 0:
+                        break
+                    if fcntl is not None:
+                        lock = self._lock_unpinned(os.path.join(self.root, path))
+                        if lock is None:
+                            continue
+                        locks.append(lock)
+                    evicted.append((path, size))
+                    excess -= size
+                connection.executemany("DELETE FROM entries WHERE path = ?", [(path,) for path, _ in evicted])
+                connection.executemany(
+                    "DELETE FROM digests WHERE path = ?",
+                    [(os.path.realpath(os.path.join(self.root, path)),) for path, _ in evicted],
+                )
+                freed = sum(size for _, size in evicted)
+                self._count(connection, evictions=len(evicted), bytes_evicted=freed)
+            connection.execute("COMMIT")
+
+        # processes still reading a deleted file keep their open handle to it
+        for path, _ in evicted:
+            path = os.path.join(self.root, path)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            if fcntl is not None:
+                # removed under the exclusive lock, a process pinning the file meanwhile
+                # finds it gone
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path + ".pin")
+                _remove_lock_file(path + ".lock")
+        for lock in locks:
+            lock.close()
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} files from the asset cache")
+        return sum(size for _, size in evicted)
+
+    def remove_stale_lock_files(self) -> int:
+        """
+        Deletes the lock and pin files of assets that aren't cached, such as those left
+        by failed downloads or processes that died. Files held by a process are kept.
+
+        Returns:
+            int: Number of files deleted.
+        """
+        if fcntl is None:
+            return 0
+        with self._lock:
+            cached = {
+                os.path.join(self.root, path)
+                for path, in self._connect().execute("SELECT path FROM entries").fetchall()
+            }
+
+        removed = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path, extension = os.path.splitext(os.path.join(directory, name))
+                if extension not in (".lock", ".pin") or path in cached or os.path.exists(path):
+                    continue
+                removed += _remove_lock_file(path + extension)
+        if removed:
+            logger.info(f"Deleted {removed} stale lock files from the asset cache")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the statistics of the cache, counted across every process using it.
+
+        Returns:
+            Dict[str, int]: Hits, misses, bytes downloaded, evictions and bytes evicted,
+            with the number of files and bytes currently cached.
+        """
+        with self._lock:
+            connection = self._connect()
+            stats = dict.fromkeys(STAT_NAMES, 0)
+            stats.update(connection.execute("SELECT name, value FROM stats").fetchall())
+            stats["files"], stats["bytes"] = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return stats
+
+    def close(self) -> None:
+        """
+        Closes the cache index and releases every pinned asset.
+
+        Returns:
+            None
+        """
+        self.release()
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def __enter__(self) -> "AssetCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_asset_cache: Optional[AssetCache] = None
+
+
+def get_asset_cache() -> AssetCache:
+    """
+    Returns the asset cache of this process, configured from the environment.
+
+    Returns:
+        AssetCache: The cache in $SIMIAN_CACHE_DIR with a budget of $SIMIAN_CACHE_SIZE bytes.
+    """
+    global _asset_cache
+    if _asset_cache is None:
+        _asset_cache = AssetCache()
+    return _asset_cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the statistics of the asset cache or shrink it.")
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Directory of the asset cache. Defaults to $SIMIAN_CACHE_DIR or ~/.cache/simian.",
+    )
+    parser.add_argument(
+        "--evict",
+        type=float,
+        default=None,
+        help="Delete the least recently used assets until the cache fits in this many gigabytes, and the lock files of assets that aren't cached.",
+    )
+    args = parser.parse_args()
+
+    with AssetCache(args.cache_dir) as cache:
+        if args.evict is not None:
+            cache.evict(int(args.evict * 1e9))
+            cache.remove_stale_lock_files()
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
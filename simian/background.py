@@ -1,64 +1,159 @@
 import os
-from typing import Dict
-import requests
+from typing import Dict, Iterable, Optional
 import bpy
 import logging
 
+from .asset_cache import get_asset_cache
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
+# width in pixels of each equirectangular HDRI resolution recorded in the background data
+HDRI_RESOLUTIONS = {"1k": 1024, "2k": 2048, "4k": 4096, "8k": 8192}
+
+
+def get_narrowest_fov(combination: Dict) -> float:
+    """
+    Get the narrowest field of view of the camera over the animation.
+
+    Args:
+        combination (Dict): The combination dictionary containing the framing and animation.
+
+    Returns:
+        float: The field of view in degrees.
+    """
+    fov = combination["framing"]["fov"]
+    keyframes = combination.get("animation", {}).get("keyframes", [])
+    offsets = [
+        keyframe["Camera"]["angle_offset"]
+        for keyframe in keyframes
+        if "angle_offset" in keyframe.get("Camera", {})
+    ]
+    return fov + min(offsets) if offsets else fov
+
+
+def select_hdri_resolution(resolutions: Iterable[str], width: int, fov: float) -> str:
+    """
+    Select the smallest HDRI resolution that is sharp enough for the render.
+
+    The camera shows `fov` degrees of the 360 degree panorama across `width` pixels, so
+    the HDRI needs at least width * 360 / fov pixels across to give every rendered pixel
+    its own texel. If no resolution is that large, the largest one is used.
+
+    Args:
+        resolutions (Iterable[str]): Available resolutions, such as "1k" or "8k".
+        width (int): Width of the render in pixels.
+        fov (float): Horizontal field of view of the camera in degrees.
+
+    Returns:
+        str: The selected resolution.
+    """
+    available = sorted(
+        (resolution for resolution in resolutions if resolution in HDRI_RESOLUTIONS),
+        key=HDRI_RESOLUTIONS.get,
+    )
+    if not available:
+        raise ValueError(f"No known HDRI resolution in {list(resolutions)}")
+
+    needed = width * 360 / max(fov, 1e-6)
+    for resolution in available:
+        if HDRI_RESOLUTIONS[resolution] >= needed:
+            return resolution
+    return available[-1]
+
+
+def get_background_url(combination: Dict, width: Optional[int] = None) -> str:
+    """
+    Get the URL of the background HDR image at the resolution the render needs.
+
+    Args:
+        combination (Dict): The combination dictionary containing background information.
+        width (Optional[int]): Width of the render in pixels. If None, or if the background
+            only has one resolution, its default URL is used.
+
+    Returns:
+        str: The URL of the background HDR image.
+    """
+    background = combination["background"]
+    urls = background.get("urls")
+    if not urls or width is None or "framing" not in combination:
+        return background["url"]
+
+    resolution = select_hdri_resolution(urls, width, get_narrowest_fov(combination))
+    return urls[resolution]
+
 
-def get_hdri_path(hdri_path: str, combination: Dict) -> str:
+def get_hdri_path(hdri_path: str, combination: Dict, width: Optional[int] = None) -> str:
     """
     Get the local file path for the background HDR image.
 
+    HDR images saved under the base directory are used as they are, the others are
+    read from the asset cache at the resolution the render needs.
+
     Args:
         hdri_path (str): The base directory for storing background images.
         combination (Dict): The combination dictionary containing background
+        width (Optional[int]): Width of the render in pixels, to select the HDRI resolution.
     Returns:
         str: The local file path for the background HDR image.
     """
     background = combination["background"]
     background_id = background["id"]
     background_from = background["from"]
-    hdri_path = f"{hdri_path}/{background_from}/{background_id}.hdr"
+    local_path = f"{hdri_path}/{background_from}/{background_id}.hdr"
 
-    return hdri_path
+    if os.path.exists(local_path) or not background.get("url"):
+        return local_path
+    return get_asset_cache().get_path(get_background_url(combination, width), "backgrounds")
 
 
-def get_background(hdri_path: str, combination: Dict) -> None:
+def get_background(hdri_path: str, combination: Dict, width: Optional[int] = None) -> None:
     """
     Download the background HDR image if it doesn't exist locally.
 
     This function checks if the background HDR image specified in the combination dictionary
-    exists locally. If it doesn't exist, it downloads the image from the provided URL and
-    saves it to the local file path.
+    is saved under the base directory. If it isn't, it fetches the image from the provided
+    URL through the asset cache, at the smallest resolution that is sharp enough for the
+    render.
 
     Args:
         hdri_path (str): The base directory for storing background images.
         combination (Dict): The combination dictionary containing background information.
+        width (Optional[int]): Width of the render in pixels, to select the HDRI resolution.
 
     Returns:
         None
     """
-    hdri_path = get_hdri_path(hdri_path, combination)
-
     background = combination["background"]
-    background_url = background["url"]
+    local_path = f"{hdri_path}/{background['from']}/{background['id']}.hdr"
 
-    # make sure each folder in the path exists
-    os.makedirs(os.path.dirname(hdri_path), exist_ok=True)
+    if os.path.exists(local_path):
+        logger.info(f"Background {local_path} already exists")
+        return
 
-    if not os.path.exists(hdri_path):
-        logger.info(f"Downloading {background_url} to {hdri_path}")
-        response = requests.get(background_url)
-        with open(hdri_path, "wb") as file:
-            file.write(response.content)
-    else:
-        logger.info(f"Background {hdri_path} already exists")
+    get_asset_cache().fetch(get_background_url(combination, width), "backgrounds")
+
+
+def load_hdri_image(hdri_path: str, combination: Dict, width: Optional[int] = None) -> bpy.types.Image:
+    """
+    Load the background HDR image, reusing the image datablock if it is already loaded.
+
+    The world and the photosphere both show the background, and sharing one datablock
+    keeps a single decoded copy of the image in memory.
+
+    Args:
+        hdri_path (str): The base directory for storing background images.
+        combination (Dict): The combination dictionary containing background information.
+        width (Optional[int]): Width of the render in pixels, to select the HDRI resolution.
+
+    Returns:
+        bpy.types.Image: The background image.
+    """
+    get_background(hdri_path, combination, width)
+    return bpy.data.images.load(get_hdri_path(hdri_path, combination, width), check_existing=True)
 
 
-def set_background(hdri_path: str, combination: Dict) -> None:
+def set_background(hdri_path: str, combination: Dict, width: Optional[int] = None) -> None:
     """
     Set the background HDR image of the scene.
 
@@ -70,12 +165,11 @@ def set_background(hdri_path: str, combination: Dict) -> None:
     Args:
         hdri_path (str): The base directory for storing background images.
         combination (Dict): The combination dictionary containing background information.
+        width (Optional[int]): Width of the render in pixels, to select the HDRI resolution.
 
     Returns:
         None
     """
-    get_background(hdri_path, combination)
-    hdri_path = get_hdri_path(hdri_path, combination)
 
     # Check if the scene has a world, and create one if it doesn't
     if bpy.context.scene.world is None:
@@ -93,7 +187,7 @@ def set_background(hdri_path: str, combination: Dict) -> None:
     env_tex_node.location = (-300, 0)
 
     # Load the HDR image
-    env_tex_node.image = bpy.data.images.load(hdri_path)
+    env_tex_node.image = load_hdri_image(hdri_path, combination, width)
 
     # Create the Background node
     background_node = tree.nodes.new(type="ShaderNodeBackground")
@@ -112,11 +206,11 @@ def set_background(hdri_path: str, combination: Dict) -> None:
     # Enable the world background in the render settings
     bpy.context.scene.render.film_transparent = False
 
-    logger.info(f"Set background to {hdri_path}")
+    logger.info(f"Set background to {env_tex_node.image.filepath}")
 
 
 def create_photosphere(
-    hdri_path: str, combination: Dict, scale: float = 10
+    hdri_path: str, combination: Dict, scale: float = 10, width: Optional[int] = None
 ) -> bpy.types.Object:
     """
     Create a photosphere object in the scene.
@@ -129,6 +223,8 @@ def create_photosphere(
     Args:
         hdri_path (str): The base directory for storing background images.
         combination (Dict): The combination dictionary containing background information.
+        scale (float): Radius of the sphere.
+        width (Optional[int]): Width of the render in pixels, to select the HDRI resolution.
 
     Returns:
         bpy.types.Object: The created photosphere object.
@@ -148,12 +244,12 @@ def create_photosphere(
     sphere = bpy.context.object
     sphere.name = "Photosphere"
     sphere.data.name = "PhotosphereMesh"
-    create_photosphere_material(hdri_path, combination, sphere)
+    create_photosphere_material(hdri_path, combination, sphere, width)
     return sphere
 
 
 def create_photosphere_material(
-    hdri_path: str, combination: Dict, sphere: bpy.types.Object
+    hdri_path: str, combination: Dict, sphere: bpy.types.Object, width: Optional[int] = None
 ) -> None:
     """
     Create a material for the photosphere object using the environment texture as emission.
@@ -166,6 +262,7 @@ def create_photosphere_material(
         hdri_path (str): The base directory for storing background images.
         combination (Dict): The combination dictionary containing background information.
         sphere (bpy.types.Object): The photosphere object to assign the material to.
+        width (Optional[int]): Width of the render in pixels, to select the HDRI resolution.
 
     Returns:
         None
@@ -179,7 +276,7 @@ def create_photosphere_material(
     # Create and connect the nodes
     emission = nodes.new(type="ShaderNodeEmission")
     env_tex = nodes.new(type="ShaderNodeTexEnvironment")
-    env_tex.image = bpy.data.images.load(get_hdri_path(hdri_path, combination))
+    env_tex.image = load_hdri_image(hdri_path, combination, width)
     mat.node_tree.links.new(env_tex.outputs["Color"], emission.inputs["Color"])
     output = nodes.new(type="ShaderNodeOutputMaterial")
     mat.node_tree.links.new(emission.outputs["Emission"], output.inputs["Surface"])
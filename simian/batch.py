@@ -1,10 +1,133 @@
-import json
+import glob
 import multiprocessing
 import os
+import queue
 import subprocess
 import sys
+import threading
 import argparse
-from typing import Optional
+from typing import Callable, Dict, List, Optional
+
+from .asset_cache import CACHE_DIR_ENV, CACHE_SIZE_ENV, AssetCache
+from .journal import JobJournal
+from .prefetch import Prefetcher
+from .render_server import RenderServer
+from .store import open_combinations
+
+# render threads each render gets when the number of renders isn't given
+DEFAULT_RENDER_THREADS = 4
+
+
+def get_render_threads(processes: int, cpu_count: Optional[int] = None) -> int:
+    """
+    Splits the CPU cores between concurrent renders so they don't oversubscribe the machine.
+
+    Args:
+        processes (int): Number of renders running at the same time.
+        cpu_count (Optional[int]): Number of CPU cores. Defaults to the cores of this machine.
+
+    Returns:
+        int: Number of render threads each render may use, at least 1.
+    """
+    if cpu_count is None:
+        cpu_count = multiprocessing.cpu_count()
+    return max(1, cpu_count // max(1, processes))
+
+
+def get_default_processes(cpu_count: Optional[int] = None) -> int:
+    """
+    Returns how many renders to run at the same time when it isn't specified.
+
+    Each render gets DEFAULT_RENDER_THREADS cores, so the renders never use more cores,
+    or hold more Blender processes in memory, than the machine can run.
+
+    Args:
+        cpu_count (Optional[int]): Number of CPU cores. Defaults to the cores of this machine.
+
+    Returns:
+        int: Number of renders, at least 1.
+    """
+    if cpu_count is None:
+        cpu_count = multiprocessing.cpu_count()
+    return max(1, cpu_count // DEFAULT_RENDER_THREADS)
+
+
+def find_outputs(output_dir: str, index: int, images: bool = False) -> List[str]:
+    """
+    Finds the finished render files of a combination index.
+
+    Args:
+        output_dir (str): Directory the renders are written to.
+        index (int): The combination index.
+        images (bool): Look for an image render instead of a video.
+
+    Returns:
+        List[str]: Paths of the rendered files, empty if the render is incomplete.
+    """
+    if images:
+        pattern = os.path.join(output_dir, f"{index}_frame_*.png")
+        return sorted(path for path in glob.glob(pattern) if ".partial." not in path)
+
+    outputs = [
+        os.path.join(output_dir, f"{index}.mp4"),
+        os.path.join(output_dir, f"{index}.blend"),
+    ]
+    return outputs if all(os.path.exists(path) for path in outputs) else []
+
+
+def run_scheduler(
+    indices: List[int],
+    processes: int,
+    render_index: Callable[[int, Optional[RenderServer]], Optional[int]],
+    create_server: Optional[Callable[[], RenderServer]] = None,
+) -> Dict[int, Optional[int]]:
+    """
+    Keeps up to `processes` renders in flight until every index has been rendered.
+
+    Each worker thread pulls the next index from a shared queue, so a slow render
+    never holds back the others.
+
+    Args:
+        indices (List[int]): Combination indices to render.
+        processes (int): Number of renders to run at the same time.
+        render_index (Callable[[int, Optional[RenderServer]], Optional[int]]): Renders one
+            index and returns its exit status. It is given the worker's render server, or
+            None when every render runs in its own process.
+        create_server (Optional[Callable[[], RenderServer]]): Creates one render server per
+            worker. If None, no servers are used.
+
+    Returns:
+        Dict[int, Optional[int]]: Exit status of each index, None if it timed out.
+    """
+    index_queue = queue.Queue()
+    for index in indices:
+        index_queue.put(index)
+
+    statuses = {}
+
+    def worker() -> None:
+        render_server = create_server() if create_server is not None else None
+        try:
+            while True:
+                try:
+                    index = index_queue.get_nowait()
+                except queue.Empty:
+                    return
+                statuses[index] = render_index(index, render_server)
+        finally:
+            if render_server is not None:
+                render_server.close()
+
+    workers = [
+        threading.Thread(target=worker) for _ in range(min(processes, len(indices)))
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return statuses
+
 
 def render_objects(
     processes: Optional[int] = None,
@@ -18,7 +141,14 @@ def render_objects(
     images: bool = False,
     animation_length: int = 120,
     blend_file: Optional[str] = None,
-) -> None:
+    server: bool = False,
+    max_attempts: int = 3,
+    combination_file: Optional[str] = None,
+    prefetch: int = 8,
+    max_bandwidth: Optional[float] = None,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = None,
+) -> Dict[int, Optional[int]]:
     """
     Automates the rendering of objects using Blender based on predefined combinations.
 
@@ -26,9 +156,20 @@ def render_objects(
     from the combinations DataFrame. It allows for configuration of rendering dimensions,
     use of specific GPU devices, and selection of frames for animation sequences.
 
+    Up to `processes` renders run at the same time, and the CPU cores are split between
+    them through Blender's render thread count.
+
+    Progress is recorded in a job journal in the renders directory. Running the same
+    batch again skips the combinations that are already rendered and retries the failed
+    ones until they have used up `max_attempts`.
+
+    While the renders run, the objects, background HDRs and stage textures of the next
+    `prefetch` combinations are downloaded in the background. Every download goes
+    through the asset cache shared by the renders, which is kept under `cache_size`.
+
     Args:
-        processes (Optional[int]): Number of processes to use for multiprocessing.
-        Defaults to three times the number of CPU cores.
+        processes (Optional[int]): Number of renders to run at the same time.
+        Defaults to one per DEFAULT_RENDER_THREADS CPU cores.
         render_timeout (int): Maximum time in seconds for a single rendering process.
         width (int): Width of the rendering in pixels.
         height (int): Height of the rendering in pixels.
@@ -39,17 +180,32 @@ def render_objects(
         images (bool): Generate images instead of videos.
         animation_length (int): End frame of the animation.
         blend_file (Optional[str]): Path to the user-specified Blender file to use as the base scene.
+        server (bool): Give each concurrent render slot one long-lived render server instead
+            of starting a new Blender process for every combination.
+        max_attempts (int): Number of times a combination is tried before it is given up on,
+            counting the attempts of previous runs.
+        combination_file (Optional[str]): Path to the combination store or combinations JSON
+            file. Defaults to combinations.json in the repository root. A JSON file is converted
+            to a combination store once, before rendering starts.
+        prefetch (int): Number of combinations whose assets are downloaded ahead of the
+            renders. 0 disables prefetching.
+        max_bandwidth (Optional[float]): Cap of the prefetch download rate in bytes per
+            second. Unlimited if None.
+        cache_dir (Optional[str]): Directory of the asset cache. Defaults to
+            $SIMIAN_CACHE_DIR or ~/.cache/simian.
+        cache_size (Optional[int]): Size budget of the asset cache in bytes. Defaults to
+            $SIMIAN_CACHE_SIZE; unlimited if neither is set.
 
     Raises:
         NotImplementedError: If the operating system is not supported.
         FileNotFoundError: If Blender is not found at the specified path.
 
     Returns:
-        None
+        Dict[int, Optional[int]]: Exit status of the last attempt at each combination index
+        rendered in this run, 0 on success and None if the render timed out.
     """
-    # Set the number of processes to three times the number of CPU cores if not specified.
     if processes is None:
-        processes = multiprocessing.cpu_count() * 3
+        processes = get_default_processes()
 
     scripts_dir = os.path.dirname(os.path.realpath(__file__))
     target_directory = os.path.join(scripts_dir, "../", "renders")
@@ -58,28 +214,123 @@ def render_objects(
     # make sure renders directory exists
     os.makedirs(target_directory, exist_ok=True)
 
-    if end_index == -1:
+    if combination_file is None:
+        combination_file = os.path.join(scripts_dir, "../", "combinations.json")
 
-        # get the length of combinations.json
-        with open(os.path.join(scripts_dir, "../", "combinations.json"), "r") as file:
-            data = json.load(file)
-            combinations_data = data["combinations"]
-            num_combinations = len(combinations_data)
+    # index the combinations once so every render reads only its own combination
+    with open_combinations(combination_file) as store:
+        combination_file = store.path
+        num_combinations = len(store)
 
+    if end_index == -1:
         end_index = num_combinations
 
-    # Loop over each combination index to set up and run the rendering process.
-    for i in range(start_index, end_index):
-        if images:
-            args = f"--width {width} --height {height} --combination_index {i} --start_frame {start_frame} --end_frame {end_frame} --output_dir {target_directory} --hdri_path {hdri_path} --animation_length {animation_length} --images"
+    indices = list(range(start_index, end_index))
+
+    journal = JobJournal(target_directory)
+    journal.add(indices)
+    remaining = journal.remaining(indices, max_attempts)
+    skipped = len(indices) - len(remaining)
+    if skipped:
+        print(f"Skipping {skipped} combinations that are already rendered or out of attempts")
+
+    processes = max(1, min(processes, len(remaining)))
+    threads = get_render_threads(processes)
+
+    render_args = [
+        "--width", str(width),
+        "--height", str(height),
+        "--start_frame", str(start_frame),
+        "--end_frame", str(end_frame),
+        "--output_dir", target_directory,
+        "--hdri_path", hdri_path,
+        "--animation_length", str(animation_length),
+        "--threads", str(threads),
+        "--combination_file", combination_file,
+    ]
+    if images:
+        render_args.append("--images")
+    if blend_file:
+        render_args += ["--blend", blend_file]
+
+    cache = AssetCache(cache_dir, cache_size)
+
+    # keep libraries that spawn their own thread pools inside each render's share,
+    # and point every render at the same asset cache
+    env = {**os.environ, "OMP_NUM_THREADS": str(threads), CACHE_DIR_ENV: cache.root}
+    if cache.max_bytes is not None:
+        env[CACHE_SIZE_ENV] = str(cache.max_bytes)
+
+    print(
+        f"Rendering {len(remaining)} combinations with {processes} concurrent renders "
+        f"of {threads} threads each"
+    )
+
+    prefetcher = None
+
+    def render_index(index: int, render_server: Optional[RenderServer]) -> Optional[int]:
+        journal.start(index)
+        if prefetcher is not None:
+            prefetcher.mark_started()
+
+        if render_server is not None:
+            result = render_server.render({"combination_index": index}, timeout=render_timeout)
+            if result["status"] == "done":
+                journal.finish(index, result["outputs"])
+                return 0
+            print(f"Rendering combination {index} failed: {result['error']}")
+            journal.fail(index, result["error"])
+            return None if result["status"] == "timeout" else 1
+
+        command = [sys.executable, "-m", "simian.render", "--"]
+        command += render_args + ["--combination_index", str(index)]
+        try:
+            completed = subprocess.run(command, timeout=render_timeout, env=env, check=False)
+        except subprocess.TimeoutExpired:
+            print(f"Rendering combination {index} timed out after {render_timeout}s")
+            journal.fail(index, f"Timed out after {render_timeout}s")
+            return None
+
+        outputs = find_outputs(target_directory, index, images)
+        if completed.returncode == 0 and outputs:
+            journal.finish(index, outputs)
         else:
-            args = f"--width {width} --height {height} --combination_index {i} --start_frame {start_frame} --end_frame {end_frame} --output_dir {target_directory} --hdri_path {hdri_path} --animation_length {animation_length}"
+            print(f"Rendering combination {index} failed with exit code {completed.returncode}")
+            journal.fail(index, f"Exited with code {completed.returncode}")
+        return completed.returncode
 
-        if blend_file:
-            args += f" --blend {blend_file}"
+    create_server = (lambda: RenderServer(render_args, env=env)) if server else None
 
-        command = f"{sys.executable} -m simian.render -- {args}"
-        subprocess.run(["bash", "-c", command], timeout=render_timeout, check=False)
+    # every pass uses up one attempt of each remaining index
+    statuses = {}
+    while remaining:
+        if prefetch > 0:
+            store = open_combinations(combination_file)
+            prefetcher = Prefetcher(store, remaining, prefetch, max_bandwidth, hdri_path, cache)
+        try:
+            statuses.update(run_scheduler(remaining, processes, render_index, create_server))
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+                store.close()
+                prefetcher = None
+        remaining = journal.remaining(remaining, max_attempts)
+    journal.close()
+
+    failed = [index for index in indices if not journal.is_done(index)]
+    print(f"Rendered {len(indices) - len(failed)}/{len(indices)} combinations")
+    if failed:
+        print(f"Failed combinations: {failed}")
+
+    stats = cache.stats()
+    print(
+        f"Asset cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['bytes_downloaded']} bytes downloaded, {stats['bytes_evicted']} bytes evicted, "
+        f"{stats['bytes']} bytes in {stats['files']} files"
+    )
+    cache.close()
+
+    return statuses
 
 
 def main():
@@ -90,7 +341,7 @@ def main():
         "--processes",
         type=int,
         default=None,
-        help="Number of processes to use for multiprocessing. Defaults to three times the number of CPU cores.",
+        help="Number of renders to run at the same time. Defaults to one per 4 CPU cores.",
     )
     parser.add_argument(
         "--render_timeout",
@@ -153,6 +404,47 @@ def main():
         help="Path to the user-specified Blender file to use as the base scene.",
         required=False,
     )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Keep one Blender process loaded per concurrent render and stream combinations to it instead of starting one per combination.",
+    )
+    parser.add_argument(
+        "--combination_file",
+        type=str,
+        default=None,
+        help="Path to the combination store or combinations JSON file. Defaults to combinations.json in the repository root.",
+    )
+    parser.add_argument(
+        "--max_attempts",
+        type=int,
+        default=3,
+        help="Number of times a combination is tried before it is given up on, across runs. Defaults to 3.",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=8,
+        help="Number of combinations whose assets are downloaded ahead of the renders. 0 disables prefetching. Defaults to 8.",
+    )
+    parser.add_argument(
+        "--max_bandwidth",
+        type=float,
+        default=None,
+        help="Cap of the prefetch download rate in megabytes per second. Unlimited by default.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Directory of the asset cache. Defaults to $SIMIAN_CACHE_DIR or ~/.cache/simian.",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=float,
+        default=None,
+        help="Size budget of the asset cache in gigabytes. Least recently used assets are deleted beyond it. Unlimited by default.",
+    )
 
     args = parser.parse_args()
 
@@ -168,6 +460,13 @@ def main():
         end_frame=args.end_frame,
         images=args.images,
         blend_file=args.blend,
+        server=args.server,
+        max_attempts=args.max_attempts,
+        combination_file=args.combination_file,
+        prefetch=args.prefetch,
+        max_bandwidth=args.max_bandwidth * 1e6 if args.max_bandwidth else None,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size * 1e9) if args.cache_size else None,
     )
 
 
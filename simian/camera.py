@@ -7,6 +7,9 @@ from mathutils import Vector
 import numpy as np
 from scipy.spatial.transform import Rotation as R
 
+from .animation import set_keyframes
+from .geometry import get_world_bbox_corners
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -14,7 +17,7 @@ logger = logging.getLogger(__name__)
 def rotate_points(points, angles):
     """Rotate points by given angles in degrees for (x, y, z) rotations."""
     rotation = R.from_euler("xyz", angles, degrees=True)
-    return np.array([rotation.apply(point) for point in points])
+    return rotation.apply(np.asarray(points, dtype=np.float64).reshape(-1, 3))
 
 
 def compute_camera_distance(points, fov_deg):
@@ -209,6 +212,8 @@ def set_camera_animation(combination: dict, animation_length: int) -> None:
     keyframes = animation["keyframes"]
     frame_interval = animation_length
 
+    # frames and values of each animated property, keyed all at once afterwards
+    tracks = {}
     for i, keyframe in enumerate(keyframes):
         for obj_name, transforms in keyframe.items():
             obj = bpy.data.objects.get(obj_name)
@@ -217,22 +222,30 @@ def set_camera_animation(combination: dict, animation_length: int) -> None:
             frame = int(i * frame_interval)
             for transform_name, value in transforms.items():
                 if transform_name == "position":
-                    obj.location = [coord * speed_factor for coord in value]
-                    obj.keyframe_insert(data_path="location", frame=frame)
+                    track = (obj, "location")
+                    value = [coord * speed_factor for coord in value]
                 elif transform_name == "rotation":
-                    obj.rotation_euler = [
-                        math.radians(angle * speed_factor) for angle in value
-                    ]
-                    obj.keyframe_insert(data_path="rotation_euler", frame=frame)
+                    track = (obj, "rotation_euler")
+                    value = [math.radians(angle * speed_factor) for angle in value]
                 elif transform_name == "scale":
-                    obj.scale = [coord * speed_factor for coord in value]
-                    obj.keyframe_insert(data_path="scale", frame=frame)
+                    track = (obj, "scale")
+                    value = [coord * speed_factor for coord in value]
                 elif transform_name == "angle_offset" and obj_name == "Camera":
                     camera_data = bpy.data.objects["Camera"].data
+                    # the lens is keyed, converted from the angle by the sensor fit
                     camera_data.angle = math.radians(
                         combination["framing"]["fov"] + value
                     )
-                    camera_data.keyframe_insert(data_path="lens", frame=frame)
+                    track = (camera_data, "lens")
+                    value = camera_data.lens
+                else:
+                    continue
+                frames, values = tracks.setdefault(track, ([], []))
+                frames.append(frame)
+                values.append(value)
+
+    for (datablock, data_path), (frames, values) in tracks.items():
+        set_keyframes(datablock, data_path, frames, values)
 
     bpy.context.scene.frame_set(0)
 
@@ -252,10 +265,7 @@ def position_camera(combination: dict, focus_object: bpy.types.Object) -> None:
     # Get the bounding box of the focus object in world space
     bpy.context.view_layer.update()
     
-    bbox = [
-        focus_object.matrix_world @ Vector(corner) for corner in focus_object.bound_box
-    ]
-    bbox_points = np.array([corner.to_tuple() for corner in bbox])
+    bbox_points = get_world_bbox_corners(focus_object)
 
     # Rotate points as per the desired view angle if any
     # Assuming we want to compute this based on some predefined rotation angles
@@ -284,14 +294,8 @@ def position_camera(combination: dict, focus_object: bpy.types.Object) -> None:
     else:
         camera.data.sensor_fit = "VERTICAL"
 
-    bbox = [
-        focus_object.matrix_world @ Vector(corner) for corner in focus_object.bound_box
-    ]
-    bbox_min = min(bbox, key=lambda v: v.z)
-    bbox_max = max(bbox, key=lambda v: v.z)
-
     # Calculate the height of the bounding box
-    bbox_height = bbox_max.z - bbox_min.z
+    bbox_height = float(np.ptp(bbox_points[:, 2]))
 
     # Position the camera based on the computed distance
     camera.location = Vector((camera_distance, 0, 0))  # Adjust this as needed
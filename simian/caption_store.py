@@ -0,0 +1,299 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+CAPTION_STORE_EXTENSION = ".captions"
+
+# magic, number of uids, uid width in bytes, size of the caption text in bytes
+CAPTION_STORE_MAGIC = b"SIMCAP01"
+_HEADER = struct.Struct("<8sQQQ")
+
+# offsets and positions are stored as little-endian uint64 so the store is portable
+OFFSET_DTYPE = np.dtype("<u8")
+
+
+def get_caption_store_path(json_path: str) -> str:
+    """
+    Returns the path of the caption store built from a captions JSON file.
+
+    Args:
+        json_path (str): Path to the captions JSON file.
+
+    Returns:
+        str: The same path with a ".captions" extension.
+    """
+    return os.path.splitext(json_path)[0] + CAPTION_STORE_EXTENSION
+
+
+def _aligned(size: int) -> int:
+    # arrays start on 8-byte boundaries so the offsets can be read in place
+    return (size + 7) // 8 * 8
+
+
+def write_caption_store(captions: Dict[str, str], path: str) -> str:
+    """
+    Writes a uid to caption map to a caption store file.
+
+    The file holds a header, the uids sorted as a packed array of fixed-width ASCII
+    strings, the N + 1 offsets of their captions, the sorted position of each uid in the
+    order of the map, and the captions as one UTF-8 buffer. It is written under a
+    temporary name and renamed into place.
+
+    Args:
+        captions (Dict[str, str]): Caption of each object uid.
+        path (str): Path of the store to write.
+
+    Returns:
+        str: Path to the store.
+    """
+    uids = list(captions.keys())
+    encoded_uids = np.array([uid.encode("ascii") for uid in uids], dtype=bytes)
+    if len(uids) == 0:
+        encoded_uids = encoded_uids.astype("S1")
+    width = encoded_uids.dtype.itemsize
+
+    # sorted position of each uid, in the order of the map
+    sort_order = np.argsort(encoded_uids, kind="stable")
+    positions = np.empty(len(uids), dtype=OFFSET_DTYPE)
+    positions[sort_order] = np.arange(len(uids), dtype=OFFSET_DTYPE)
+
+    texts = [captions[uids[i]].encode("utf-8") for i in sort_order]
+    offsets = np.zeros(len(uids) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(_HEADER.pack(CAPTION_STORE_MAGIC, len(uids), width, int(offsets[-1])))
+        for array in [encoded_uids[sort_order], offsets, positions]:
+            data = array.tobytes()
+            file.write(data + b"\0" * (_aligned(len(data)) - len(data)))
+        for text in texts:
+            file.write(text)
+    os.replace(temp_path, path)
+    return path
+
+
+def build_caption_store(json_path: str, store_path: Optional[str] = None) -> str:
+    """
+    Converts a captions JSON file, such as cap3d_captions.json, to a caption store.
+
+    Args:
+        json_path (str): Path to the captions JSON file.
+        store_path (Optional[str]): Path of the store to write. Defaults to the JSON path
+            with a ".captions" extension.
+
+    Returns:
+        str: Path to the store.
+    """
+    store_path = store_path or get_caption_store_path(json_path)
+    with open(json_path, "r") as file:
+        captions = json.load(file)
+
+    write_caption_store(captions, store_path)
+    logger.info(f"Converted {len(captions)} captions from {json_path} to {store_path}")
+    return store_path
+
+
+class CaptionUids:
+    """
+    Sequence of the uids of a caption store, in the order of the captions JSON file.
+
+    Drawing from it with `rng.choice` consumes the random number generator exactly like
+    drawing from the list of keys of the JSON map.
+
+    Args:
+        store (CaptionStore): The caption store.
+    """
+
+    def __init__(self, store: "CaptionStore") -> None:
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index: int) -> str:
+        return self.store.uid(index)
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self.store.uid(index)
+
+
+class CaptionStore:
+    """
+    Read-only, memory-mapped map from object uid to caption.
+
+    The store file is mapped rather than read, so opening it is instant whatever its size,
+    and processes that open the same store share its pages instead of each holding a copy
+    of the captions. A caption is found with a binary search over the sorted uids.
+
+    The store can be used in place of the uid to caption dict: it supports `len`, `in`
+    and `store[uid]`, and `store.uids` lists the uids in the order of the JSON file.
+
+    Args:
+        path (str): Path to the caption store.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._open()
+
+    def _open(self) -> None:
+        self._file = open(self.path, "rb")
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, width, _ = _HEADER.unpack_from(self._buffer, 0)
+        if magic != CAPTION_STORE_MAGIC:
+            raise ValueError(f"{self.path} is not a caption store")
+
+        offset = _HEADER.size
+        self._uids = np.frombuffer(self._buffer, dtype=f"S{width}", count=count, offset=offset)
+        offset += _aligned(count * width)
+        self._offsets = np.frombuffer(self._buffer, dtype=OFFSET_DTYPE, count=count + 1, offset=offset)
+        offset += _aligned((count + 1) * OFFSET_DTYPE.itemsize)
+        self._positions = np.frombuffer(self._buffer, dtype=OFFSET_DTYPE, count=count, offset=offset)
+        self._text_start = offset + _aligned(count * OFFSET_DTYPE.itemsize)
+        self.uids = CaptionUids(self)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _find(self, uid: str) -> int:
+        # sorted position of a uid, -1 if it isn't in the store
+        key = uid.encode("ascii", errors="replace")
+        position = int(self._uids.searchsorted(key))
+        if position < len(self._uids) and self._uids[position] == key:
+            return position
+        return -1
+
+    def uid(self, index: int) -> str:
+        """
+        Returns the uid at an index, in the order of the captions JSON file.
+
+        Args:
+            index (int): Index of the uid.
+
+        Returns:
+            str: The uid.
+        """
+        return self._uids[self._positions[index]].decode("ascii")
+
+    def random_uid(self, rng=random) -> str:
+        """
+        Draws a uid uniformly.
+
+        Args:
+            rng (random.Random): Random number generator to draw from.
+
+        Returns:
+            str: The uid.
+        """
+        return rng.choice(self.uids)
+
+    def caption(self, uid: str) -> str:
+        """
+        Returns the caption of a uid.
+
+        Args:
+            uid (str): The object uid.
+
+        Returns:
+            str: The caption.
+
+        Raises:
+            KeyError: If the uid is not in the store.
+        """
+        position = self._find(uid)
+        if position < 0:
+            raise KeyError(uid)
+        start = self._text_start + int(self._offsets[position])
+        end = self._text_start + int(self._offsets[position + 1])
+        return self._buffer[start:end].decode("utf-8")
+
+    def __getitem__(self, uid: str) -> str:
+        return self.caption(uid)
+
+    def __contains__(self, uid: object) -> bool:
+        return isinstance(uid, str) and self._find(uid) >= 0
+
+    def keys(self) -> CaptionUids:
+        return self.uids
+
+    def close(self) -> None:
+        """
+        Closes the store file.
+
+        Returns:
+            None
+        """
+        # drop the array views first, the map can't be closed while they exist
+        self._uids = self._offsets = self._positions = None
+        self.uids = None
+        self._buffer.close()
+        self._file.close()
+
+    def __getstate__(self) -> Dict[str, str]:
+        # worker processes map the file again instead of pickling the captions
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, str]) -> None:
+        self.path = state["path"]
+        self._open()
+
+    def __enter__(self) -> "CaptionStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def open_captions(path: str) -> CaptionStore:
+    """
+    Opens a captions file as a caption store.
+
+    A captions JSON file is converted to a store next to it the first time it is opened,
+    and again whenever the JSON file is newer than the store.
+
+    Args:
+        path (str): Path to a caption store or a captions JSON file.
+
+    Returns:
+        CaptionStore: The opened store.
+    """
+    if path.endswith(".json"):
+        store_path = get_caption_store_path(path)
+        if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(path):
+            build_caption_store(path, store_path)
+        path = store_path
+    return CaptionStore(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a captions JSON file to a memory-mapped caption store."
+    )
+    parser.add_argument(
+        "--input_path",
+        type=str,
+        default="datasets/cap3d_captions.json",
+        help="Path to the captions JSON file",
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        default=None,
+        help="Path to the caption store. Defaults to the input path with a .captions extension",
+    )
+    args = parser.parse_args()
+
+    build_caption_store(args.input_path, args.output_path)
@@ -0,0 +1,222 @@
+import bisect
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Placeholders of each kind of template with their replace count (-1 for every
+# occurrence), in the order the captions have always substituted them. The order
+# matters: orientation templates get the pitch in every <degrees>, since it is
+# substituted first.
+OBJECT_REPLACEMENTS = [
+    ("<name>", -1),
+    ("<description>", -1),
+    ("<size>", 1),
+    ("<size_in_meters>", 1),
+    ("<size_in_feet>", 1),
+]
+ORIENTATION_REPLACEMENTS = [
+    ("<pitch>", -1),
+    ("<degrees>", -1),
+    ("<yaw>", -1),
+    ("<degrees>", -1),
+]
+FOV_REPLACEMENTS = [("<fov>", -1), ("<mm>", -1)]
+
+FOV_TEMPLATES = {
+    "degrees": [
+        "The camera has a <fov> degree field of view.",
+        "The camera has a <fov> degree FOV.",
+        "The field of view is <fov> degrees.",
+        "Set the fov of the camera to <fov> degrees.",
+        "Set the FOV of the camera to <fov>°",
+    ],
+    "mm": [
+        "The camera has a <mm> mm focal length.",
+        "The focal length is <mm> mm.",
+        "Set the focal length of the camera to <mm> mm.",
+    ],
+}
+
+_SENTINEL = "\x00"
+
+
+def apply_replacements(
+    text: str, replacements: Sequence[Tuple[str, int]], values: Sequence[str]
+) -> str:
+    """
+    Substitutes values into a template with chained `str.replace` calls.
+
+    Args:
+        text (str): The template.
+        replacements (Sequence[Tuple[str, int]]): Placeholders and replace counts, in order.
+        values (Sequence[str]): Value of each replacement.
+
+    Returns:
+        str: The filled in template.
+    """
+    for (placeholder, count), value in zip(replacements, values):
+        text = text.replace(placeholder, value, count)
+    return text
+
+
+class CaptionTemplate:
+    """
+    A caption template precompiled into literal text and placeholder slots.
+
+    The template is compiled by running its replacements once with sentinel values, so
+    the slots are exactly where chained `str.replace` calls would put the values,
+    including placeholders replaced only once or replaced by an earlier placeholder of
+    the same name. Rendering is then a single `str.format` call.
+
+    Values containing "<" or ">" could form placeholders of their own with chained
+    replaces, so they are rendered with the replaces to keep the output identical.
+
+    Args:
+        text (str): The template.
+        replacements (Sequence[Tuple[str, int]]): Placeholders and replace counts, in the
+            order they are substituted.
+    """
+
+    def __init__(self, text: str, replacements: Sequence[Tuple[str, int]]) -> None:
+        self.text = text
+        self.replacements = list(replacements)
+
+        self._format: Optional[str] = None
+        if _SENTINEL in text:
+            return
+
+        sentinels = [f"{_SENTINEL}{i}{_SENTINEL}" for i in range(len(self.replacements))]
+        pieces = apply_replacements(text, self.replacements, sentinels).split(_SENTINEL)
+        # literal text at even positions, slot numbers at odd positions
+        literals = pieces[0::2]
+        if any("<" in literal or ">" in literal for literal in literals):
+            return
+
+        escaped = [literal.replace("{", "{{").replace("}", "}}") for literal in literals]
+        self._format = escaped[0] + "".join(
+            f"{{{slot}}}{literal}" for slot, literal in zip(pieces[1::2], escaped[1:])
+        )
+
+    def render(self, values: Sequence[str]) -> str:
+        """
+        Fills in the template.
+
+        Args:
+            values (Sequence[str]): Value of each replacement, in the order of the
+                replacements.
+
+        Returns:
+            str: The caption, as the chained replaces would produce it.
+        """
+        joined = "".join(values)
+        if self._format is None or "<" in joined or ">" in joined:
+            return apply_replacements(self.text, self.replacements, values)
+        return self._format.format(*values)
+
+
+class NearestLabels:
+    """
+    Bisect table finding the label closest to a value.
+
+    Labels are keyed by numeric strings, as the orientation labels of the camera data.
+    The lookup returns the same key as `min(keys, key=lambda x: abs(int(x) - value))`:
+    on ties, the key that comes first in the dict wins.
+
+    Args:
+        labels (Dict[str, List[str]]): Label synonyms by numeric key.
+    """
+
+    def __init__(self, labels: Dict[str, List[str]]) -> None:
+        self.labels = labels
+
+        # first key in dict order for each value, with its position to break ties
+        firsts: Dict[int, Tuple[int, str]] = {}
+        for order, key in enumerate(labels):
+            firsts.setdefault(int(key), (order, key))
+        self._values = sorted(firsts)
+        self._orders = [firsts[value][0] for value in self._values]
+        self._keys = [firsts[value][1] for value in self._values]
+
+    def nearest(self, value: int) -> str:
+        """
+        Finds the key closest to a value.
+
+        Args:
+            value (int): The value to look up.
+
+        Returns:
+            str: The closest key.
+        """
+        i = bisect.bisect_left(self._values, value)
+        if i == len(self._values):
+            return self._keys[i - 1]
+        if i == 0:
+            return self._keys[0]
+
+        below = value - self._values[i - 1]
+        above = self._values[i] - value
+        if below < above or (below == above and self._orders[i - 1] < self._orders[i]):
+            return self._keys[i - 1]
+        return self._keys[i]
+
+    def choices(self, value: int) -> List[str]:
+        """
+        Returns the synonyms of the label closest to a value.
+
+        Args:
+            value (int): The value to look up.
+
+        Returns:
+            List[str]: Synonyms of the closest label.
+        """
+        return self.labels[self.nearest(value)]
+
+
+class CaptionTemplates:
+    """
+    Caption templates of the camera and object data, compiled once.
+
+    Templates are still drawn as strings from the lists of the data, so the random
+    number generator is consumed as before; the drawn text is then looked up here.
+
+    Args:
+        camera_data (Optional[Dict[str, Any]]): Camera data, for the orientation captions.
+        object_data (Optional[Dict[str, Any]]): Object data, for the object captions.
+    """
+
+    def __init__(
+        self,
+        camera_data: Optional[Dict[str, Any]] = None,
+        object_data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.fov = compile_templates(
+            [text for templates in FOV_TEMPLATES.values() for text in templates],
+            FOV_REPLACEMENTS,
+        )
+
+        if camera_data is not None:
+            orientation = camera_data["orientation"]
+            self.orientation = compile_templates(
+                orientation["descriptions"], ORIENTATION_REPLACEMENTS
+            )
+            self.pitch_labels = NearestLabels(orientation["labels"]["pitch"])
+            self.yaw_labels = NearestLabels(orientation["labels"]["yaw"])
+
+        if object_data is not None:
+            self.object_name_description = compile_templates(
+                object_data["name_description_relationship"], OBJECT_REPLACEMENTS
+            )
+
+
+def compile_templates(
+    texts: Sequence[str], replacements: Sequence[Tuple[str, int]]
+) -> Dict[str, CaptionTemplate]:
+    """
+    Compiles a list of templates.
+
+    Args:
+        texts (Sequence[str]): The templates.
+        replacements (Sequence[Tuple[str, int]]): Placeholders and replace counts, in order.
+
+    Returns:
+        Dict[str, CaptionTemplate]: Compiled template of each text.
+    """
+    return {text: CaptionTemplate(text, replacements) for text in texts}
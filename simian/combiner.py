@@ -4,10 +4,35 @@ import math
 import os
 import random
 import argparse
-from typing import Any, Dict, List, Optional
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from mathutils import Vector
 
-from .transform import determine_relationships, adjust_positions
+from .caption_store import open_captions
+from .captions import (
+    FOV_REPLACEMENTS,
+    FOV_TEMPLATES,
+    OBJECT_REPLACEMENTS,
+    ORIENTATION_REPLACEMENTS,
+    CaptionTemplate,
+    CaptionTemplates,
+    NearestLabels,
+)
+from .layout import plan_layout
+from .object_cache import PIPELINE_VERSION
+from .object_index import ObjectIndex
+from .sampling import ScalarParameters
+from .store import STORE_EXTENSION, CombinationWriter, write_shards
+from .transform import (
+    adjust_positions,
+    format_relationship,
+    get_placement_positions,
+    get_relationship_pairs,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -75,7 +100,7 @@ def parse_args() -> argparse.Namespace:
         "--cap3d_captions_path",
         type=str,
         default="datasets/cap3d_captions.json",
-        help="Path to the JSON file containing captions data",
+        help="Path to the caption store or the JSON file containing captions data",
     )
     parser.add_argument(
         "--simdata_path",
@@ -87,7 +112,19 @@ def parse_args() -> argparse.Namespace:
         "--output_path",
         type=str,
         default="combinations.json",
-        help="Path to the output file",
+        help="Path to the output file. A .jsonl path writes an indexed combination store",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Number of processes to generate combinations in. The output is the same for any number",
+    )
+    parser.add_argument(
+        "--shard_size",
+        type=int,
+        default=0,
+        help="Stream combinations into shards of this many combinations, written with a manifest.json to the output path without its extension",
     )
     parser.add_argument(
         "--stage_data_path",
@@ -109,26 +146,270 @@ def parse_args() -> argparse.Namespace:
         choices=["none", "all"],
         help="Allow objects to be on top of each other."
     )
+    parser.add_argument(
+        "--object_index_path",
+        type=str,
+        default=None,
+        help="Path to the object index written by simian.preprocess. Objects that failed to preprocess are left out, and object locations are planned and stored in the combinations.",
+    )
     return parser.parse_args()
 
 
-def generate_stage_captions(combination: Dict[str, Any]) -> List[str]:
+MAX_NUMBER_OF_OBJECTS = 5
+STAGE_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/stage_data.json")
+
+
+class WeightedSampler:
+    """
+    Draws items with fixed weights from a precomputed cumulative weight table.
+
+    Drawing consumes the random number generator exactly like `random.choices` with the
+    same weights, so precomputing the table doesn't change the generated combinations.
+
+    Args:
+        items (Iterable[Any]): Items to draw from.
+        weights (Iterable[float]): Weight of each item.
+    """
+
+    def __init__(self, items: Iterable[Any], weights: Iterable[float]) -> None:
+        self.items = list(items)
+        self.cum_weights = list(accumulate(weights))
+
+    def sample(self, rng=random) -> Any:
+        """
+        Draws one item.
+
+        Args:
+            rng (random.Random): Random number generator to draw from.
+
+        Returns:
+            Any: The drawn item.
+        """
+        return rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+def get_scale_sampler(object_scales: Dict[str, Any]) -> WeightedSampler:
+    """
+    Builds the sampler of object scales, a triangular distribution peaking at the middle scale.
+
+    Args:
+        object_scales (Dict[str, Any]): The "scales" of the object data, ordered by size.
+
+    Returns:
+        WeightedSampler: Sampler of (scale name, scale data) pairs.
+    """
+    # Create simple triangular distribution based on scale_values
+    len_scale_values = len(object_scales)
+    mid_point = len_scale_values // 2
+    if len_scale_values % 2 == 0:
+        weights = [i + 1 for i in range(mid_point)] + [
+            mid_point - i for i in range(mid_point)
+        ]
+    else:
+        weights = (
+            [i + 1 for i in range(mid_point)]
+            + [mid_point + 1]
+            + [mid_point - i for i in range(mid_point)]
+        )
+
+    total_weight = sum(weights)
+    normalized_weights = [w / total_weight for w in weights]
+    return WeightedSampler(object_scales.items(), normalized_weights)
+
+
+class CombinerContext:
+    """
+    Data, settings and precomputed samplers shared by every combination.
+
+    The context is built once and passed to the generate_* functions, so per-combination
+    work only draws random numbers: weight tables, key lists and the stage data are
+    computed or loaded up front. It doesn't depend on argparse, so the combiner can be
+    used as a library; use `CombinerContext.from_files` to load the data files.
+
+    Args:
+        camera_data (Dict[str, Any]): Camera data.
+        object_data (Dict[str, Any]): Object data.
+        dataset_dict (Dict[str, Any]): Object uids of each dataset.
+        captions_data (Dict[str, Any]): Caption of each object uid, a dict or a CaptionStore.
+        background_dict (Dict[str, Any]): Backgrounds of each background dataset.
+        background_names (List[str]): Background datasets to draw from.
+        background_weights (List[int]): Weight of each background dataset.
+        texture_data (Dict[str, Any]): Stage textures.
+        stage_data (Optional[Dict[str, Any]]): Stage caption data. Defaults to data/stage_data.json.
+        dataset_names (Optional[List[str]]): Object datasets. Defaults to ["cap3d"].
+        dataset_weights (Optional[List[int]]): Weight of each object dataset.
+        max_number_of_objects (int): Maximum number of objects in a combination.
+        movement (str): Movement applied to objects, "none" or "all".
+        max_speed (float): Maximum speed of moving objects.
+        ontop_data (str): Allow objects on top of each other, "none" or "all".
+        object_index (Optional[ObjectIndex]): Index of preprocessed objects. If given,
+            objects that failed to preprocess are never drawn, and the locations of the
+            objects are planned from their footprints and stored in the combinations.
+    """
+
+    def __init__(
+        self,
+        camera_data: Dict[str, Any],
+        object_data: Dict[str, Any],
+        dataset_dict: Dict[str, Any],
+        captions_data: Dict[str, Any],
+        background_dict: Dict[str, Any],
+        background_names: List[str],
+        background_weights: List[int],
+        texture_data: Dict[str, Any],
+        stage_data: Optional[Dict[str, Any]] = None,
+        dataset_names: Optional[List[str]] = None,
+        dataset_weights: Optional[List[int]] = None,
+        max_number_of_objects: int = MAX_NUMBER_OF_OBJECTS,
+        movement: str = "none",
+        max_speed: float = 0.5,
+        ontop_data: str = "none",
+        object_index: Optional[ObjectIndex] = None,
+    ) -> None:
+        self.camera_data = camera_data
+        self.object_data = object_data
+        self.dataset_dict = dataset_dict
+        self.captions_data = captions_data
+        self.background_dict = background_dict
+        self.background_names = background_names
+        self.background_weights = background_weights
+        self.texture_data = texture_data
+        self.stage_data = stage_data if stage_data is not None else read_json_file(STAGE_DATA_PATH)
+        self.dataset_names = dataset_names or ["cap3d"]
+        self.dataset_weights = dataset_weights or [1] * len(self.dataset_names)
+        self.max_number_of_objects = max_number_of_objects
+        self.movement = movement
+        self.max_speed = max_speed
+        self.ontop_data = ontop_data
+        self.object_index = object_index
+
+        # uids drawn from the datasets are redrawn while they are in here, so the
+        # memory-mapped uid sequences never have to be copied into filtered lists
+        self.failed_uids = frozenset()
+        if object_index is not None:
+            self.failed_uids = frozenset(object_index.get_failed())
+            if self.failed_uids:
+                logger.info(f"Leaving out {len(self.failed_uids)} objects that failed to preprocess")
+            for name, uids in dataset_dict.items():
+                if len(uids) <= len(self.failed_uids) and all(uid in self.failed_uids for uid in uids):
+                    raise ValueError(f"Every object of dataset '{name}' failed to preprocess")
+
+        self.scale_sampler = get_scale_sampler(object_data["scales"])
+        self.dataset_sampler = WeightedSampler(self.dataset_names, self.dataset_weights)
+        self.background_sampler = WeightedSampler(background_names, background_weights)
+        self.background_keys = {
+            name: list(background_dict[name].keys()) for name in background_names
+        }
+        self.caption_templates = CaptionTemplates(camera_data, object_data)
+        texture_names = list(texture_data.keys())
+        self.texture_sampler = WeightedSampler(
+            texture_names, [len(texture_data[name]["maps"]) for name in texture_names]
+        )
+
+    @classmethod
+    def from_files(
+        cls,
+        camera_file_path: str = "data/camera_data.json",
+        object_data_path: str = "data/object_data.json",
+        texture_data_path: str = "datasets/texture_data.json",
+        datasets_path: str = "data/datasets.json",
+        cap3d_captions_path: str = "datasets/cap3d_captions.json",
+        simdata_path: str = "datasets",
+        stage_data_path: str = "data/stage_data.json",
+        max_number_of_objects: int = MAX_NUMBER_OF_OBJECTS,
+        movement: str = "none",
+        max_speed: float = 1.0,
+        ontop_data: str = "none",
+        object_index_path: Optional[str] = None,
+    ) -> "CombinerContext":
+        """
+        Loads the combiner data files into a context. The defaults match the combiner CLI.
+
+        Args:
+            camera_file_path (str): Path to the JSON file containing camera data.
+            object_data_path (str): Path to the JSON file containing object data.
+            texture_data_path (str): Path to the JSON file containing texture data.
+            datasets_path (str): Path to the file which lists all the datasets to use.
+            cap3d_captions_path (str): Path to the caption store, or to the JSON file
+                containing captions data, which is converted to a store next to it.
+            simdata_path (str): Path to the simdata directory.
+            stage_data_path (str): Path to the JSON file containing stage data.
+            max_number_of_objects (int): Maximum number of objects in a combination.
+            movement (str): Movement applied to objects, "none" or "all".
+            max_speed (float): Maximum speed of moving objects.
+            ontop_data (str): Allow objects on top of each other, "none" or "all".
+            object_index_path (Optional[str]): Path to the object index written by
+                simian.preprocess, to plan object locations with. Unused if None.
+
+        Returns:
+            CombinerContext: The loaded context.
+        """
+        # Load only cap3d dataset, memory-mapped from its caption store
+        logger.info(f"Loading {cap3d_captions_path}")
+        captions_data = open_captions(cap3d_captions_path)
+        logger.info(f"Loaded {len(captions_data)} unique entries from cap3d")
+
+        # Ensure the dataset_dict contains only cap3d data
+        dataset_dict = {"cap3d": captions_data.uids}
+
+        # Load backgrounds
+        backgrounds = read_json_file(datasets_path)["backgrounds"]
+        background_dict = {}
+        for bg in backgrounds:
+            bg_path = os.path.join(simdata_path, bg + ".json")
+            logger.info(f"Loading {bg_path}")
+            if os.path.exists(bg_path):
+                background_data = read_json_file(bg_path)
+                background_dict[bg] = background_data
+                logger.info(f"Loaded {len(background_data)} entries from {bg}")
+            else:
+                logger.info(f"Dataset file {bg_path} not found")
+
+        background_names = list(background_dict.keys())
+        background_weights = [len(background_dict[name]) for name in background_names]
+
+        return cls(
+            camera_data=read_json_file(camera_file_path),
+            object_data=read_json_file(object_data_path),
+            dataset_dict=dataset_dict,
+            captions_data=captions_data,
+            background_dict=background_dict,
+            background_names=background_names,
+            background_weights=background_weights,
+            texture_data=read_json_file(texture_data_path),
+            stage_data=read_json_file(stage_data_path),
+            dataset_names=["cap3d"],  # Use only the cap3d dataset
+            dataset_weights=[1],  # Weight for the cap3d dataset
+            max_number_of_objects=max_number_of_objects,
+            movement=movement,
+            max_speed=max_speed,
+            ontop_data=ontop_data,
+            object_index=ObjectIndex(object_index_path) if object_index_path else None,
+        )
+
+
+def generate_stage_captions(
+    combination: Dict[str, Any], rng=random, context: Optional[CombinerContext] = None
+) -> List[str]:
     """
     Generate captions for the stage based on the combination data.
 
     Args:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the loaded stage data. If None,
+            the stage data is read from disk.
 
     Returns:
         List[str]: List of stage captions.
     """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-    stage_data_path = os.path.join(current_dir, "../data/stage_data.json")
-    stage_data = read_json_file(stage_data_path)
+    if context is not None:
+        stage_data = context.stage_data
+    else:
+        stage_data = read_json_file(STAGE_DATA_PATH)
 
-    background_prefix = random.choice(stage_data["background_names"])
-    floor_prefix = random.choice(stage_data["material_names"])
+    background_prefix = rng.choice(stage_data["background_names"])
+    floor_prefix = rng.choice(stage_data["material_names"])
     background_name = combination["background"]["name"]
     floor_material_name = combination["stage"]["material"]["name"]
 
@@ -152,7 +433,10 @@ def generate_stage_captions(combination: Dict[str, Any]) -> List[str]:
 
 
 def generate_orientation_caption(
-    camera_data: Dict[str, Any], combination: Dict[str, Any]
+    camera_data: Dict[str, Any],
+    combination: Dict[str, Any],
+    rng=random,
+    context: Optional[CombinerContext] = None,
 ) -> str:
     """
     Generate a caption for the camera orientation based on the combination data.
@@ -160,34 +444,33 @@ def generate_orientation_caption(
     Args:
         camera_data (Dict[str, Any]): Camera data.
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the compiled caption templates.
+            If None, the drawn template is compiled.
 
     Returns:
         str: Orientation caption.
     """
-    pitch_labels = camera_data["orientation"]["labels"]["pitch"]
-    yaw_labels = camera_data["orientation"]["labels"]["yaw"]
+    if context is not None:
+        pitch_labels = context.caption_templates.pitch_labels
+        yaw_labels = context.caption_templates.yaw_labels
+    else:
+        pitch_labels = NearestLabels(camera_data["orientation"]["labels"]["pitch"])
+        yaw_labels = NearestLabels(camera_data["orientation"]["labels"]["yaw"])
 
-    closest_pitch_label = min(
-        pitch_labels.keys(),
-        key=lambda x: abs(int(x) - int(combination["orientation"]["pitch"])),
-    )
-    closest_yaw_label = min(
-        yaw_labels.keys(),
-        key=lambda x: abs(int(x) - int(combination["orientation"]["yaw"])),
-    )
+    pitch = combination["orientation"]["pitch"]
+    yaw = combination["orientation"]["yaw"]
 
-    # Replace the placeholders in the camera text with the closest matching labels
-    orientation_text = random.choice(camera_data["orientation"]["descriptions"])
-    orientation_text = (
-        orientation_text.replace(
-            "<pitch>", random.choice(pitch_labels[closest_pitch_label])
-        )
-        .replace("<degrees>", str(combination["orientation"]["pitch"]))
-        .replace("<yaw>", random.choice(yaw_labels[closest_yaw_label]))
-        .replace("<degrees>", str(combination["orientation"]["yaw"]))
-    )
+    orientation_text = rng.choice(camera_data["orientation"]["descriptions"])
+    if context is not None:
+        orientation_template = context.caption_templates.orientation[orientation_text]
+    else:
+        orientation_template = CaptionTemplate(orientation_text, ORIENTATION_REPLACEMENTS)
 
-    return orientation_text
+    # Fill the placeholders in the camera text with the closest matching labels
+    pitch_label = rng.choice(pitch_labels.choices(int(pitch)))
+    yaw_label = rng.choice(yaw_labels.choices(int(yaw)))
+    return orientation_template.render([pitch_label, str(pitch), yaw_label, str(yaw)])
 
 
 def meters_to_feet_rounded(meters: float) -> int:
@@ -205,148 +488,145 @@ def meters_to_feet_rounded(meters: float) -> int:
 
 
 def generate_object_name_description_captions(
-    combination: Dict[str, Any], object_data
+    combination: Dict[str, Any],
+    object_data,
+    rng=random,
+    context: Optional[CombinerContext] = None,
 ) -> str:
     """
     Generate captions for object names and descriptions based on the combination data.
 
     Args:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the compiled caption templates.
+            If None, the drawn template is compiled.
 
     Returns:
         str: Object name and description captions.
     """
     object_name_descriptions = []
     for obj in combination["objects"]:
-        object_name = obj["name"]
-        object_description = obj["description"]
-
         object_scale = obj["scale"]
         scale_factor = object_scale["factor"]
-        scale_name = object_scale["name_synonym"]
 
-        object_name_description_relationship = random.choice(
+        object_name_description_relationship = rng.choice(
             object_data["name_description_relationship"]
         )
+        if context is not None:
+            template = context.caption_templates.object_name_description[
+                object_name_description_relationship
+            ]
+        else:
+            template = CaptionTemplate(
+                object_name_description_relationship, OBJECT_REPLACEMENTS
+            )
 
-        # Replace placeholders with actual values
-        object_name_description_relationship = (
-            object_name_description_relationship.replace("<name>", object_name)
-            .replace("<description>", object_description)
-            .replace("<size>", scale_name, 1)
-        )
-
-        random_metric_m = random.choice(["meters", "m", ""])
+        random_metric_m = rng.choice(["meters", "m", ""])
         size_in_meters = f"{scale_factor}{random_metric_m}"
-        object_name_description_relationship = (
-            object_name_description_relationship.replace(
-                "<size_in_meters>", size_in_meters, 1
-            )
-        )
 
-        random_metric_f = random.choice(["feet", "ft", ""])
+        random_metric_f = rng.choice(["feet", "ft", ""])
         size_in_feet = f"{meters_to_feet_rounded(scale_factor)}{random_metric_f}"
-        object_name_description_relationship = (
-            object_name_description_relationship.replace(
-                "<size_in_feet>", size_in_feet, 1
+
+        # Replace placeholders with actual values
+        object_name_descriptions.append(
+            template.render(
+                [
+                    obj["name"],
+                    obj["description"],
+                    object_scale["name_synonym"],
+                    size_in_meters,
+                    size_in_feet,
+                ]
             )
         )
 
-        object_name_descriptions.append(object_name_description_relationship)
-
     # Randomize order of object descriptions
-    random.shuffle(object_name_descriptions)
+    rng.shuffle(object_name_descriptions)
     # Join the object descriptions
     object_name_descriptions = " ".join(object_name_descriptions)
     return object_name_descriptions
 
 
-def generate_relationship_captions(combination: Dict[str, Any]) -> List[str]:
+def generate_relationship_captions(combination: Dict[str, Any], rng=random) -> List[str]:
     """
     Generate captions for object relationships based on the combination data.
 
     Args:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         List[str]: List of relationship captions.
     """
-    threshold_relationships = len(combination["objects"])
-
-    adjusted_objects = adjust_positions(
-        combination["objects"], combination["orientation"]["yaw"]
-    )
+    objects = combination["objects"]
+    threshold_relationships = len(objects)
 
     camera_yaw = combination["orientation"]["yaw"]
 
-    relationships = determine_relationships(adjusted_objects, camera_yaw)
+    # the pairs are compared as arrays, and only the strings used are built
+    positions = get_placement_positions(objects, camera_yaw)
+    relationships = get_relationship_pairs(positions, camera_yaw)
 
     # Write relationships into the JSON file with combination["objects"]["relationships"]
-    for i, obj in enumerate(combination["objects"]):
+    for i, obj in enumerate(objects):
         obj.setdefault("relationships", [])
         if i < len(relationships):
-            obj["relationships"] = relationships[i]
+            obj["relationships"] = format_relationship(objects, relationships[i])
 
-    selected_relationships = relationships
+    # sampling indices draws the same as sampling the relationships themselves
+    selected_indices = range(len(relationships))
     if threshold_relationships < len(relationships):
-        selected_relationships = random.sample(relationships, threshold_relationships)
+        selected_indices = rng.sample(range(len(relationships)), threshold_relationships)
 
-    return selected_relationships
+    return [format_relationship(objects, relationships[i]) for i in selected_indices]
 
 
-def add_movement_to_objects(objects, movement="none", max_speed=0.5):
+def add_movement_to_objects(objects, movement="none", max_speed=0.5, rng=random):
     if movement == "none":
         return objects
     for obj in objects:
         if movement == "all":
-            direction = random.choice(["left", "right", "forward", "backward"])
-            speed = random.uniform(0.1, max_speed)
+            direction = rng.choice(["left", "right", "forward", "backward"])
+            speed = rng.uniform(0.1, max_speed)
             obj["movement"] = {"direction": direction, "speed": speed}
     return objects
 
 
-def generate_fov_caption(combination: Dict[str, Any]) -> str:
+def generate_fov_caption(
+    combination: Dict[str, Any], rng=random, context: Optional[CombinerContext] = None
+) -> str:
     """
     Generate a caption for the field of view (FOV) based on the combination data.
 
     Args:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the compiled caption templates.
 
     Returns:
         str: FOV caption.
     """
-    fov_templates = {
-        "degrees": [
-            "The camera has a <fov> degree field of view.",
-            "The camera has a <fov> degree FOV.",
-            "The field of view is <fov> degrees.",
-            "Set the fov of the camera to <fov> degrees.",
-            "Set the FOV of the camera to <fov>°",
-        ],
-        "mm": [
-            "The camera has a <mm> mm focal length.",
-            "The focal length is <mm> mm.",
-            "Set the focal length of the camera to <mm> mm.",
-        ],
-    }
-
     fov = combination["framing"]["fov"]
 
     # FOV is stored as degrees in the framing data
     fov_types = "degrees", "mm"
 
     # Select a random FOV type
-    fov_type = random.choice(fov_types)
+    fov_type = rng.choice(fov_types)
 
     # Select a random FOV template
-    fov_template = random.choice(fov_templates[fov_type])
-
-    # Replace the <fov> placeholder with the FOV value
-    fov_template = fov_template.replace("<fov>", str(fov))
+    fov_template = rng.choice(FOV_TEMPLATES[fov_type])
+    if context is not None:
+        fov_template = context.caption_templates.fov[fov_template]
+    else:
+        fov_template = CaptionTemplate(fov_template, FOV_REPLACEMENTS)
 
     # Convert FOV to focal length
     focal_length = int(35 / (2 * math.tan(math.radians(fov) / 2)))
-    fov_caption = fov_template.replace("<mm>", str(focal_length))
+
+    # Fill the <fov> and <mm> placeholders with the FOV value and focal length
+    fov_caption = fov_template.render([str(fov), str(focal_length)])
 
     if fov_type == "degrees":
         fov_caption += f" ({focal_length:.2f} mm focal length)"
@@ -354,12 +634,13 @@ def generate_fov_caption(combination: Dict[str, Any]) -> str:
     return fov_caption
 
 
-def generate_postprocessing_caption(combination: Dict[str, Any], camera_data) -> str:
+def generate_postprocessing_caption(combination: Dict[str, Any], camera_data, rng=random) -> str:
     """
     Generate a caption for postprocessing based on the combination data.
 
     Args:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         str: Postprocessing caption.
@@ -372,42 +653,43 @@ def generate_postprocessing_caption(combination: Dict[str, Any], camera_data) ->
     for key in postprocessing:
         post_type = postprocessing[key]["type"]
         if key == "bloom":
-            bloom_caption = random.choice(
+            bloom_caption = rng.choice(
                 postprocessing_options["bloom"]["types"][post_type]["descriptions"]
             )
             caption_parts.append(bloom_caption)
         elif key == "ssao":
-            ssao_caption = random.choice(
+            ssao_caption = rng.choice(
                 postprocessing_options["ssao"]["types"][post_type]["descriptions"]
             )
             caption_parts.append(ssao_caption)
         elif key == "ssrr":
-            ssrr_caption = random.choice(
+            ssrr_caption = rng.choice(
                 postprocessing_options["ssrr"]["types"][post_type]["descriptions"]
             )
             caption_parts.append(ssrr_caption)
         elif key == "motionblur":
-            motionblur_caption = random.choice(
+            motionblur_caption = rng.choice(
                 postprocessing_options["motionblur"]["types"][post_type]["descriptions"]
             )
             caption_parts.append(motionblur_caption)
 
     # randomly determine how many values (1-4 inclusive) to pop
-    num_to_pop = random.randint(1, len(caption_parts))
+    num_to_pop = rng.randint(1, len(caption_parts))
     for _ in range(num_to_pop):
-        random_index_to_remove_from_end = random.randint(0, len(caption_parts) - 1)
+        random_index_to_remove_from_end = rng.randint(0, len(caption_parts) - 1)
         caption_parts.pop(random_index_to_remove_from_end)
     return " ".join(caption_parts)
 
 
 def generate_framing_caption(
-    camera_data: Dict[str, Any], combination: Dict[str, Any]
+    camera_data: Dict[str, Any], combination: Dict[str, Any], rng=random
 ) -> str:
     """
     Generate a caption for framing based on the camera data and combination data.
     Copy codeArgs:
         camera_data (Dict[str, Any]): Camera data.
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         str: Framing caption.
@@ -421,7 +703,7 @@ def generate_framing_caption(
     )
 
     if matching_framing:
-        framing_description = random.choice(matching_framing["descriptions"])
+        framing_description = rng.choice(matching_framing["descriptions"])
         framing_description = framing_description.replace(
             "<fov>", str(framing["fov"])
         ).replace("<coverage_factor>", str(framing["coverage_factor"]))
@@ -462,11 +744,12 @@ def speed_factor_to_percentage(speed_factor: float) -> str:
     return f"{percentage}%"
 
 
-def generate_animation_captions(combination: Dict[str, Any], camera_data) -> List[str]:
+def generate_animation_captions(combination: Dict[str, Any], camera_data, rng=random) -> List[str]:
     """
     Generate captions for camera animations based on the combination data and speed factor.
     Copy codeArgs:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         List[str]: List of animation captions.
@@ -474,7 +757,7 @@ def generate_animation_captions(combination: Dict[str, Any], camera_data) -> Lis
     speed_factor = round(combination["animation"]["speed_factor"], 2)
     speed_factor_str = (
         speed_factor_to_percentage(speed_factor)
-        if random.choice([True, False])
+        if rng.choice([True, False])
         else f"{speed_factor}x"
     )
 
@@ -496,7 +779,7 @@ def generate_animation_captions(combination: Dict[str, Any], camera_data) -> Lis
 
     if animation_type != "none":
         flat_descriptions = flatten_descriptions(descriptions)
-        animation_caption = random.choice(flat_descriptions)
+        animation_caption = rng.choice(flat_descriptions)
         animation_caption = animation_caption.replace(
             "<animation_speed_value>", speed_factor_str
         )
@@ -505,13 +788,14 @@ def generate_animation_captions(combination: Dict[str, Any], camera_data) -> Lis
     return []
 
 
-def generate_movement_captions(combination: Dict[str, Any], object_data) -> List[str]:
+def generate_movement_captions(combination: Dict[str, Any], object_data, rng=random) -> List[str]:
     """
     Generate captions for object movement based on the combination data.
 
     Args:
         combination (Dict[str, Any]): Combination data.
         object_data (Dict[str, Any]): Object data including movement templates and speed descriptions.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         List[str]: List of movement captions.
@@ -532,9 +816,9 @@ def generate_movement_captions(combination: Dict[str, Any], object_data) -> List
             else:
                 speed_words = object_movement_speed_words['0.5']
 
-            speed_description = random.choice(speed_words)
+            speed_description = rng.choice(speed_words)
 
-            template = random.choice(object_movement_data)
+            template = rng.choice(object_movement_data)
             movement_description = template.replace('<object>', obj['name'])
             movement_description = movement_description.replace('<movement>', obj['movement']['direction'])
             movement_description = movement_description.replace('<speed>', f'{speed:.2f}')
@@ -547,7 +831,7 @@ def generate_movement_captions(combination: Dict[str, Any], object_data) -> List
     return movement_captions
 
 
-def generate_ontop_captions(combination: Dict[str, Any], ontop_data, object_data) -> List[str]:
+def generate_ontop_captions(combination: Dict[str, Any], ontop_data, object_data, rng=random) -> List[str]:
     """
     Generate captions for objects being on top of each other based on the combination data.
 
@@ -555,6 +839,7 @@ def generate_ontop_captions(combination: Dict[str, Any], ontop_data, object_data
         combination (Dict[str, Any]): Combination data.
         ontop_data (str): Flag indicating whether to allow objects on top of each other.
         object_data (Dict[str, Any]): Object data containing ontop description relationships.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         List[str]: List of ontop captions.
@@ -581,7 +866,7 @@ def generate_ontop_captions(combination: Dict[str, Any], ontop_data, object_data
                 below_obj = objects[i]
                 above_obj = objects[i + 1]
                 
-                caption_template = random.choice(object_ontop_captions)
+                caption_template = rng.choice(object_ontop_captions)
                 
                 # Always describe from bottom to top to maintain consistency
                 caption = caption_template.replace("<object1>", above_obj['name']).replace("<object2>", below_obj['name'])
@@ -591,11 +876,20 @@ def generate_ontop_captions(combination: Dict[str, Any], ontop_data, object_data
     return ontop_captions
 
 
-def generate_caption(combination: Dict[str, Any], object_data, camera_data, ontop_data) -> str:
+def generate_caption(
+    combination: Dict[str, Any],
+    object_data,
+    camera_data,
+    ontop_data,
+    rng=random,
+    context: Optional[CombinerContext] = None,
+) -> str:
     """
     Generate a complete caption based on the combination data.
     Copy codeArgs:
         combination (Dict[str, Any]): Combination data.
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the loaded combiner data.
 
     Returns:
         str: Complete caption.
@@ -604,39 +898,39 @@ def generate_caption(combination: Dict[str, Any], object_data, camera_data, onto
 
     # Add object name and description captions to the caption
     object_name_descriptions = generate_object_name_description_captions(
-        combination, object_data
+        combination, object_data, rng, context
     )
     caption_parts.append(object_name_descriptions)
 
-    scene_relationship_description = generate_relationship_captions(combination)
+    scene_relationship_description = generate_relationship_captions(combination, rng)
     scene_relationship_description_str = " ".join(scene_relationship_description)
     caption_parts.append(scene_relationship_description_str)
 
     # Add the camera orientation to the caption
-    orientation_text = generate_orientation_caption(camera_data, combination)
+    orientation_text = generate_orientation_caption(camera_data, combination, rng, context)
     caption_parts.append(orientation_text)
 
-    fov_caption = generate_fov_caption(combination)
+    fov_caption = generate_fov_caption(combination, rng, context)
     caption_parts.append(fov_caption)
 
-    framing_caption = generate_framing_caption(camera_data, combination)
+    framing_caption = generate_framing_caption(camera_data, combination, rng)
     caption_parts.append(framing_caption)
 
-    postprocessing_caption = generate_postprocessing_caption(combination, camera_data)
+    postprocessing_caption = generate_postprocessing_caption(combination, camera_data, rng)
     caption_parts.append(postprocessing_caption)
 
     # Add the stage caption
-    stage_captions = generate_stage_captions(combination)
+    stage_captions = generate_stage_captions(combination, rng, context)
     caption_parts.extend(stage_captions)
 
-    animation_captions = generate_animation_captions(combination, camera_data)
+    animation_captions = generate_animation_captions(combination, camera_data, rng)
     caption_parts.extend(animation_captions)
 
      # Add information about object movement
-    movement_captions = generate_movement_captions(combination, object_data)
+    movement_captions = generate_movement_captions(combination, object_data, rng)
     caption_parts.extend(movement_captions)
 
-    ontop_captions = generate_ontop_captions(combination, ontop_data, object_data)
+    ontop_captions = generate_ontop_captions(combination, ontop_data, object_data, rng)
     caption_parts.extend(ontop_captions)
 
     caption = " ".join(caption_parts)  # Join the caption parts into a single string
@@ -645,174 +939,78 @@ def generate_caption(combination: Dict[str, Any], object_data, camera_data, onto
     return caption
 
 
-def generate_postprocessing(camera_data: Dict[str, Any]) -> Dict[str, Any]:
+@functools.lru_cache(maxsize=8)
+def get_yaw_vectors(yaw_min: int, yaw_max: int) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Generate postprocessing settings based on the camera data.
-    Copy codeArgs:
-        camera_data (Dict[str, Any]): Camera data.
+    Get the camera direction on the unit circle of every whole yaw in a range.
+
+    Args:
+        yaw_min (int): Smallest yaw in degrees.
+        yaw_max (int): Largest yaw in degrees, inclusive.
 
     Returns:
-        Dict[str, Any]: Postprocessing settings.
+        Tuple[np.ndarray, np.ndarray]: The yaws, and an array of shape (3, len(yaws))
+        with the camera vector of each yaw in its columns.
     """
-    postprocessing = {}
-
-    bloom_data = camera_data["postprocessing"]["bloom"]
-
-    bloom_threshold = random.uniform(
-        bloom_data["threshold_min"], bloom_data["threshold_max"]
-    )
-    bloom_intensity = random.uniform(
-        bloom_data["intensity_min"], bloom_data["intensity_max"]
-    )
-    bloom_radius = random.uniform(bloom_data["radius_min"], bloom_data["radius_max"])
-
-    bloom_type = "none"
-    bloom_types = bloom_data["types"]
-    for t in bloom_types.keys():
-        if (
-            bloom_intensity >= bloom_types[t]["intensity_min"]
-            and bloom_intensity <= bloom_types[t]["intensity_max"]
-        ):
-            bloom_type = t
-            break
-
-    postprocessing["bloom"] = {
-        "threshold": bloom_threshold,
-        "intensity": bloom_intensity,
-        "radius": bloom_radius,
-        "type": bloom_type,
-    }
-
-    ssao_data = camera_data["postprocessing"]["ssao"]
-    ssao_distance = random.uniform(ssao_data["distance_min"], ssao_data["distance_max"])
-    ssao_factor = random.uniform(ssao_data["factor_min"], ssao_data["factor_max"])
-
-    ssao_type = "none"
-    for t in ssao_data["types"].keys():
-        if (
-            ssao_factor >= ssao_data["types"][t]["factor_min"]
-            and ssao_factor <= ssao_data["types"][t]["factor_max"]
-        ):
-            ssao_type = t
-            break
-
-    postprocessing["ssao"] = {
-        "distance": ssao_distance,
-        "factor": ssao_factor,
-        "type": ssao_type,
-    }
-
-    ssrr_data = camera_data["postprocessing"]["ssrr"]
-    ssrr_max_roughness = random.uniform(
-        ssrr_data["min_max_roughness"], ssrr_data["max_max_roughness"]
-    )
-    ssrr_thickness = random.uniform(
-        ssrr_data["min_thickness"], ssrr_data["max_thickness"]
-    )
-
-    ssrr_type = "none"
-    for t in ssrr_data["types"].keys():
-        if (
-            ssrr_max_roughness >= ssrr_data["types"][t]["max_roughness_min"]
-            and ssrr_max_roughness <= ssrr_data["types"][t]["max_roughness_max"]
-        ):
-            ssrr_type = t
-            break
-
-    postprocessing["ssrr"] = {
-        "max_roughness": ssrr_max_roughness,
-        "thickness": ssrr_thickness,
-        "type": ssrr_type,
-    }
-
-    motionblur_data = camera_data["postprocessing"]["motionblur"]
-    motionblur_shutter_speed = random.uniform(
-        motionblur_data["shutter_speed_min"], motionblur_data["shutter_speed_max"]
-    )
-
-    motionblur_type = "none"
-    for t in motionblur_data["types"].keys():
-        if (
-            motionblur_shutter_speed >= motionblur_data["types"][t]["shutter_speed_min"]
-            and motionblur_shutter_speed
-            <= motionblur_data["types"][t]["shutter_speed_max"]
-        ):
-            motionblur_type = t
-            break
-
-    postprocessing["motionblur"] = {
-        "shutter_speed": motionblur_shutter_speed,
-        "type": motionblur_type,
-    }
-    return postprocessing
+    yaws = np.arange(yaw_min, yaw_max + 1)
+    radians = np.radians(yaws)
+    camera_vectors = np.stack([np.cos(radians), np.sin(radians), np.zeros_like(radians)])
+    camera_vectors.setflags(write=False)
+    yaws.setflags(write=False)
+    return yaws, camera_vectors
 
 
 def generate_orientation(
     camera_data: Dict[str, Any],
     objects: List[Dict[str, Any]],
     background: Dict[str, Any],
+    rng=random,
 ) -> Dict[str, int]:
     """
     Generate camera orientation based on the camera data, objects, and background.
+
+    A yaw is occluded if the camera looks along the direction of an object other than
+    the first within 15 degrees. Every yaw in the range is tested against every object
+    with one matrix product, and the yaw is drawn from the ones that aren't occluded,
+    which gives the same distribution as re-rolling until a clear yaw comes up without
+    an unbounded loop. If every yaw is occluded, it is drawn from the least occluded ones.
     Copy codeArgs:
         camera_data (Dict[str, Any]): Camera data.
         objects (List[Dict[str, Any]]): List of objects in the scene.
         background (Dict[str, Any]): Background information.
+        rng (random.Random): Random number generator to draw from.
 
     Returns:
         Dict[str, int]: Camera orientation.
     """
     orientation_data = camera_data["orientation"]
+    yaws, camera_vectors = get_yaw_vectors(
+        orientation_data["yaw_min"], orientation_data["yaw_max"]
+    )
 
-    # Roll a number between orientation['yaw_min'] and orientation['yaw_max']
-    yaw = random.randint(orientation_data["yaw_min"], orientation_data["yaw_max"])
-    pitch = random.randint(orientation_data["pitch_min"], orientation_data["pitch_max"])
-
-    # Check if the camera is going to be occluded by the objects
-    # If so, re-roll the orientation until a non-occluded orientation is found
-    while True:
-        occluded = False
-        for obj in objects[1:]:
-            # Calculate the vector from the camera to the object
-            # calculate the position of the camera on the unit circle from yaw
-            camera_x = math.cos(math.radians(yaw))
-            camera_y = math.sin(math.radians(yaw))
-
-            camera_vector = [camera_x, camera_y, 0]
-
-            # get the position of the object
-            object_position = obj["transformed_position"]
-
-            # normalize the object position, account for division by 0
-            object_position = [
-                a / max(1e-6, sum([b**2 for b in object_position])) ** 0.5
-                for a in object_position
-            ]
-
-            # if the magnitude of the object position is 0, ignore it
-            if sum([a**2 for a in object_position]) < 0.001:
-                continue
-
-            # dot product of the camera vector and the object position
-            dot_product = sum([a * b for a, b in zip(camera_vector, object_position)])
-
-            # calculate an angle padding on both sides of the object to use as a threshold
-            angle = math.radians(15)
-            # set the threshold to the dot product - cos of the angle
-            threshold = math.cos(angle)
-
-            if dot_product > threshold:
-                occluded = True
-                break
-
-        if not occluded:
-            break
-
-        # Re-roll the orientation if occluded and try again
-        yaw = random.randint(orientation_data["yaw_min"], orientation_data["yaw_max"])
-        pitch = random.randint(
-            orientation_data["pitch_min"], orientation_data["pitch_max"]
-        )
+    # unit direction of each object, ignoring objects at the origin
+    directions = []
+    for obj in objects[1:]:
+        object_position = list(obj["transformed_position"])
+        object_position += [0] * (3 - len(object_position))
+        length = max(1e-6, sum([a**2 for a in object_position])) ** 0.5
+        direction = [a / length for a in object_position]
+        if sum([a**2 for a in direction]) >= 0.001:
+            directions.append(direction)
+
+    candidates = yaws
+    if directions:
+        # set the threshold to the cos of the angle padding on both sides of the object
+        threshold = math.cos(math.radians(15))
+
+        # largest alignment of each yaw with any object
+        alignment = np.maximum.reduce(np.array(directions) @ camera_vectors, axis=0)
+        candidates = yaws[alignment <= threshold]
+        if len(candidates) == 0:
+            candidates = yaws[alignment == alignment.min()]
+
+    yaw = candidates[rng.randrange(len(candidates))]
+    pitch = rng.randint(orientation_data["pitch_min"], orientation_data["pitch_max"])
 
     orientation = {
         "yaw": int(yaw),
@@ -822,71 +1020,54 @@ def generate_orientation(
     return orientation
 
 
-def generate_framing(camera_data: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Generate camera framing based on the camera data.
-    Copy codeArgs:
-        camera_data (Dict[str, Any]): Camera data.
-
-    Returns:
-        Dict[str, Any]: Camera framing.
-    """
-    # Get the min_fov and max_fov across all framings
-    fov_min = min([f["fov_min"] for f in camera_data["framings"]])
-    fov_max = max([f["fov_max"] for f in camera_data["framings"]])
-
-    # Randomly roll an FOV value between FOV_min and FOV_max
-    fov = int(random.uniform(fov_min, fov_max))
-
-    # Find the corresponding framing
-    framing = None
-    for f in camera_data["framings"]:
-        if f["fov_min"] <= fov <= f["fov_max"]:
-            framing = f
-            break
-
-    # Derive a coverage_factor between coverage_factor_min and coverage_factor_max
-    coverage_factor = random.uniform(
-        framing["coverage_factor_min"], framing["coverage_factor_max"]
-    )
-
-    framing = {
-        "fov": fov,
-        "coverage_factor": coverage_factor,
-        "name": framing["name"],
-    }
-    return framing
-
-
-def generate_animation(camera_data: Dict[str, Any]) -> Dict[str, Any]:
+def generate_animation(
+    camera_data: Dict[str, Any], rng=random, speed_factor: Optional[float] = None
+) -> Dict[str, Any]:
     """
     Generate camera animation based on the camera data.
     Copy codeArgs:
         camera_data (Dict[str, Any]): Camera data.
+        rng (random.Random): Random number generator to draw from.
+        speed_factor (Optional[float]): Speed factor drawn in advance. If None, it is drawn from rng.
 
     Returns:
         Dict[str, Any]: Camera animation.
     """
-    animation = random.choice(camera_data["animations"])
+    animation = rng.choice(camera_data["animations"])
     animation = animation.copy()
-    animation["speed_factor"] = random.uniform(0.5, 2.0)
+    if speed_factor is None:
+        speed_factor = rng.uniform(0.5, 2.0)
+    animation["speed_factor"] = speed_factor
     animation.pop("descriptions", None)
     return animation
 
 
 def generate_background(
-    background_dict, background_names, background_weights
+    background_dict,
+    background_names,
+    background_weights,
+    rng=random,
+    context: Optional[CombinerContext] = None,
 ) -> Dict[str, Any]:
     """
     Generate a random background.
 
+    Args:
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the precomputed background
+            samplers. If None, they are built from the other arguments.
+
     Returns:
         Dict[str, Any]: Generated background.
     """
-    chosen_background = random.choices(background_names, weights=background_weights)[0]
-    # Get the keys from the chosen background
-    background_keys = list(background_dict[chosen_background].keys())
-    background_id = random.choice(background_keys)
+    if context is not None:
+        chosen_background = context.background_sampler.sample(rng)
+        background_keys = context.background_keys[chosen_background]
+    else:
+        chosen_background = rng.choices(background_names, weights=background_weights)[0]
+        # Get the keys from the chosen background
+        background_keys = list(background_dict[chosen_background].keys())
+    background_id = rng.choice(background_keys)
     bg = background_dict[chosen_background][background_id]
 
     background = {
@@ -895,34 +1076,249 @@ def generate_background(
         "id": background_id,
         "from": chosen_background,
     }
+    # URLs of the HDRI at each resolution, so the renderer can pick the one it needs
+    if "urls" in bg:
+        background["urls"] = bg["urls"]
 
     return background
 
 
-def generate_stage(texture_data) -> Dict[str, Any]:
+def generate_stage(
+    texture_data,
+    rng=random,
+    context: Optional[CombinerContext] = None,
+    uv: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
     """
     Generate a random stage.
 
+    Args:
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the precomputed texture
+            sampler. If None, it is built from texture_data.
+        uv (Optional[Dict[str, Any]]): "uv_scale" and "uv_rotation" drawn in advance. If
+            None, they are drawn from rng.
+
     Returns:
         Dict[str, Any]: Generated stage.
     """
-    texture_names = list(texture_data.keys())
-    texture_weights = [len(texture_data[name]["maps"]) for name in texture_names]
-    chosen_texture = random.choices(texture_names, weights=texture_weights)[0]
+    if context is not None:
+        chosen_texture = context.texture_sampler.sample(rng)
+    else:
+        texture_names = list(texture_data.keys())
+        texture_weights = [len(texture_data[name]["maps"]) for name in texture_names]
+        chosen_texture = rng.choices(texture_names, weights=texture_weights)[0]
     maps = texture_data[chosen_texture]["maps"]
 
     material = {
         "name": texture_data[chosen_texture]["name"],
         "maps": maps,
     }
+    if uv is None:
+        uv = {
+            "uv_scale": [rng.uniform(0.8, 1.2), rng.uniform(0.8, 1.2)],
+            "uv_rotation": rng.uniform(0, 360),
+        }
     stage = {
         "material": material,
-        "uv_scale": [random.uniform(0.8, 1.2), random.uniform(0.8, 1.2)],
-        "uv_rotation": random.uniform(0, 360),
+        "uv_scale": uv["uv_scale"],
+        "uv_rotation": uv["uv_rotation"],
     }
     return stage
 
 
+def get_combination_rng(seed: int, index: int) -> random.Random:
+    """
+    Returns the random number generator of one combination.
+
+    Each combination draws from its own stream derived from the seed and its index, so
+    it doesn't depend on the combinations generated before it or on which process
+    generates it.
+
+    Args:
+        seed (int): Seed of the combination set.
+        index (int): Index of the combination.
+
+    Returns:
+        random.Random: The combination's random number generator.
+    """
+    return random.Random(f"{seed}-{index}")
+
+
+def add_object_locations(objects: List[Dict[str, Any]], object_index: ObjectIndex) -> None:
+    """
+    Plans where the objects of a combination are placed, from their footprints.
+
+    The render places the objects on the grid and brings them together the same way,
+    so it can use the stored locations instead of placing the objects itself. Objects
+    are left without locations if any of them hasn't been preprocessed by the current
+    pipeline.
+
+    Args:
+        objects (List[Dict[str, Any]]): Objects of the combination, with their
+            transformed positions. A "location" is added to each.
+        object_index (ObjectIndex): Index of preprocessed objects.
+
+    Returns:
+        None
+    """
+    records = {
+        uid: record
+        for uid, record in object_index.get_many(obj["uid"] for obj in objects).items()
+        if record["pipeline_version"] == PIPELINE_VERSION
+    }
+    locations = plan_layout(objects, records)
+    if locations is None:
+        return
+    for obj, location in zip(objects, locations):
+        obj["location"] = location
+
+
+def generate_combination(
+    index: int,
+    seed: int,
+    context: CombinerContext,
+    parameters: Optional[ScalarParameters] = None,
+) -> Dict[str, Any]:
+    """
+    Generate the combination at one index of a combination set.
+
+    Args:
+        index (int): Index of the combination.
+        seed (int): Seed of the combination set.
+        context (CombinerContext): Data, settings and samplers of the combiner.
+        parameters (Optional[ScalarParameters]): Scalar parameters drawn in bulk for a range
+            of combinations holding this index. If None, they are drawn for this index alone.
+
+    Returns:
+        Dict[str, Any]: The combination, the same as the one at this index in the whole set.
+    """
+    rng = get_combination_rng(seed, index)
+    camera_data = context.camera_data
+    if parameters is None:
+        parameters = ScalarParameters(camera_data, seed, index, index + 1)
+
+    objects = generate_objects(
+        context.object_data,
+        context.dataset_names,
+        context.dataset_weights,
+        context.dataset_dict,
+        context.captions_data,
+        context.ontop_data,
+        rng,
+        context,
+    )
+    background = generate_background(
+        context.background_dict,
+        context.background_names,
+        context.background_weights,
+        rng,
+        context,
+    )
+
+    # Calculate the transformed positions of the objects
+    adjusted_objects = adjust_positions(objects, rng.randint(0, 360))
+    for obj, adjusted_obj in zip(objects, adjusted_objects):
+        obj["transformed_position"] = adjusted_obj["transformed_position"]
+
+    if context.object_index is not None:
+        add_object_locations(objects, context.object_index)
+
+    orientation = generate_orientation(camera_data, objects, background, rng)
+
+    framing = parameters.framing(index)
+
+    postprocessing = parameters.postprocessing(index)
+
+    # speed is between 0.5 and 2
+    animation = generate_animation(camera_data, rng, parameters.animation_speed(index))
+
+    stage = generate_stage(context.texture_data, rng, context, parameters.stage_uv(index))
+
+    objects = add_movement_to_objects(objects, context.movement, context.max_speed, rng)
+
+    combination = {
+        "index": index,
+        "objects": objects,
+        "background": background,
+        "orientation": orientation,
+        "framing": framing,
+        "animation": animation,
+        "stage": stage,
+        "postprocessing": postprocessing,
+    }
+
+    combination["caption"] = generate_caption(
+        combination, context.object_data, camera_data, context.ontop_data, rng, context
+    )
+
+    return combination
+
+
+# combiner context and seed shared by every index, set once per worker process
+_worker_args = None
+
+
+def _init_worker(args: tuple) -> None:
+    global _worker_args
+    _worker_args = args
+
+
+def _generate_range(start: int, end: int) -> List[Dict[str, Any]]:
+    seed, context = _worker_args
+    parameters = ScalarParameters(context.camera_data, seed, start, end)
+    return [generate_combination(index, seed, context, parameters) for index in range(start, end)]
+
+
+def iter_combinations(
+    context: CombinerContext,
+    count: int,
+    seed: Optional[int],
+    processes: int = 1,
+    chunk_size: int = 1000,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generate random combinations of camera settings, objects, background, and stage one at a time.
+
+    Only the combinations being generated are held in memory, so any number of combinations
+    can be streamed to disk. With several processes, ranges of `chunk_size` indices are
+    generated in a process pool and yielded in index order. Every combination is drawn
+    from its own seeded stream, so the output is the same for any number of processes.
+
+    Args:
+        context (CombinerContext): Data, settings and samplers of the combiner.
+        count (int): Number of combinations to generate.
+        seed (Optional[int]): Seed for the random number generator.
+        processes (int): Number of processes to generate combinations in.
+        chunk_size (int): Number of combinations each process generates at a time.
+
+    Returns:
+        Iterator[Dict[str, Any]]: The generated combinations, in index order.
+    """
+    if seed is None:
+        seed = -1
+
+    if processes <= 1:
+        for start in range(0, count, chunk_size):
+            end = min(start + chunk_size, count)
+            parameters = ScalarParameters(context.camera_data, seed, start, end)
+            for i in range(start, end):
+                yield generate_combination(i, seed, context, parameters)
+        return
+
+    with ProcessPoolExecutor(
+        processes, initializer=_init_worker, initargs=((seed, context),)
+    ) as executor:
+        # keep a bounded number of chunks in flight so memory stays flat for any count
+        pending = deque()
+        for start in range(0, count, chunk_size):
+            pending.append(executor.submit(_generate_range, start, min(start + chunk_size, count)))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
 def generate_combinations(
     camera_data: Dict[str, Any],
     count: int,
@@ -938,7 +1334,9 @@ def generate_combinations(
     texture_data: Dict[str, Any],
     movement: str  = "none",  
     max_speed: float = 0.5,
-    ontop_data: str = "none"
+    ontop_data: str = "none",
+    processes: int = 1,
+    max_number_of_objects: int = MAX_NUMBER_OF_OBJECTS,
 ) -> Dict[str, Any]:
     """
     Generate random combinations of camera settings, objects, background, and stage.
@@ -947,67 +1345,55 @@ def generate_combinations(
         camera_data (Dict[str, Any]): Camera data.
         count (int): Number of combinations to generate.
         seed (Optional[int]): Seed for the random number generator.
+        processes (int): Number of processes to generate combinations in.
+        max_number_of_objects (int): Maximum number of objects in a combination.
 
     Returns:
         Dict[str, Any]: Generated combinations data.
     """
+    context = CombinerContext(
+        camera_data=camera_data,
+        object_data=object_data,
+        dataset_dict=dataset_dict,
+        captions_data=captions_data,
+        background_dict=background_dict,
+        background_names=background_names,
+        background_weights=background_weights,
+        texture_data=texture_data,
+        dataset_names=dataset_names,
+        dataset_weights=dataset_weights,
+        max_number_of_objects=max_number_of_objects,
+        movement=movement,
+        max_speed=max_speed,
+        ontop_data=ontop_data,
+    )
+    combinations = list(iter_combinations(context, count, seed, processes=processes))
+
     if seed is None:
         seed = -1
-    random.seed(seed)
-
-    combinations = []
-
-    # Generate combinations on the fly up to the specified count
-    for i in range(count):
-        objects = generate_objects(
-            object_data, dataset_names, dataset_weights, dataset_dict, captions_data, ontop_data
-        )
-        background = generate_background(
-            background_dict, background_names, background_weights
-        )
-
-        # Calculate the transformed positions of the objects
-        adjusted_objects = adjust_positions(objects, random.randint(0, 360))
-        for obj, adjusted_obj in zip(objects, adjusted_objects):
-            obj["transformed_position"] = adjusted_obj["transformed_position"]
-
-        orientation = generate_orientation(camera_data, objects, background)
-
-        framing = generate_framing(camera_data)
-
-        postprocessing = generate_postprocessing(camera_data)
-
-        animation = generate_animation(camera_data)  # speed is between 0.5 and 2
-
-        stage = generate_stage(texture_data)
-
-        objects = add_movement_to_objects(objects, movement, max_speed)
-
-        combination = {
-            "index": i,
-            "objects": objects,
-            "background": background,
-            "orientation": orientation,
-            "framing": framing,
-            "animation": animation,
-            "stage": stage,
-            "postprocessing": postprocessing,
-        }
-
-        combination["caption"] = generate_caption(combination, object_data, camera_data, ontop_data)
-
-        combinations.append(combination)
-
     data = {"seed": seed, "count": count, "combinations": combinations}
 
     return data
 
 def generate_objects(
-    object_data, dataset_names, dataset_weights, dataset_dict, captions_data, ontop_data
+    object_data,
+    dataset_names,
+    dataset_weights,
+    dataset_dict,
+    captions_data,
+    ontop_data,
+    rng=random,
+    context: Optional[CombinerContext] = None,
 ) -> List[Dict[str, Any]]:
     """
     Generate a list of random objects.
 
+    Args:
+        rng (random.Random): Random number generator to draw from.
+        context (Optional[CombinerContext]): Context holding the maximum number of objects
+            and the precomputed scale sampler. If None, the scale sampler is built from
+            object_data and up to MAX_NUMBER_OF_OBJECTS objects are generated.
+
     Returns:
         List[Dict[str, Any]]: List of generated objects.
     """
@@ -1016,48 +1402,32 @@ def generate_objects(
     if chosen_dataset not in dataset_dict:
         raise KeyError(f"Dataset '{chosen_dataset}' not found in dataset_dict")
 
-    # Randomly generate max_number_of_objects
-    max_number_of_objects = parse_args().max_number_of_objects
-    number_of_objects = random.randint(1, max_number_of_objects)
-
-    object_scales = object_data["scales"]
-
-    # Scale values
-    scale_values = [scale["factor"] for scale in object_scales.values()]
-
-    # Create simple triangular distribution based on scale_values
-    len_scale_values = len(scale_values)
-    mid_point = len_scale_values // 2
-    if len_scale_values % 2 == 0:
-        weights = [i + 1 for i in range(mid_point)] + [
-            mid_point - i for i in range(mid_point)
-        ]
+    if context is not None:
+        max_number_of_objects = context.max_number_of_objects
+        scale_sampler = context.scale_sampler
     else:
-        weights = (
-            [i + 1 for i in range(mid_point)]
-            + [mid_point + 1]
-            + [mid_point - i for i in range(mid_point)]
-        )
+        max_number_of_objects = MAX_NUMBER_OF_OBJECTS
+        scale_sampler = get_scale_sampler(object_data["scales"])
 
-    total_weight = sum(weights)
-    normalized_weights = [w / total_weight for w in weights]
+    # Randomly generate max_number_of_objects
+    number_of_objects = rng.randint(1, max_number_of_objects)
 
     objects = []
     positions_taken = set()
+    failed_uids = context.failed_uids if context is not None else ()
+
     for i in range(number_of_objects):
-        object_uid = random.choice(dataset_dict[chosen_dataset])
+        object_uid = rng.choice(dataset_dict[chosen_dataset])
+        while object_uid in failed_uids:
+            object_uid = rng.choice(dataset_dict[chosen_dataset])
         object_description = captions_data[object_uid]
-        
-        scale_choice = random.choices(
-            list(object_scales.items()), weights=normalized_weights, k=1
-        )[0]
-        scale_key = scale_choice[0]
-        scale_value = scale_choice[1]
+
+        scale_key, scale_value = scale_sampler.sample(rng)
 
         scale = {
             "factor": scale_value["factor"],
             "name": scale_key,
-            "name_synonym": random.choice(scale_value["names"]),
+            "name_synonym": rng.choice(scale_value["names"]),
         }
 
         if i == 0:
@@ -1067,7 +1437,7 @@ def generate_objects(
             possible_positions = [
                 pos for pos in range(0, 9) if pos not in positions_taken or ontop_data == "all"
             ]
-            placement = random.choice(possible_positions)
+            placement = rng.choice(possible_positions)
             positions_taken.add(placement)
 
         object = {
@@ -1086,61 +1456,37 @@ def generate_objects(
 if __name__ == "__main__":
     args = parse_args()
 
-    # Load only cap3d dataset
-    cap3d_data_path = args.cap3d_captions_path
-    logger.info(f"Loading {cap3d_data_path}")
-    cap3d_data = read_json_file(cap3d_data_path)
-    logger.info(f"Loaded {len(cap3d_data)} unique entries from cap3d")
-
-    # Ensure the dataset_dict contains only cap3d data
-    dataset_dict = {"cap3d": list(cap3d_data.keys())}
-
-    object_data = read_json_file(args.object_data_path)
-    captions_data = read_json_file(args.cap3d_captions_path)
-    stage_data = read_json_file(args.stage_data_path)
-    texture_data = read_json_file(args.texture_data_path)
-    camera_data = read_json_file(args.camera_file_path)
-    movement_data = args.movement
-    ontop_data = args.ontop
-    speed = 1.0
-
-    # Load backgrounds
-    backgrounds = read_json_file(args.datasets_path)["backgrounds"]
-    background_dict = {}
-    for bg in backgrounds:
-        bg_path = os.path.join(args.simdata_path, bg + ".json")
-        logger.info(f"Loading {bg_path}")
-        if os.path.exists(bg_path):
-            background_data = read_json_file(bg_path)
-            background_dict[bg] = background_data
-            logger.info(f"Loaded {len(background_data)} entries from {bg}")
-        else:
-            logger.info(f"Dataset file {bg_path} not found")
-
-    background_names = list(background_dict.keys())
-    background_weights = [len(background_dict[name]) for name in background_names]
-
-    # Generate combinations
-    combinations = generate_combinations(
-        camera_data,
-        args.count,
-        args.seed,
-        ["cap3d"],  # Use only the cap3d dataset
-        [1],  # Weight for the cap3d dataset
-        object_data,
-        dataset_dict,
-        captions_data,
-        background_dict,
-        background_names,
-        background_weights,
-        texture_data,
-        movement_data,
-        speed,
-        ontop_data
+    context = CombinerContext.from_files(
+        camera_file_path=args.camera_file_path,
+        object_data_path=args.object_data_path,
+        texture_data_path=args.texture_data_path,
+        datasets_path=args.datasets_path,
+        cap3d_captions_path=args.cap3d_captions_path,
+        simdata_path=args.simdata_path,
+        stage_data_path=args.stage_data_path,
+        max_number_of_objects=args.max_number_of_objects,
+        movement=args.movement,
+        ontop_data=args.ontop,
+        object_index_path=args.object_index_path,
     )
+    seed = -1 if args.seed is None else args.seed
+    combinations = iter_combinations(context, args.count, seed, processes=args.processes)
+
+    if args.shard_size > 0:
+        # Stream combinations into shards so memory stays flat for any count
+        shard_dir = os.path.splitext(args.output_path)[0]
+        output_path = write_shards(combinations, shard_dir, args.shard_size, seed, args.count)
+    elif args.output_path.endswith(STORE_EXTENSION):
+        # Stream combinations into an indexed combination store
+        output_path = args.output_path
+        with CombinationWriter(output_path) as writer:
+            for combination in combinations:
+                writer.write(combination)
+    else:
+        # Write to JSON file
+        output_path = args.output_path
+        data = {"seed": seed, "count": args.count, "combinations": list(combinations)}
+        with open(output_path, "w") as f:
+            json.dump(data, f, indent=4)
 
-    # Write to JSON file
-    with open(args.output_path, "w") as f:
-        json.dump(combinations, f, indent=4)
-
-    logger.info(f"Combinations have been successfully written to {args.output_path}")
+    logger.info(f"Combinations have been successfully written to {output_path}")
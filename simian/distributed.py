@@ -1,5 +1,4 @@
 import argparse
-import json
 import logging
 import os
 import time
@@ -8,6 +7,7 @@ from typing import Dict
 
 from distributaur.distributaur import Distributaur
 
+from .store import open_combinations
 from .worker import run_job
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
@@ -56,10 +56,8 @@ if __name__ == "__main__":
             or int(env_vars.get("RENDER_BATCH_SIZE", 1)),
         }
 
-        # Load combinations from file
-        with open(settings["combinations_file"], "r") as f:
-            combinations = json.load(f)
-            settings["combinations"] = combinations["combinations"]
+        # Open the combinations as an indexed store so only submitted combinations are parsed
+        settings["combinations"] = open_combinations(settings["combinations_file"])
 
         return settings
 
@@ -152,11 +150,9 @@ if __name__ == "__main__":
                             min(combination_index + batch_size, settings["end_index"])
                         )
                     ],
-                    "combinations": [
-                        job_config["combinations"][index]
-                        for index in range(
-                            combination_index, 
-                            min(combination_index + batch_size, settings["end_index"])
+                    "combinations": job_config["combinations"][
+                        combination_index : min(
+                            combination_index + batch_size, settings["end_index"]
                         )
                     ],
                     "width": job_config["width"],
@@ -202,7 +198,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Simian CLI")
     parser.add_argument("--start-index", type=int, help="Starting index for rendering")
     parser.add_argument(
-        "--combinations-file", help="Path to the combinations JSON file"
+        "--combinations-file",
+        help="Path to the combination store or combinations JSON file",
     )
     parser.add_argument("--end_index", type=int, help="Ending index for rendering")
     parser.add_argument("--start_frame", type=int, help="Starting frame number")
@@ -0,0 +1,104 @@
+import os
+import threading
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# seconds to connect, and to wait for each chunk once connected
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+# connections kept alive per host, enough for every parallel download of a process
+MAX_CONNECTIONS = 16
+DOWNLOAD_RETRIES = 3
+
+_CHUNK_SIZE = 1 << 20
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def create_session() -> requests.Session:
+    """
+    Creates an HTTP session with pooled keep-alive connections and retries.
+
+    Connection errors, read errors and 5xx or 429 responses are retried with exponential
+    backoff before the download fails.
+
+    Returns:
+        requests.Session: The session.
+    """
+    retry = Retry(
+        total=DOWNLOAD_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+    )
+    adapter = HTTPAdapter(
+        pool_connections=MAX_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the HTTP session shared by the downloads of this process.
+
+    Downloads to the same host reuse its open connections instead of each starting a new
+    TCP and TLS handshake. A forked process gets its own session, since connections
+    can't be shared between processes.
+
+    Returns:
+        requests.Session: The session.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = create_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def download_file(
+    url: str, path: str, throttle: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Downloads a file with the shared session.
+
+    The response is streamed to a temporary file in chunks, so large files are never
+    held in memory, and renamed into place, so a reader never sees a partial download.
+
+    Args:
+        url (str): URL of the file.
+        path (str): Local path to save it to.
+        throttle (Optional[Callable[[int], None]]): Called with the size of every chunk
+            before it is written, to limit the bandwidth.
+
+    Returns:
+        int: Number of bytes downloaded.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    size = 0
+    try:
+        with get_session().get(
+            url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            with open(temp_path, "wb") as file:
+                for chunk in response.iter_content(_CHUNK_SIZE):
+                    if throttle is not None:
+                        throttle(len(chunk))
+                    file.write(chunk)
+                    size += len(chunk)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return size
@@ -0,0 +1,110 @@
+from typing import Iterable, Tuple
+
+import bpy
+import numpy as np
+
+
+def get_matrix(obj: bpy.types.Object) -> np.ndarray:
+    """
+    Returns the world matrix of an object as an array.
+
+    Args:
+        obj (bpy.types.Object): The object.
+
+    Returns:
+        np.ndarray: The 4x4 world matrix.
+    """
+    return np.array(obj.matrix_world, dtype=np.float64)
+
+
+def transform_points(points: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    Applies a 4x4 transformation matrix to points, as one matrix multiply.
+
+    Args:
+        points (np.ndarray): Points of shape (n, 3).
+        matrix (np.ndarray): The 4x4 matrix.
+
+    Returns:
+        np.ndarray: The transformed points, of shape (n, 3).
+    """
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def get_local_bbox_corners(obj: bpy.types.Object) -> np.ndarray:
+    """
+    Returns the corners of the bounding box of an object in its local space.
+
+    Args:
+        obj (bpy.types.Object): The object.
+
+    Returns:
+        np.ndarray: The 8 corners, of shape (8, 3).
+    """
+    corners = np.empty(24, dtype=np.float32)
+    obj.bound_box.foreach_get(corners)
+    return corners.reshape(8, 3).astype(np.float64)
+
+
+def get_world_bbox_corners(obj: bpy.types.Object) -> np.ndarray:
+    """
+    Returns the corners of the bounding box of an object in world space.
+
+    Args:
+        obj (bpy.types.Object): The object.
+
+    Returns:
+        np.ndarray: The 8 corners, of shape (8, 3).
+    """
+    return transform_points(get_local_bbox_corners(obj), get_matrix(obj))
+
+
+def get_vertex_coordinates(obj: bpy.types.Object) -> np.ndarray:
+    """
+    Returns the coordinates of the vertices of a mesh in its local space.
+
+    Args:
+        obj (bpy.types.Object): The mesh object.
+
+    Returns:
+        np.ndarray: The vertex coordinates, of shape (n, 3).
+    """
+    vertices = obj.data.vertices
+    coordinates = np.empty(len(vertices) * 3, dtype=np.float32)
+    vertices.foreach_get("co", coordinates)
+    return coordinates.reshape(-1, 3).astype(np.float64)
+
+
+def get_world_points(obj: bpy.types.Object, use_vertices: bool = False) -> np.ndarray:
+    """
+    Returns the points that bound an object in world space.
+
+    Args:
+        obj (bpy.types.Object): The object.
+        use_vertices (bool): Use the vertices of meshes instead of the corners of their
+            bounding box, for bounds that fit rotated objects tightly.
+
+    Returns:
+        np.ndarray: The points, of shape (n, 3).
+    """
+    if use_vertices and obj.type == "MESH" and len(obj.data.vertices):
+        return transform_points(get_vertex_coordinates(obj), get_matrix(obj))
+    return get_world_bbox_corners(obj)
+
+
+def get_world_bounds(
+    objects: Iterable[bpy.types.Object], use_vertices: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the axis-aligned bounds of objects in world space.
+
+    Args:
+        objects (Iterable[bpy.types.Object]): The objects.
+        use_vertices (bool): Bound the vertices of meshes instead of the corners of
+            their bounding boxes.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The minimum and maximum coordinates.
+    """
+    points = np.concatenate([get_world_points(obj, use_vertices) for obj in objects])
+    return points.min(axis=0), points.max(axis=0)
@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "journal.jsonl"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobJournal:
+    """
+    On-disk record of the render state of each combination index.
+
+    The journal lives in the output directory as a JSON-lines file with one entry per
+    state change: the index, its state (pending, running, done or failed), the number
+    of attempts so far, its output paths and the last error. Every entry is flushed and
+    fsynced before the call returns, so a crash loses at most the entry being written.
+
+    When a journal is opened, entries are replayed to get the latest state of each
+    index, and the file is compacted to one line per index. Indices left running by a
+    crashed run are treated as failed attempts.
+
+    Args:
+        output_dir (str): Directory holding the renders and the journal.
+        filename (str): Name of the journal file. Defaults to "journal.jsonl".
+    """
+
+    def __init__(self, output_dir: str, filename: str = JOURNAL_FILE) -> None:
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, filename)
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self._load()
+        self._compact()
+        self._file = open(self.path, "a")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be cut short if the previous run was killed
+                    logger.info(f"Skipping incomplete journal entry: {line.strip()}")
+                    continue
+                self.entries[entry["index"]] = entry
+
+        for entry in self.entries.values():
+            if entry["state"] == RUNNING:
+                entry["state"] = FAILED
+                entry["error"] = "Interrupted before the render finished"
+
+    def _compact(self) -> None:
+        # rewrite the journal with only the latest entry per index, atomically
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            for index in sorted(self.entries):
+                file.write(json.dumps(self.entries[index]) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            self.entries[entry["index"]] = entry
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _update(self, index: int, **fields) -> None:
+        with self._lock:
+            entry = {**self.get(index), **fields, "index": index, "time": time.time()}
+            self._write([entry])
+
+    def get(self, index: int) -> Dict[str, Any]:
+        """
+        Returns the latest journal entry of an index.
+
+        Args:
+            index (int): The combination index.
+
+        Returns:
+            Dict[str, Any]: The entry, a pending entry with no attempts if the index is
+            not in the journal.
+        """
+        return self.entries.get(
+            index,
+            {"index": index, "state": PENDING, "attempts": 0, "outputs": [], "error": None},
+        )
+
+    def add(self, indices: Iterable[int]) -> None:
+        """
+        Records the indices that are not in the journal yet as pending.
+
+        Args:
+            indices (Iterable[int]): Combination indices planned for rendering.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            new_entries = [self.get(index) for index in indices if index not in self.entries]
+            if new_entries:
+                self._write(new_entries)
+
+    def start(self, index: int) -> None:
+        """
+        Marks an index as running and counts a new attempt.
+
+        Args:
+            index (int): The combination index.
+
+        Returns:
+            None
+        """
+        self._update(index, state=RUNNING, attempts=self.get(index)["attempts"] + 1)
+
+    def finish(self, index: int, outputs: List[str]) -> None:
+        """
+        Marks an index as done.
+
+        Args:
+            index (int): The combination index.
+            outputs (List[str]): Paths of the files rendered for the index.
+
+        Returns:
+            None
+        """
+        self._update(index, state=DONE, outputs=outputs, error=None)
+
+    def fail(self, index: int, error: Optional[str] = None) -> None:
+        """
+        Marks an index as failed.
+
+        Args:
+            index (int): The combination index.
+            error (Optional[str]): Why the render failed.
+
+        Returns:
+            None
+        """
+        self._update(index, state=FAILED, error=error)
+
+    def is_done(self, index: int) -> bool:
+        """
+        Checks if an index finished and all of its outputs are still on disk.
+
+        Args:
+            index (int): The combination index.
+
+        Returns:
+            bool: True if the index does not need to be rendered again.
+        """
+        entry = self.get(index)
+        return (
+            entry["state"] == DONE
+            and len(entry["outputs"]) > 0
+            and all(os.path.exists(path) for path in entry["outputs"])
+        )
+
+    def remaining(self, indices: Iterable[int], max_attempts: int) -> List[int]:
+        """
+        Selects the indices that still need to be rendered.
+
+        Args:
+            indices (Iterable[int]): Candidate combination indices.
+            max_attempts (int): Indices that failed this many times are given up on.
+
+        Returns:
+            List[int]: Indices that are not done and have attempts left.
+        """
+        return [
+            index
+            for index in indices
+            if not self.is_done(index) and self.get(index)["attempts"] < max_attempts
+        ]
+
+    def close(self) -> None:
+        """
+        Closes the journal file.
+
+        Returns:
+            None
+        """
+        self._file.close()
+
+    def __enter__(self) -> "JobJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
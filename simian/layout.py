@@ -0,0 +1,211 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# gap kept between the XY bounding boxes of objects brought together
+PADDING = 0.08
+
+
+def get_contact_distance(
+    box: np.ndarray,
+    direction: np.ndarray,
+    other_boxes: np.ndarray,
+    max_distance: float,
+    padding: float = PADDING,
+) -> float:
+    """Find how far a 2D bounding box can move along a direction before it overlaps others.
+
+    Each axis gives the interval of distances at which the moving box overlaps another box
+    on that axis. The boxes overlap where the intervals of both axes do, so the first
+    contact is the earliest start of such an overlap ahead of the box.
+
+    Args:
+        box (np.ndarray): The moving box, as (min_x, min_y, max_x, max_y).
+        direction (np.ndarray): The unit XY direction to move along.
+        other_boxes (np.ndarray): The boxes to avoid, of shape (n, 4).
+        max_distance (float): Distance to stop at if nothing is in the way.
+        padding (float, optional): Gap to keep between the boxes. Defaults to 0.08.
+
+    Returns:
+        float: Distance to move, 0 if the box already overlaps another one.
+    """
+    if len(other_boxes) == 0:
+        return max_distance
+
+    lower = other_boxes[:, :2] - padding - box[2:]
+    upper = other_boxes[:, 2:] + padding - box[:2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = lower / direction
+        t2 = upper / direction
+    enter = np.minimum(t1, t2)
+    exit = np.maximum(t1, t2)
+
+    # on an axis the box doesn't move along, it overlaps always or never
+    still = direction == 0
+    overlapping = (lower <= 0) & (upper >= 0)
+    enter = np.where(still, np.where(overlapping, -np.inf, np.inf), enter)
+    exit = np.where(still, np.where(overlapping, np.inf, -np.inf), exit)
+
+    enter = enter.max(axis=1)
+    exit = exit.min(axis=1)
+    hits = (enter <= exit) & (exit > 0)
+    if not hits.any():
+        return max_distance
+    return float(min(max(enter[hits].min(), 0), max_distance))
+
+
+def get_approach_distances(
+    distance: float, height: float = 0.0, max_iterations: int = 1000
+) -> np.ndarray:
+    """Distances travelled by an object stepping toward the origin.
+
+    Each step covers a tenth of the remaining distance to the origin, at most 0.5, so
+    objects approach in big steps and slow down near the origin.
+
+    Args:
+        distance (float): XY distance of the object to the origin.
+        height (float, optional): Z location of the object, counted in the remaining
+            distance. Defaults to 0.
+        max_iterations (int, optional): Maximum number of steps. Defaults to 1000.
+
+    Returns:
+        np.ndarray: Distance travelled after each step, starting with 0 and never past
+        the origin.
+    """
+    travelled = [0.0]
+    for _ in range(max_iterations):
+        remaining = distance - travelled[-1]
+        step = min(math.hypot(remaining, height) / 10, 0.5)
+        # stop before passing the origin, or once the steps are too small to move
+        if travelled[-1] + step >= distance or travelled[-1] + step == travelled[-1]:
+            break
+        travelled.append(travelled[-1] + step)
+    return np.array(travelled)
+
+
+def bring_to_origin(locations: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """Bring objects to the origin while avoiding collisions.
+
+    Objects are moved in order, each straight toward the origin in shrinking steps until
+    the next step would bring its XY bounding box within padding of another object's. The
+    first contact along the approach is computed in closed form, so no step passes through
+    another object.
+
+    Args:
+        locations (np.ndarray): Locations of the objects, of shape (n, 3).
+        boxes (np.ndarray): XY bounding boxes of the objects at those locations, as
+            (min_x, min_y, max_x, max_y) rows.
+
+    Returns:
+        np.ndarray: The new locations, of shape (n, 3). Heights are unchanged.
+    """
+    locations = np.array(locations, dtype=np.float64)
+    boxes = np.array(boxes, dtype=np.float64)
+    others = np.ones(len(locations), dtype=bool)
+
+    for i in range(len(locations)):
+        distance_to_origin = float(np.linalg.norm(locations[i, :2]))
+        if distance_to_origin == 0:
+            continue
+
+        direction = -locations[i, :2] / distance_to_origin
+        others[i] = False
+        contact = get_contact_distance(boxes[i], direction, boxes[others], distance_to_origin)
+        others[i] = True
+
+        # stop at the last step short of the contact
+        steps = get_approach_distances(distance_to_origin, locations[i, 2])
+        distance = steps[np.searchsorted(steps, contact, side="left") - 1] if contact > 0 else 0.0
+
+        offset = direction * distance
+        locations[i, :2] += offset
+        boxes[i] += np.tile(offset, 2)
+
+    return locations
+
+
+def get_footprint(record: Dict[str, Any], scale_factor: float) -> Tuple[np.ndarray, float]:
+    """Get the footprint and height of an object as it is rendered.
+
+    Renders scale each object so that its largest dimension becomes 1 / `scale_factor`,
+    around its pivot, which its preprocessed mesh may be off-center from.
+
+    Args:
+        record (Dict[str, Any]): Object index record of the object.
+        scale_factor (float): Scale factor of the object in the combination.
+
+    Returns:
+        Tuple[np.ndarray, float]: The XY bounding box relative to the pivot, as
+        (min_x, min_y, max_x, max_y), and the height.
+    """
+    dimensions = np.array([record["width"], record["depth"], record["height"]])
+    scale = 1 / (scale_factor * dimensions.max())
+    center = np.array([record["center_x"], record["center_y"]])
+    half = dimensions[:2] / 2
+    return np.concatenate([center - half, center + half]) * scale, dimensions[2] * scale
+
+
+def place_on_grid(
+    positions: Sequence[Sequence[float]], footprints: np.ndarray, heights: Sequence[float]
+) -> np.ndarray:
+    """Place objects on a grid and bring them together, as renders do.
+
+    Each object goes to its rounded grid position, spaced by the largest width or depth
+    of the objects, on top of the objects placed at the same grid position before it.
+    The objects are then brought to the origin.
+
+    Args:
+        positions (Sequence[Sequence[float]]): Transformed grid position of each object.
+        footprints (np.ndarray): XY bounding box of each object relative to its pivot,
+            as (min_x, min_y, max_x, max_y) rows.
+        heights (Sequence[float]): Height of each object.
+
+    Returns:
+        np.ndarray: Location of each object, of shape (n, 3).
+    """
+    footprints = np.asarray(footprints, dtype=np.float64).reshape(-1, 4)
+    largest_length = float((footprints[:, 2:] - footprints[:, :2]).max()) if len(footprints) else 0
+
+    grid_heights = {}
+    locations = []
+    for position, height in zip(positions, heights):
+        grid_pos = (round(position[0]), round(position[1]))
+        z_position = grid_heights.get(grid_pos, 0)
+        locations.append((grid_pos[0] * largest_length, grid_pos[1] * largest_length, z_position))
+        grid_heights[grid_pos] = z_position + height
+
+    locations = np.array(locations, dtype=np.float64).reshape(-1, 3)
+    if len(locations) > 1:
+        locations = bring_to_origin(locations, footprints + np.tile(locations[:, :2], 2))
+    return locations
+
+
+def plan_layout(
+    objects: List[Dict[str, Any]], records: Dict[str, Dict[str, Any]]
+) -> Optional[List[List[float]]]:
+    """Plan the locations of the objects of a combination from their index records.
+
+    Args:
+        objects (List[Dict[str, Any]]): Objects of the combination, with their uid, scale
+            and transformed position.
+        records (Dict[str, Dict[str, Any]]): Object index record of each uid.
+
+    Returns:
+        Optional[List[List[float]]]: Location of each object, None if an object has no
+        valid record to plan with.
+    """
+    footprints = []
+    heights = []
+    for obj in objects:
+        record = records.get(obj["uid"])
+        if record is None or not record["valid"] or record.get("center_x") is None:
+            return None
+        if max(record["width"], record["depth"], record["height"]) <= 0:
+            return None
+        footprint, height = get_footprint(record, obj["scale"]["factor"])
+        footprints.append(footprint)
+        heights.append(height)
+
+    positions = [obj["transformed_position"] for obj in objects]
+    return place_on_grid(positions, np.array(footprints), heights).tolist()
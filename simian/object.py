@@ -1,8 +1,11 @@
 import logging
 from typing import List, Optional, Callable, Dict
 import bpy
+import numpy as np
 from mathutils import Vector
 
+from .geometry import get_world_bbox_corners, get_world_bounds
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -94,12 +97,14 @@ def delete_invisible_objects() -> None:
         bpy.data.collections.remove(col)
 
 
-def get_hierarchy_bbox(obj) -> tuple[float, float]:
+def get_hierarchy_bbox(obj, use_vertices: bool = False) -> tuple[float, float]:
     """
     Calculate the bounding box of an object and its children.
 
     Args:
         obj (bpy.types.Object): The root object.
+        use_vertices (bool): Bound the vertices of meshes instead of the corners of their
+            bounding boxes, which is tighter for rotated objects.
 
     Returns:
         tuple: A tuple containing the minimum and maximum coordinates of the bounding box.
@@ -107,47 +112,15 @@ def get_hierarchy_bbox(obj) -> tuple[float, float]:
     # Ensure the object's matrix_world is updated
     bpy.context.view_layer.update()
 
-    # Initialize min and max coordinates with extremely large and small values
-    min_coord = [float("inf"), float("inf"), float("inf")]
-    max_coord = [-float("inf"), -float("inf"), -float("inf")]
-
-    # Function to update min and max coordinates
-    def update_bounds(obj: bpy.types.Object) -> None:
-        """
-        Update the minimum and maximum coordinates based on the object's bounding box.
-
-        Args:
-            obj (bpy.types.Object): The object whose bounding box is to be updated.
-
-        Returns:
-            None
-        """
-        # Update the object's bounding box based on its world matrix
-        bbox_corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
-        for corner in bbox_corners:
-            for i in range(3):
-                min_coord[i] = min(min_coord[i], corner[i])
-                max_coord[i] = max(max_coord[i], corner[i])
-
-    # Recursive function to process each object
-    def process_object(obj: bpy.types.Object) -> None:
-        """
-        Recursively process each object and update bounding box coordinates.
-
-        Args:
-            obj (bpy.types.Object): The object to be processed.
-
-        Returns:
-            None
-        """
-        update_bounds(obj)
+    # Collect the object and all of its descendants
+    def collect(obj: bpy.types.Object) -> List[bpy.types.Object]:
+        objects = [obj]
         for child in obj.children:
-            process_object(child)
-
-    # Start processing from the root object
-    process_object(obj)
+            objects += collect(child)
+        return objects
 
-    return min_coord, max_coord
+    min_coord, max_coord = get_world_bounds(collect(obj), use_vertices)
+    return min_coord.tolist(), max_coord.tolist()
 
 
 def remove_small_geometry(
@@ -518,11 +491,8 @@ def set_pivot_to_bottom(obj: bpy.types.Object) -> None:
     center_of_mass = obj.location
 
     # Calculate the bounding box bottom
-    bbox_min = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box][0]
-    for corner in obj.bound_box:
-        world_corner = obj.matrix_world @ Vector(corner)
-        if world_corner.z < bbox_min.z:
-            bbox_min = world_corner
+    corners = get_world_bbox_corners(obj)
+    bbox_min = Vector(corners[np.argmin(corners[:, 2])])
 
     # Set origin to the center of mass
     bpy.ops.object.origin_set(type="ORIGIN_CENTER_OF_MASS", center="BOUNDS")
@@ -604,3 +574,32 @@ def unlock_objects(objs: List[bpy.types.Object]) -> None:
     """
     for obj in objs:
         obj.hide_select = False
+
+
+def preprocess_object(object_path: str) -> bpy.types.Object:
+    """
+    Loads a model and cleans it up into a single mesh with its pivot at the bottom.
+
+    Armatures and modifiers are applied, the meshes of the model are joined and
+    optimized, and the joined mesh is unparented and set down on the terrain.
+
+    Args:
+        object_path (str): Path to the model file.
+
+    Returns:
+        bpy.types.Object: The joined mesh.
+    """
+    load_object(object_path)
+    obj = [obj for obj in bpy.context.view_layer.objects.selected][0]
+
+    apply_and_remove_armatures()
+    apply_all_modifiers(obj)
+    join_objects_in_hierarchy(obj)
+    optimize_meshes_in_hierarchy(obj)
+
+    meshes = get_meshes_in_hierarchy(obj)
+    obj = meshes[0]
+
+    unparent_keep_transform(obj)
+    set_pivot_to_bottom(obj)
+    return obj
@@ -0,0 +1,127 @@
+import logging
+import os
+from typing import Optional
+
+import bpy
+
+from .asset_cache import AssetCache, get_asset_cache
+from .object import preprocess_object, set_pivot_to_bottom
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# bump whenever preprocess_object changes what it makes of a model, so meshes
+# preprocessed by an older version are made again instead of reused
+PIPELINE_VERSION = 1
+
+
+def get_preprocessed_key(object_path: str, cache: Optional[AssetCache] = None) -> str:
+    """
+    Returns the key a preprocessed object is cached under.
+
+    The key changes with the contents of the model file and with PIPELINE_VERSION, so a
+    cached mesh is never reused for a changed model or an updated pipeline. The hash of
+    the model is remembered in the asset cache index, so it is only computed again when
+    the file changes.
+
+    Args:
+        object_path (str): Path to the model file.
+        cache (Optional[AssetCache]): Cache remembering the hash. Defaults to the asset
+            cache of this process.
+
+    Returns:
+        str: The key, in the form of a URL for the asset cache.
+    """
+    digest = (cache or get_asset_cache()).get_file_hash(object_path)
+    return f"preprocessed://v{PIPELINE_VERSION}/{digest}.blend"
+
+
+def save_preprocessed_object(obj: bpy.types.Object, path: str) -> None:
+    """
+    Writes an object with its mesh, materials and images to a .blend library.
+
+    Args:
+        obj (bpy.types.Object): The object to save.
+        path (str): Path of the .blend file, replaced atomically.
+
+    Returns:
+        None
+    """
+    # images kept next to the original model wouldn't be found by later renders
+    for slot in obj.material_slots:
+        if slot.material is None or slot.material.node_tree is None:
+            continue
+        for node in slot.material.node_tree.nodes:
+            image = getattr(node, "image", None)
+            if image is not None and image.packed_file is None and image.source == "FILE":
+                try:
+                    image.pack()
+                except RuntimeError:
+                    logger.warning(f"Unable to pack image {image.name} of {obj.name}")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        bpy.data.libraries.write(temp_path, {obj}, path_remap="ABSOLUTE", compress=True)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def append_preprocessed_object(path: str) -> bpy.types.Object:
+    """
+    Appends a preprocessed object from a .blend library to the scene and selects it.
+
+    Args:
+        path (str): Path of the .blend file.
+
+    Returns:
+        bpy.types.Object: The appended object.
+    """
+    with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+        data_to.objects = data_from.objects
+    obj = data_to.objects[0]
+    bpy.context.collection.objects.link(obj)
+
+    bpy.ops.object.select_all(action="DESELECT")
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    return obj
+
+
+def load_preprocessed_object(
+    object_path: str, cache: Optional[AssetCache] = None
+) -> bpy.types.Object:
+    """
+    Loads a model cleaned up by preprocess_object, preprocessing it only once.
+
+    The first time a model is seen it is preprocessed and the resulting mesh is saved to
+    the asset cache, where it counts towards the size budget like any downloaded asset.
+    Later loads append the saved mesh instead of importing and cleaning up the model
+    again. Only the joined mesh is saved, not the empties or other objects of the model.
+
+    Args:
+        object_path (str): Path to the model file.
+        cache (Optional[AssetCache]): Cache to save the mesh to. Defaults to the asset
+            cache of this process.
+
+    Returns:
+        bpy.types.Object: The joined mesh, with its pivot at the bottom.
+    """
+    cache = cache or get_asset_cache()
+    preprocessed = []
+
+    def preprocess(url, path, throttle=None):
+        obj = preprocess_object(object_path)
+        preprocessed.append(obj)
+        save_preprocessed_object(obj, path)
+
+    path = cache.fetch(get_preprocessed_key(object_path, cache), "preprocessed", preprocess)
+    if preprocessed:
+        return preprocessed[0]
+
+    obj = append_preprocessed_object(path)
+    # set down again, on the terrain of this scene rather than the one it was saved in
+    set_pivot_to_bottom(obj)
+    return obj
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .asset_cache import CACHE_DIR_ENV, DEFAULT_CACHE_DIR
+
+OBJECT_INDEX_FILE = "object-index.sqlite"
+
+# every column of the index, in table order
+OBJECT_INDEX_FIELDS = [
+    "uid",
+    "valid",
+    "width",
+    "depth",
+    "height",
+    "center_x",
+    "center_y",
+    "faces",
+    "vertices",
+    "materials",
+    "import_time",
+    "error",
+    "pipeline_version",
+    "updated",
+]
+
+# SQLite limits the number of parameters of a query
+_LOOKUP_CHUNK_SIZE = 500
+
+
+def get_default_index_path() -> str:
+    """
+    Returns the default path of the object index, next to the asset cache.
+
+    Returns:
+        str: Path in $SIMIAN_CACHE_DIR, or ~/.cache/simian.
+    """
+    return os.path.join(os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR, OBJECT_INDEX_FILE)
+
+
+class ObjectIndex:
+    """
+    SQLite index of the metadata of preprocessed objects.
+
+    `simian.preprocess` records, for every object uid, whether the object could be
+    imported and cleaned up, the width, depth and height of its world bounding box at
+    the scale of the model file, the XY center of the box relative to the pivot of the
+    preprocessed mesh, its face, vertex and material counts, and how long preprocessing
+    took. The combiner and the renders can then look up the footprint, cost and
+    validity of an object without opening Blender.
+
+    Records are dicts with the keys of OBJECT_INDEX_FIELDS. `valid` is a bool and
+    `error` holds the reason an object failed. The dimensions and counts are None for
+    failed objects.
+
+    Args:
+        path (Optional[str]): Path of the index file. Defaults to object-index.sqlite in
+            the asset cache directory.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or get_default_index_path()
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections can't be shared with forked processes, each opens its own
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            # preprocessing processes write to the index at the same time
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                "uid TEXT PRIMARY KEY, valid INTEGER NOT NULL, "
+                "width REAL, depth REAL, height REAL, center_x REAL, center_y REAL, "
+                "faces INTEGER, vertices INTEGER, materials INTEGER, "
+                "import_time REAL, error TEXT, "
+                "pipeline_version INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+            # indices written before the footprint centers were recorded lack them
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(objects)")}
+            for column in ("center_x", "center_y"):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE objects ADD COLUMN {column} REAL")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # combiner worker processes get the path and open their own connection
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"])
+
+    def _to_record(self, row: tuple) -> Dict[str, Any]:
+        record = dict(zip(OBJECT_INDEX_FIELDS, row))
+        record["valid"] = bool(record["valid"])
+        return record
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """
+        Adds the record of an object, replacing any earlier record of its uid.
+
+        Args:
+            record (Dict[str, Any]): The record. Missing fields are stored as None, and
+                `updated` defaults to the current time.
+
+        Returns:
+            None
+        """
+        record = {"updated": time.time(), **record}
+        values = [record.get(field) for field in OBJECT_INDEX_FIELDS]
+        values[OBJECT_INDEX_FIELDS.index("valid")] = int(bool(record["valid"]))
+        with self._lock:
+            self._connect().execute(
+                f"INSERT OR REPLACE INTO objects ({', '.join(OBJECT_INDEX_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(values))})",
+                values,
+            )
+
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up the record of an object.
+
+        Args:
+            uid (str): The object uid.
+
+        Returns:
+            Optional[Dict[str, Any]]: The record, None if the object isn't indexed.
+        """
+        return self.get_many([uid]).get(uid)
+
+    def get_many(self, uids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Looks up the records of several objects.
+
+        Args:
+            uids (Iterable[str]): The object uids.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The record of each indexed uid.
+        """
+        uids = list(uids)
+        records = {}
+        with self._lock:
+            for start in range(0, len(uids), _LOOKUP_CHUNK_SIZE):
+                chunk = uids[start : start + _LOOKUP_CHUNK_SIZE]
+                rows = self._connect().execute(
+                    f"SELECT {', '.join(OBJECT_INDEX_FIELDS)} FROM objects "
+                    f"WHERE uid IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for row in rows:
+                    records[row[0]] = self._to_record(row)
+        return records
+
+    def get_failed(self) -> Dict[str, str]:
+        """
+        Returns the objects that failed to preprocess.
+
+        Returns:
+            Dict[str, str]: The error of each failed uid.
+        """
+        with self._lock:
+            return dict(
+                self._connect().execute("SELECT uid, error FROM objects WHERE valid = 0 ORDER BY uid")
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Closes the index.
+
+        Returns:
+            None
+        """
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def __enter__(self) -> "ObjectIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,240 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from .asset_cache import AssetCache, get_asset_cache
+from .background import get_background_url
+from .scene import TEXTURE_MAPS
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class Asset(NamedTuple):
+    """
+    A remote file a combination needs at render time.
+
+    Args:
+        kind (str): "objects", "backgrounds" or "textures", the kind of asset in the cache.
+        url (str): URL of the file. For objects, the object uid.
+    """
+
+    kind: str
+    url: str
+
+
+class BandwidthLimiter:
+    """
+    Token bucket that caps the download rate shared by the prefetch downloads.
+
+    Up to one second of bandwidth can be spent in a burst; after that, `consume` sleeps
+    until the bytes it is given fit under the cap.
+
+    Args:
+        bytes_per_second (float): Maximum average download rate.
+    """
+
+    def __init__(self, bytes_per_second: float) -> None:
+        if bytes_per_second <= 0:
+            raise ValueError("The bandwidth cap must be positive")
+        self.bytes_per_second = bytes_per_second
+        self._available = bytes_per_second
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        """
+        Waits until `size` more bytes can be downloaded under the cap.
+
+        Args:
+            size (int): Number of bytes about to be written.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(
+                self.bytes_per_second,
+                self._available + (now - self._last) * self.bytes_per_second,
+            )
+            self._last = now
+            self._available -= size
+            delay = -self._available / self.bytes_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_combination_assets(
+    combination: Dict[str, Any], hdri_path: str = "backgrounds", width: Optional[int] = 1920
+) -> List[Asset]:
+    """
+    Lists the remote files a combination downloads while it is rendered.
+
+    Backgrounds already saved under `hdri_path`, which the renderer uses instead of the
+    asset cache, are left out.
+
+    Args:
+        combination (Dict[str, Any]): The combination.
+        hdri_path (str): Directory of locally saved background HDRs.
+        width (Optional[int]): Width of the render in pixels, which selects the
+            resolution of the background HDR.
+
+    Returns:
+        List[Asset]: The objects, background and stage textures of the combination.
+    """
+    assets = [Asset("objects", obj["uid"]) for obj in combination.get("objects", [])]
+
+    background = combination.get("background")
+    if background and background.get("url"):
+        local_path = f"{hdri_path}/{background['from']}/{background['id']}.hdr"
+        if not os.path.exists(local_path):
+            assets.append(Asset("backgrounds", get_background_url(combination, width)))
+
+    maps = combination.get("stage", {}).get("material", {}).get("maps", {})
+    assets += [Asset("textures", maps[key]) for key in TEXTURE_MAPS if key in maps]
+
+    return assets
+
+
+class Prefetcher:
+    """
+    Downloads the assets of upcoming combinations in a background thread.
+
+    The prefetcher walks the combinations in the order they will be rendered and fetches
+    their objects, background HDRs and stage textures into the asset cache the renderer
+    reads from, so a render finds its files on disk instead of downloading them itself.
+    It stays at most `window` combinations ahead of the renders that have started, which
+    bounds the disk used by files that aren't needed yet.
+
+    A failed download is logged and skipped; the render downloads the file as usual.
+
+    Args:
+        combinations (Sequence[Dict[str, Any]]): The combinations, indexed like `indices`.
+            A combination store works as well as a list.
+        indices (Sequence[int]): Indices of the combinations, in render order.
+        window (int): Number of combinations to fetch ahead of the renders that have started.
+        max_bandwidth (Optional[float]): Cap of the download rate in bytes per second.
+            Unlimited if None.
+        hdri_path (str): Directory of locally saved background HDRs.
+        cache (Optional[AssetCache]): Cache to download to. Defaults to the asset cache of
+            this process.
+        width (Optional[int]): Width of the renders in pixels, which selects the
+            resolution of the background HDRs. Defaults to the width of the videos.
+    """
+
+    def __init__(
+        self,
+        combinations: Sequence[Dict[str, Any]],
+        indices: Sequence[int],
+        window: int = 8,
+        max_bandwidth: Optional[float] = None,
+        hdri_path: str = "backgrounds",
+        cache: Optional[AssetCache] = None,
+        width: Optional[int] = 1920,
+    ) -> None:
+        self.combinations = combinations
+        self.indices = list(indices)
+        self.window = window
+        self.hdri_path = hdri_path
+        self.cache = cache or get_asset_cache()
+        self.width = width
+        self.limiter = BandwidthLimiter(max_bandwidth) if max_bandwidth else None
+
+        # number of combinations started by the renders and fetched by the prefetcher
+        self.started = 0
+        self.prefetched = 0
+        self.failures = 0
+
+        self._fetched = set()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def mark_started(self, count: int = 1) -> None:
+        """
+        Records that renders started, which lets the prefetcher read further ahead.
+
+        Args:
+            count (int): Number of renders that started.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self.started += count
+            self._condition.notify_all()
+
+    def wait(self, prefetched: int, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until a number of combinations have been prefetched.
+
+        Args:
+            prefetched (int): Number of combinations to wait for.
+            timeout (Optional[float]): Maximum time to wait in seconds.
+
+        Returns:
+            bool: True if they were prefetched, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self.prefetched >= prefetched or not self._thread.is_alive(),
+                timeout,
+            ) and self.prefetched >= prefetched
+
+    def _run(self) -> None:
+        throttle = self.limiter.consume if self.limiter else None
+        for position, index in enumerate(self.indices):
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or position < self.started + self.window
+                )
+                if self._closed:
+                    return
+
+            for asset in get_combination_assets(
+                self.combinations[index], self.hdri_path, self.width
+            ):
+                if self._closed:
+                    return
+                if asset in self._fetched:
+                    continue
+                self._fetch(asset, throttle)
+                self._fetched.add(asset)
+
+            with self._condition:
+                self.prefetched += 1
+                self._condition.notify_all()
+
+    def _fetch(self, asset: Asset, throttle: Optional[Callable[[int], None]]) -> None:
+        try:
+            if asset.kind == "objects":
+                path = self.cache.fetch_object(asset.url, throttle)
+            else:
+                path = self.cache.fetch(asset.url, asset.kind, throttle=throttle)
+            # the renders pin the assets themselves once they fetch them
+            self.cache.release(path)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Prefetching {asset.kind} {asset.url} failed: {e}")
+
+    def close(self) -> None:
+        """
+        Stops prefetching. A download in progress is finished first.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,366 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import bpy
+import numpy as np
+
+from .asset_cache import CACHE_DIR_ENV, CACHE_SIZE_ENV, AssetCache, get_asset_cache
+from .batch import run_scheduler
+from .geometry import get_world_bbox_corners
+from .object import preprocess_object
+from .object_cache import PIPELINE_VERSION, get_preprocessed_key, save_preprocessed_object
+from .object_index import OBJECT_INDEX_FILE, ObjectIndex
+from .scene import initialize_scene, reset_scene
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# seconds between checks of the progress of a worker process
+WORKER_POLL_INTERVAL = 1.0
+
+
+def get_object_metadata(obj: bpy.types.Object) -> Dict[str, Any]:
+    """
+    Measures a preprocessed object.
+
+    Args:
+        obj (bpy.types.Object): The joined mesh of the object.
+
+    Returns:
+        Dict[str, Any]: The width, depth and height of its world bounding box, the XY
+        center of the box relative to the pivot, and its face, vertex and material counts.
+    """
+    bpy.context.view_layer.update()
+    corners = get_world_bbox_corners(obj)
+    width, depth, height = np.ptp(corners, axis=0).tolist()
+    center_x, center_y = ((corners.min(axis=0) + corners.max(axis=0))[:2] / 2).tolist()
+    return {
+        "width": width,
+        "depth": depth,
+        "height": height,
+        "center_x": center_x,
+        "center_y": center_y,
+        "faces": len(obj.data.polygons),
+        "vertices": len(obj.data.vertices),
+        "materials": len([slot for slot in obj.material_slots if slot.material is not None]),
+    }
+
+
+def preprocess_uid(uid: str, cache: Optional[AssetCache] = None) -> Dict[str, Any]:
+    """
+    Downloads and preprocesses an object, saving the preprocessed mesh to the asset cache.
+
+    Args:
+        uid (str): The object uid.
+        cache (Optional[AssetCache]): The asset cache. Defaults to the asset cache of this
+            process.
+
+    Returns:
+        Dict[str, Any]: The record of the object for the object index. If the object
+        couldn't be downloaded or preprocessed it is marked invalid, with the error.
+    """
+    cache = cache or get_asset_cache()
+    record = {"uid": uid, "pipeline_version": PIPELINE_VERSION}
+    try:
+        object_path = cache.fetch_object(uid)
+    except Exception as e:
+        logger.warning(f"Downloading {uid} failed: {e}")
+        return {**record, "valid": False, "error": f"Download failed: {e}"}
+
+    try:
+        start = time.perf_counter()
+        obj = preprocess_object(object_path)
+        import_time = time.perf_counter() - start
+        metadata = get_object_metadata(obj)
+
+        # later renders of the object append the mesh made here
+        cache.fetch(
+            get_preprocessed_key(object_path, cache),
+            "preprocessed",
+            lambda url, path, throttle=None: save_preprocessed_object(obj, path),
+        )
+    except Exception as e:
+        logger.warning(f"Preprocessing {uid} failed: {e}")
+        return {**record, "valid": False, "error": f"{type(e).__name__}: {e}"}
+
+    return {**record, **metadata, "valid": True, "import_time": import_time}
+
+
+def run_worker(uids: List[str], index_path: Optional[str] = None) -> None:
+    """
+    Preprocesses objects one after another in this Blender process, recording each in the
+    object index as soon as it is done.
+
+    Args:
+        uids (List[str]): The object uids, in order.
+        index_path (Optional[str]): Path of the object index. Defaults to the one in the
+            asset cache directory.
+
+    Returns:
+        None
+    """
+    initialize_scene()
+    with ObjectIndex(index_path) as index:
+        for uid in uids:
+            reset_scene()
+            index.add(preprocess_uid(uid))
+            get_asset_cache().release()
+
+
+def wait_worker(
+    process: subprocess.Popen,
+    index: ObjectIndex,
+    uids: List[str],
+    started: float,
+    timeout: float,
+) -> Tuple[Optional[int], float]:
+    """
+    Waits for a worker process, killing it once a single object takes too long.
+
+    The worker records each object in the index as soon as it is done, so the time spent
+    on the current object is measured from the last object recorded.
+
+    Args:
+        process (subprocess.Popen): The worker process.
+        index (ObjectIndex): The object index the worker records to.
+        uids (List[str]): The uids the worker preprocesses.
+        started (float): Time the worker was started at.
+        timeout (float): Maximum time in seconds to preprocess a single object.
+
+    Returns:
+        Tuple[Optional[int], float]: The exit code of the worker, None if it was killed,
+        and the time in seconds spent on the object it was working on.
+    """
+    done = 0
+    object_started = started
+    while True:
+        try:
+            returncode = process.wait(timeout=WORKER_POLL_INTERVAL)
+            return returncode, time.time() - object_started
+        except subprocess.TimeoutExpired:
+            pass
+
+        recorded = sum(
+            record["updated"] >= started for record in index.get_many(uids).values()
+        )
+        if recorded > done:
+            done = recorded
+            object_started = time.time()
+        elif time.time() - object_started > timeout:
+            process.kill()
+            process.wait()
+            return None, time.time() - object_started
+
+
+def preprocess_objects(
+    uids: List[str],
+    processes: Optional[int] = None,
+    index_path: Optional[str] = None,
+    chunk_size: int = 16,
+    timeout: int = 600,
+    retry_failed: bool = False,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Preprocesses objects in parallel Blender processes and records them in the object index.
+
+    The uids are split into chunks, and up to `processes` worker processes preprocess one
+    chunk each at a time. Objects already recorded by the current pipeline version are
+    skipped, so an interrupted run picks up where it stopped.
+
+    A model can crash or hang Blender. When a worker dies, or is killed for spending more
+    than `timeout` seconds on one object, the first object of its chunk that wasn't
+    recorded is marked invalid and a new worker carries on with the rest.
+
+    Args:
+        uids (List[str]): The object uids.
+        processes (Optional[int]): Number of Blender processes to run at the same time.
+            Defaults to the number of CPU cores.
+        index_path (Optional[str]): Path of the object index. Defaults to the one in the
+            asset cache directory.
+        chunk_size (int): Number of objects each worker process preprocesses.
+        timeout (int): Maximum time in seconds to preprocess a single object.
+        retry_failed (bool): Preprocess again the objects recorded as invalid.
+        cache_dir (Optional[str]): Directory of the asset cache. Defaults to
+            $SIMIAN_CACHE_DIR or ~/.cache/simian.
+        cache_size (Optional[int]): Size budget of the asset cache in bytes. Defaults to
+            $SIMIAN_CACHE_SIZE; unlimited if neither is set.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The record of each uid in the object index.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    cache = AssetCache(cache_dir, cache_size)
+    env = {**os.environ, CACHE_DIR_ENV: cache.root}
+    if cache.max_bytes is not None:
+        env[CACHE_SIZE_ENV] = str(cache.max_bytes)
+    cache.close()
+
+    index = ObjectIndex(index_path or os.path.join(cache.root, OBJECT_INDEX_FILE))
+    uids = list(dict.fromkeys(uids))
+    records = index.get_many(uids)
+    remaining = [
+        uid
+        for uid in uids
+        if uid not in records
+        or records[uid]["pipeline_version"] != PIPELINE_VERSION
+        or (retry_failed and not records[uid]["valid"])
+    ]
+    skipped = len(uids) - len(remaining)
+    if skipped:
+        logger.info(f"Skipping {skipped} objects that are already preprocessed")
+
+    chunks = [remaining[i : i + chunk_size] for i in range(0, len(remaining), chunk_size)]
+    logger.info(
+        f"Preprocessing {len(remaining)} objects with {min(processes, len(chunks))} Blender processes"
+    )
+
+    def run_chunk(chunk_index: int, _) -> Optional[int]:
+        pending = chunks[chunk_index]
+        returncode = 0
+        while pending:
+            started = time.time()
+            command = [sys.executable, "-m", "simian.preprocess", "--worker"]
+            command += ["--index_path", index.path, "--uids"] + pending
+            process = subprocess.Popen(command, env=env)
+            returncode, elapsed = wait_worker(process, index, pending, started, timeout)
+            if returncode is None:
+                error = f"Timed out after {elapsed:.0f}s"
+            else:
+                error = f"Blender exited with code {returncode}"
+
+            recorded = index.get_many(pending)
+            pending = [
+                uid for uid in pending if uid not in recorded or recorded[uid]["updated"] < started
+            ]
+            if pending and returncode != 0:
+                # the worker went down on the first object it didn't record
+                logger.warning(f"Preprocessing {pending[0]} failed: {error}")
+                index.add(
+                    {
+                        "uid": pending[0],
+                        "valid": False,
+                        "error": error,
+                        "pipeline_version": PIPELINE_VERSION,
+                    }
+                )
+                pending = pending[1:]
+            elif pending:
+                logger.warning(f"Worker exited without recording {pending}")
+                break
+        return returncode
+
+    run_scheduler(list(range(len(chunks))), processes, run_chunk)
+
+    records = index.get_many(uids)
+    failed = [uid for uid in uids if uid in records and not records[uid]["valid"]]
+    logger.info(f"Preprocessed {len(records) - len(failed)}/{len(uids)} objects")
+    for uid in failed:
+        logger.info(f"Failed: {uid}: {records[uid]['error']}")
+    index.close()
+    return records
+
+
+def read_uids(uids_file: str) -> List[str]:
+    """
+    Reads object uids from a JSON list, or a text file with one uid per line.
+
+    Args:
+        uids_file (str): Path to the file.
+
+    Returns:
+        List[str]: The uids.
+    """
+    with open(uids_file, "r") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Preprocess objects ahead of rendering and record their metadata in the object index."
+    )
+    parser.add_argument("--uids", nargs="*", default=[], help="Object uids to preprocess.")
+    parser.add_argument(
+        "--uids_file",
+        type=str,
+        default=None,
+        help="File listing the object uids to preprocess, as a JSON list or one uid per line.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of Blender processes to run at the same time. Defaults to the number of CPU cores.",
+    )
+    parser.add_argument(
+        "--index_path",
+        type=str,
+        default=None,
+        help="Path of the object index. Defaults to object-index.sqlite in the asset cache directory.",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=16,
+        help="Number of objects each Blender process preprocesses. Defaults to 16.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=600,
+        help="Maximum time in seconds to preprocess a single object. Defaults to 600.",
+    )
+    parser.add_argument(
+        "--retry_failed",
+        action="store_true",
+        help="Preprocess again the objects that failed in an earlier run.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Directory of the asset cache. Defaults to $SIMIAN_CACHE_DIR or ~/.cache/simian.",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=float,
+        default=None,
+        help="Size budget of the asset cache in gigabytes. Unlimited by default.",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help=argparse.SUPPRESS,
+    )
+    args = parser.parse_args()
+
+    uids = list(args.uids)
+    if args.uids_file:
+        uids += read_uids(args.uids_file)
+
+    if args.worker:
+        run_worker(uids, args.index_path)
+    else:
+        preprocess_objects(
+            uids,
+            processes=args.processes,
+            index_path=args.index_path,
+            chunk_size=args.chunk_size,
+            timeout=args.timeout,
+            retry_failed=args.retry_failed,
+            cache_dir=args.cache_dir,
+            cache_size=int(args.cache_size * 1e9) if args.cache_size else None,
+        )
@@ -4,53 +4,53 @@ import logging
 import os
 import ssl
 import sys
+import time
+import traceback
 import bpy
 import random
+from typing import Any, Dict, List, Optional, TextIO
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
 ssl._create_default_https_context = ssl._create_unverified_context
 
+from .asset_cache import get_asset_cache
 from .camera import (
     create_camera_rig,
     position_camera,
     set_camera_animation,
     set_camera_settings,
 )
-from .transform import find_largest_length, place_objects_on_grid, apply_movement
-from .object import (
-    apply_all_modifiers,
-    apply_and_remove_armatures,
-    get_meshes_in_hierarchy,
-    join_objects_in_hierarchy,
-    load_object,
-    lock_all_objects,
-    normalize_object_scale,
-    optimize_meshes_in_hierarchy,
-    set_pivot_to_bottom,
-    unlock_objects,
-    unparent_keep_transform,
+from .transform import (
+    apply_movement,
+    apply_object_locations,
+    find_largest_length,
+    place_objects_on_grid,
 )
+from .object import lock_all_objects, normalize_object_scale, unlock_objects
+from .object_cache import load_preprocessed_object
 from .background import create_photosphere, set_background
-from .scene import apply_stage_material, create_stage, initialize_scene
-from .vendor import objaverse
+from .scene import apply_stage_material, create_stage, initialize_scene, reset_scene
+from .store import open_combinations
 
 
 def read_combination(combination_file: str, index: int = 0) -> dict:
     """
-    Reads a specified camera combination from a JSON file.
+    Reads a specified camera combination from a combination store or JSON file.
+
+    Only the requested combination is parsed. A combinations JSON file is converted
+    to a combination store the first time it is read.
 
     Args:
-        None
+        combination_file (str): Path to the combination store or JSON file.
+        index (int): Index of the combination.
 
     Returns:
-        None
+        dict: The combination.
     """
-    with open(combination_file, "r") as file:
-        data = json.load(file)
-        combinations_data = data["combinations"]
-        return combinations_data[index]
+    with open_combinations(combination_file) as store:
+        return store.get(index)
     
 
 def load_user_blend_file(user_blend_file):
@@ -76,6 +76,23 @@ def load_user_blend_file(user_blend_file):
         return False
 
 
+def get_partial_path(path: str) -> str:
+    """
+    Returns the name a render is written to before it is moved to its final path.
+
+    Renders are written under this name and renamed once complete, so a render that is
+    killed halfway never leaves a truncated file under the final name.
+
+    Args:
+        path (str): Final path of the render.
+
+    Returns:
+        str: The path with ".partial" before its extension.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.partial{extension}"
+
+
 def render_scene(
     output_dir: str,
     context: bpy.types.Context,
@@ -87,7 +104,10 @@ def render_scene(
     combination=None,
     render_images=False,
     user_blend_file=None,
-) -> None:
+    hdri_path: str = "backgrounds",
+    factory_reset: bool = True,
+    threads: int = 0,
+) -> List[str]:
     """
     Renders a scene with specified parameters.
 
@@ -101,25 +121,39 @@ def render_scene(
         combination_index (int): Index of the camera combination to use from the JSON file. Defaults to 0.
         render_images (bool): Flag to indicate if images should be rendered instead of videos.
         user_blend_file (str): Path to the user-specified Blender file to use as the base scene.
+        hdri_path (str): Path to the directory where the background HDRs will be saved.
+        factory_reset (bool): Reload factory settings before building the scene. The render
+            server passes False to only clear the previous job's scene data.
+        threads (int): Number of render threads Blender may use, 0 to use all cores.
 
     Returns:
-        None
+        List[str]: Paths of the files written for this combination.
     """
 
     logger.info(f"Rendering scene with combination {combination_index}")
 
     os.makedirs(output_dir, exist_ok=True)
 
-    initialize_scene()
+    if factory_reset:
+        initialize_scene()
+    else:
+        reset_scene()
 
     if user_blend_file:
         bpy.ops.wm.open_mainfile(filepath=user_blend_file)
         if not load_user_blend_file(user_blend_file):
             logger.error(f"Unable to load user-specified Blender file: {user_blend_file}")
-            return  # Exit the function if the file could not be loaded
+            return []  # Exit the function if the file could not be loaded
 
     context.scene.render.engine = 'BLENDER_EEVEE'
 
+    # limit render threads when several renders share the machine
+    if threads > 0:
+        context.scene.render.threads_mode = "FIXED"
+        context.scene.render.threads = threads
+    else:
+        context.scene.render.threads_mode = "AUTO"
+
     create_camera_rig()
 
     scene = context.scene
@@ -130,36 +164,21 @@ def render_scene(
     # Lock and hide all scene objects before doing any object operations
     initial_objects = lock_all_objects()
 
-    if combination is not None:
+    if isinstance(combination, str):
         combination = json.loads(combination)
-    else:
+    elif combination is None:
         combination = read_combination(combination_file, combination_index)
     all_objects = []
 
     focus_object = None
 
     for object_data in combination["objects"]:
-        object_file = objaverse.load_objects([object_data["uid"]])[
-            object_data["uid"]
-        ]
-
-        load_object(object_file)
-        obj = [obj for obj in context.view_layer.objects.selected][0]
-
-        apply_and_remove_armatures()
-        apply_all_modifiers(obj)
-        join_objects_in_hierarchy(obj)
-        optimize_meshes_in_hierarchy(obj)
-
-        meshes = get_meshes_in_hierarchy(obj)
-        obj = meshes[0]
+        object_file = get_asset_cache().fetch_object(object_data["uid"])
+        obj = load_preprocessed_object(object_file)
 
         if focus_object is None:
             focus_object = obj
 
-        unparent_keep_transform(obj)
-        set_pivot_to_bottom(obj)
-
         obj.scale = [object_data["scale"]["factor"] for _ in range(3)]
         normalize_object_scale(obj)
 
@@ -167,8 +186,6 @@ def render_scene(
 
         all_objects.append({obj: object_data})
 
-    largest_length = find_largest_length(all_objects)
-
     # Unlock and unhide the initial objects
     unlock_objects(initial_objects)
 
@@ -177,27 +194,32 @@ def render_scene(
 
     yaw = combination["orientation"]["yaw"]
 
-    if not user_blend_file:
-        set_background(args.hdri_path, combination)
-        create_photosphere(args.hdri_path, combination).scale = (10, 10, 10)
-        stage = create_stage(combination)
-        apply_stage_material(stage, combination)
-    
-    place_objects_on_grid(all_objects, largest_length)
-    position_camera(combination, focus_object)
-    apply_movement(all_objects, yaw, scene.frame_start, scene.frame_end)
-
     # Randomize image sizes
     sizes = [
         (1920, 1080),
         (1024, 1024),
         # able to add more options here
     ]
+    # pick the output size first, the background resolution is selected to match it
+    size = random.choice(sizes) if render_images else (1920, 1080)
+
+    if not user_blend_file:
+        set_background(hdri_path, combination, width=size[0])
+        create_photosphere(hdri_path, combination, width=size[0]).scale = (10, 10, 10)
+        stage = create_stage(combination)
+        apply_stage_material(stage, combination)
+    
+    # combinations planned with the object index hold the locations of their objects
+    if all("location" in object_data for object_data in combination["objects"]):
+        apply_object_locations(all_objects)
+    else:
+        place_objects_on_grid(all_objects, find_largest_length(all_objects))
+    position_camera(combination, focus_object)
+    apply_movement(all_objects, yaw, scene.frame_start, scene.frame_end)
 
     if render_images:
         # Render a specific frame as an image with a random size
         middle_frame = (scene.frame_start + scene.frame_end) // 2
-        size = random.choice(sizes)
         scene.frame_set(middle_frame)
         scene.render.resolution_x = size[0]
         scene.render.resolution_y = size[1]
@@ -206,13 +228,15 @@ def render_scene(
             output_dir,
             f"{combination_index}_frame_{middle_frame}_{size[0]}x{size[1]}.png",
         )
-        scene.render.filepath = render_path
+        scene.render.filepath = get_partial_path(render_path)
         bpy.ops.render.render(write_still=True)
+        os.replace(scene.render.filepath, render_path)
         logger.info(f"Rendered image saved to {render_path}")
+        return [render_path]
     else:
         # Render the entire animation as a video
-        scene.render.resolution_x = 1920
-        scene.render.resolution_y = 1080
+        scene.render.resolution_x = size[0]
+        scene.render.resolution_y = size[1]
         scene.render.resolution_percentage = 100
         scene.render.image_settings.file_format = "FFMPEG"
         scene.render.ffmpeg.format = "MPEG4"
@@ -220,15 +244,96 @@ def render_scene(
         scene.render.ffmpeg.constant_rate_factor = "PERC_LOSSLESS"
         scene.render.ffmpeg.ffmpeg_preset = "BEST"
         render_path = os.path.join(output_dir, f"{combination_index}.mp4")
-        scene.render.filepath = render_path
+        scene.render.filepath = get_partial_path(render_path)
         bpy.ops.render.render(animation=True)
+        os.replace(scene.render.filepath, render_path)
 
         # uncomment this to prevent generation of blend files
-        bpy.ops.wm.save_as_mainfile(
-            filepath=os.path.join(output_dir, f"{combination_index}.blend")
-        )
+        blend_path = os.path.join(output_dir, f"{combination_index}.blend")
+        bpy.ops.wm.save_as_mainfile(filepath=blend_path)
 
         logger.info(f"Rendered video saved to {render_path}")
+        return [render_path, blend_path]
+
+
+def serve(input_stream: TextIO, output_stream: TextIO, defaults: Dict[str, Any]) -> None:
+    """
+    Runs the render server loop, keeping bpy loaded across combinations.
+
+    Reads one JSON job per line from input_stream, renders it and writes one JSON
+    result per line to output_stream. A job holds a "combination_index" and may
+    override "id", "combination", "combination_file", "output_dir", "hdri_path",
+    "start_frame", "end_frame", "animation_length", "images" and "blend"; missing
+    keys fall back to defaults. Between jobs only the scene data is cleared. The
+    loop ends at end of input or on a {"command": "shutdown"} line.
+
+    Args:
+        input_stream (TextIO): Stream to read JSON-lines jobs from.
+        output_stream (TextIO): Stream to write JSON-lines results to.
+        defaults (Dict[str, Any]): Default job settings, usually the parsed CLI arguments.
+
+    Returns:
+        None
+    """
+    stores = {}
+
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        job = json.loads(line)
+        if job.get("command") == "shutdown":
+            break
+
+        settings = {**defaults, **job}
+        combination_index = settings.get("combination_index", 0)
+        result = {
+            "id": job.get("id", combination_index),
+            "combination_index": combination_index,
+            "status": "done",
+            "outputs": [],
+            "error": None,
+        }
+        start_time = time.time()
+
+        try:
+            combination = settings.get("combination")
+            if combination is None:
+                # keep each combination store open for the lifetime of the server
+                combination_file = settings["combination_file"]
+                cache_key = (combination_file, os.path.getmtime(combination_file))
+                if cache_key not in stores:
+                    stores[cache_key] = open_combinations(combination_file)
+                combination = stores[cache_key].get(combination_index)
+
+            result["outputs"] = render_scene(
+                animation_length=settings["animation_length"],
+                start_frame=settings["start_frame"],
+                end_frame=settings["end_frame"],
+                output_dir=settings["output_dir"],
+                context=bpy.context,
+                combination_file=settings["combination_file"],
+                combination_index=combination_index,
+                combination=combination,
+                render_images=settings["images"],
+                user_blend_file=settings["blend"],
+                hdri_path=settings["hdri_path"],
+                factory_reset=False,
+                threads=settings["threads"],
+            )
+        except Exception as e:
+            logger.error(f"Failed to render combination {combination_index}: {e}")
+            traceback.print_exc()
+            result["status"] = "failed"
+            result["error"] = str(e)
+        finally:
+            # the assets of the job are loaded, other processes may evict them again
+            get_asset_cache().release()
+
+        result["duration"] = time.time() - start_time
+        output_stream.write(json.dumps(result) + "\n")
+        output_stream.flush()
 
 
 if __name__ == "__main__":
@@ -301,6 +406,18 @@ if __name__ == "__main__":
         help="Path to the user-specified Blender file to use as the base scene.",
         required=False,
     )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Keep running and render JSON-lines jobs read from stdin, writing one JSON result per line to stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="Number of render threads to use. Defaults to 0, which uses all cores.",
+        required=False,
+    )
 
     if "--" in sys.argv:
         argv = sys.argv[sys.argv.index("--") + 1 :]
@@ -309,6 +426,17 @@ if __name__ == "__main__":
 
     args = parser.parse_args(argv)
 
+    if args.server:
+        # Blender prints render progress to stdout, so keep a private copy of stdout
+        # for results and send everything else written to it to stderr
+        sys.stdout.flush()
+        results = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+        initialize_scene()
+        serve(sys.stdin, results, defaults=vars(args))
+        sys.exit(0)
+
     context = bpy.context
     scene = context.scene
     render = scene.render
@@ -324,7 +452,7 @@ if __name__ == "__main__":
     for object in objects_column:
         uid = object["uid"]
 
-        downloaded = objaverse.load_objects([uid])
+        get_asset_cache().fetch_object(uid)
 
     # Render the images
     render_scene(
@@ -338,4 +466,6 @@ if __name__ == "__main__":
         combination=args.combination,
         render_images=args.images,
         user_blend_file=args.blend,
+        hdri_path=args.hdri_path,
+        threads=args.threads,
     )
@@ -0,0 +1,161 @@
+import json
+import logging
+import queue
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class RenderServer:
+    """
+    Client for a long-lived `simian.render --server` process.
+
+    The server imports bpy once and renders combination jobs sent to it as JSON lines
+    on stdin, so each job skips the interpreter, bpy and factory-settings startup that
+    a fresh `simian.render` process pays. If the server dies or a job times out, the
+    job is reported as failed and a new server is started for the next job.
+
+    Args:
+        server_args (Optional[List[str]]): Extra `simian.render` arguments, e.g.
+            ["--hdri_path", "backgrounds"]. They set the defaults for every job.
+        env (Optional[Dict[str, str]]): Environment for the server process.
+    """
+
+    def __init__(
+        self,
+        server_args: Optional[List[str]] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.server_args = server_args or []
+        self.env = env
+        self.process = None
+        self._results = None
+
+    def start(self) -> None:
+        """
+        Starts the server process if it is not already running.
+
+        Returns:
+            None
+        """
+        if self.process is not None and self.process.poll() is None:
+            return
+
+        command = [sys.executable, "-m", "simian.render", "--", "--server"]
+        command += self.server_args
+        logger.info(f"Starting render server: {' '.join(command)}")
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=self.env,
+        )
+
+        # read results on a thread so render() can wait with a timeout on any platform
+        self._results = queue.Queue()
+        threading.Thread(
+            target=self._read_results,
+            args=(self.process.stdout, self._results),
+            daemon=True,
+        ).start()
+
+    @staticmethod
+    def _read_results(stream, results: queue.Queue) -> None:
+        for line in stream:
+            line = line.strip()
+            if line.startswith("{"):
+                results.put(json.loads(line))
+        # end of stream means the server exited
+        results.put(None)
+
+    def render(self, job: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Renders one job on the server and waits for its result.
+
+        Args:
+            job (Dict[str, Any]): The job, at least {"combination_index": int}. See
+                `simian.render.serve` for the accepted keys.
+            timeout (Optional[float]): Seconds to wait for the result. On timeout the
+                server is killed and the job is reported as failed.
+
+        Returns:
+            Dict[str, Any]: The job result with "status" ("done", "failed" or
+            "timeout"), "outputs", "error" and "duration".
+        """
+        self.start()
+
+        failure = {
+            "id": job.get("id", job.get("combination_index")),
+            "combination_index": job.get("combination_index"),
+            "status": "failed",
+            "outputs": [],
+            "duration": None,
+        }
+
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            return {**failure, "error": f"Render server is not accepting jobs: {e}"}
+
+        try:
+            result = self._results.get(timeout=timeout)
+        except queue.Empty:
+            logger.info(f"Render job {failure['id']} timed out after {timeout}s")
+            self.kill()
+            return {**failure, "status": "timeout", "error": f"Timed out after {timeout}s"}
+
+        if result is None:
+            returncode = self.process.wait()
+            self.process = None
+            return {**failure, "error": f"Render server exited with code {returncode}"}
+
+        return result
+
+    def kill(self) -> None:
+        """
+        Kills the server process immediately.
+
+        Returns:
+            None
+        """
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def close(self, timeout: float = 30) -> None:
+        """
+        Asks the server to shut down after its current job and waits for it to exit.
+
+        Args:
+            timeout (float): Seconds to wait before killing the server.
+
+        Returns:
+            None
+        """
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write(json.dumps({"command": "shutdown"}) + "\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def __enter__(self) -> "RenderServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
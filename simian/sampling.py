@@ -0,0 +1,308 @@
+from typing import Any, Dict
+
+import numpy as np
+
+# SplitMix64 constants, see Steele, Lea and Flood, "Fast Splittable Pseudorandom Number Generators"
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Columns of the uniform draws of one combination, in draw order
+PARAMETER_COLUMNS = [
+    "bloom_threshold",
+    "bloom_intensity",
+    "bloom_radius",
+    "ssao_distance",
+    "ssao_factor",
+    "ssrr_max_roughness",
+    "ssrr_thickness",
+    "motionblur_shutter_speed",
+    "fov",
+    "coverage_factor",
+    "speed_factor",
+    "uv_scale_x",
+    "uv_scale_y",
+    "uv_rotation",
+]
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """
+    Hashes 64-bit counters with the SplitMix64 finalizer.
+
+    Args:
+        values (np.ndarray): uint64 counters.
+
+    Returns:
+        np.ndarray: uint64 hashes, uniformly distributed over all 64-bit values.
+    """
+    with np.errstate(over="ignore"):
+        z = values + _GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * _MIX_1
+        z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
+def counter_uniforms(seed: int, indices: np.ndarray, count: int) -> np.ndarray:
+    """
+    Draws uniform floats in [0, 1) from a counter-based generator.
+
+    The draw in column k for combination index i only depends on (seed, i, k), so a
+    combination's draws are the same whether it is generated alone or in any batch.
+
+    Args:
+        seed (int): Seed of the combination set.
+        indices (np.ndarray): Combination indices, one row each.
+        count (int): Number of draws per combination.
+
+    Returns:
+        np.ndarray: Array of shape (len(indices), count).
+    """
+    seed_key = splitmix64(np.array([seed % 2**64], dtype=np.uint64))
+    keys = splitmix64(np.asarray(indices, dtype=np.uint64) ^ seed_key)
+    with np.errstate(over="ignore"):
+        counters = keys[:, None] + np.arange(count, dtype=np.uint64)[None, :]
+    return (splitmix64(counters) >> np.uint64(11)) * (1.0 / 2**53)
+
+
+def uniform(u: np.ndarray, low: Any, high: Any) -> np.ndarray:
+    """
+    Scales uniform draws in [0, 1) to [low, high), with the same formula as random.uniform.
+
+    Args:
+        u (np.ndarray): Uniform draws in [0, 1).
+        low (Any): Lower bound, a number or an array.
+        high (Any): Upper bound, a number or an array.
+
+    Returns:
+        np.ndarray: The scaled draws.
+    """
+    return low + (high - low) * u
+
+
+def find_ranges(values: np.ndarray, mins: np.ndarray, maxes: np.ndarray) -> np.ndarray:
+    """
+    Finds the first inclusive [min, max] range that holds each value.
+
+    Ranges are checked in order, as the per-value loops of the combiner do. When the
+    ranges are sorted, as in the camera data, the first matching range is found with one
+    `searchsorted` over the upper bounds; otherwise each range is checked in turn.
+
+    Args:
+        values (np.ndarray): Values to look up.
+        mins (np.ndarray): Lower bound of each range, in priority order.
+        maxes (np.ndarray): Upper bound of each range, in priority order.
+
+    Returns:
+        np.ndarray: Index of the range of each value, len(mins) if no range holds it.
+    """
+    if np.all(np.diff(mins) >= 0) and np.all(np.diff(maxes) >= 0):
+        # the first range with max >= value is the only candidate for the first match
+        found = np.searchsorted(maxes, values, side="left")
+        candidate = np.minimum(found, len(maxes) - 1)
+        matched = (found < len(maxes)) & (mins[candidate] <= values)
+        return np.where(matched, candidate, len(maxes))
+
+    result = np.full(len(values), len(maxes))
+    for i in range(len(maxes) - 1, -1, -1):
+        result[(mins[i] <= values) & (values <= maxes[i])] = i
+    return result
+
+
+def classify(
+    values: np.ndarray,
+    types: Dict[str, Dict[str, Any]],
+    min_key: str,
+    max_key: str,
+    default: str = "none",
+) -> np.ndarray:
+    """
+    Names the first type whose inclusive [min, max] range holds each value.
+
+    Args:
+        values (np.ndarray): Values to classify.
+        types (Dict[str, Dict[str, Any]]): Types with their ranges, in priority order.
+        min_key (str): Key of the lower bound of a type.
+        max_key (str): Key of the upper bound of a type.
+        default (str): Type of values outside every range.
+
+    Returns:
+        np.ndarray: Type name of each value.
+    """
+    names = np.array(list(types.keys()) + [default], dtype=object)
+    mins = np.array([bounds[min_key] for bounds in types.values()], dtype=float)
+    maxes = np.array([bounds[max_key] for bounds in types.values()], dtype=float)
+    return names[find_ranges(values, mins, maxes)]
+
+
+class ScalarParameters:
+    """
+    Independent scalar parameters of a range of combinations, drawn at once as NumPy arrays.
+
+    Holds the postprocessing (bloom, SSAO, SSRR, motion blur), framing (FOV, coverage),
+    animation speed and stage UV parameters of combinations start to end - 1 as a
+    structure of arrays, with their types classified in bulk. They are turned into
+    combination dicts one index at a time when the combination is assembled.
+
+    Args:
+        camera_data (Dict[str, Any]): Camera data.
+        seed (int): Seed of the combination set.
+        start (int): Index of the first combination.
+        end (int): Index after the last combination.
+    """
+
+    def __init__(self, camera_data: Dict[str, Any], seed: int, start: int, end: int) -> None:
+        self.start = start
+        self.end = end
+
+        draws = counter_uniforms(seed, np.arange(start, end), len(PARAMETER_COLUMNS))
+        u = dict(zip(PARAMETER_COLUMNS, draws.T))
+
+        postprocessing = camera_data["postprocessing"]
+        bloom = postprocessing["bloom"]
+        self.bloom_threshold = uniform(u["bloom_threshold"], bloom["threshold_min"], bloom["threshold_max"])
+        self.bloom_intensity = uniform(u["bloom_intensity"], bloom["intensity_min"], bloom["intensity_max"])
+        self.bloom_radius = uniform(u["bloom_radius"], bloom["radius_min"], bloom["radius_max"])
+        self.bloom_type = classify(self.bloom_intensity, bloom["types"], "intensity_min", "intensity_max")
+
+        ssao = postprocessing["ssao"]
+        self.ssao_distance = uniform(u["ssao_distance"], ssao["distance_min"], ssao["distance_max"])
+        self.ssao_factor = uniform(u["ssao_factor"], ssao["factor_min"], ssao["factor_max"])
+        self.ssao_type = classify(self.ssao_factor, ssao["types"], "factor_min", "factor_max")
+
+        ssrr = postprocessing["ssrr"]
+        self.ssrr_max_roughness = uniform(
+            u["ssrr_max_roughness"], ssrr["min_max_roughness"], ssrr["max_max_roughness"]
+        )
+        self.ssrr_thickness = uniform(u["ssrr_thickness"], ssrr["min_thickness"], ssrr["max_thickness"])
+        self.ssrr_type = classify(
+            self.ssrr_max_roughness, ssrr["types"], "max_roughness_min", "max_roughness_max"
+        )
+
+        motionblur = postprocessing["motionblur"]
+        self.motionblur_shutter_speed = uniform(
+            u["motionblur_shutter_speed"],
+            motionblur["shutter_speed_min"],
+            motionblur["shutter_speed_max"],
+        )
+        self.motionblur_type = classify(
+            self.motionblur_shutter_speed,
+            motionblur["types"],
+            "shutter_speed_min",
+            "shutter_speed_max",
+        )
+
+        framings = camera_data["framings"]
+        fov_min = min([f["fov_min"] for f in framings])
+        fov_max = max([f["fov_max"] for f in framings])
+        self.fov = uniform(u["fov"], fov_min, fov_max).astype(np.int64)
+        framing_index = find_ranges(
+            self.fov,
+            np.array([f["fov_min"] for f in framings], dtype=float),
+            np.array([f["fov_max"] for f in framings], dtype=float),
+        )
+        if np.any(framing_index == len(framings)):
+            raise ValueError("The framings don't cover every FOV between their minimum and maximum")
+        coverage_min = np.array([f["coverage_factor_min"] for f in framings])[framing_index]
+        coverage_max = np.array([f["coverage_factor_max"] for f in framings])[framing_index]
+        self.coverage_factor = uniform(u["coverage_factor"], coverage_min, coverage_max)
+        self.framing_name = np.array([f["name"] for f in framings], dtype=object)[framing_index]
+
+        self.speed_factor = uniform(u["speed_factor"], 0.5, 2.0)
+
+        self.uv_scale = np.stack(
+            [uniform(u["uv_scale_x"], 0.8, 1.2), uniform(u["uv_scale_y"], 0.8, 1.2)], axis=1
+        )
+        self.uv_rotation = uniform(u["uv_rotation"], 0, 360)
+
+        # plain Python values for serialization, converted once for the whole range
+        self._values = {
+            name: value.tolist() for name, value in vars(self).items() if isinstance(value, np.ndarray)
+        }
+
+    def _row(self, index: int) -> int:
+        if not self.start <= index < self.end:
+            raise IndexError(f"Combination index {index} is not in [{self.start}, {self.end})")
+        return index - self.start
+
+    def postprocessing(self, index: int) -> Dict[str, Any]:
+        """
+        Returns the postprocessing settings of one combination.
+
+        Args:
+            index (int): Index of the combination.
+
+        Returns:
+            Dict[str, Any]: Postprocessing settings, with the values and type of each effect.
+        """
+        i = self._row(index)
+        v = self._values
+        return {
+            "bloom": {
+                "threshold": v["bloom_threshold"][i],
+                "intensity": v["bloom_intensity"][i],
+                "radius": v["bloom_radius"][i],
+                "type": v["bloom_type"][i],
+            },
+            "ssao": {
+                "distance": v["ssao_distance"][i],
+                "factor": v["ssao_factor"][i],
+                "type": v["ssao_type"][i],
+            },
+            "ssrr": {
+                "max_roughness": v["ssrr_max_roughness"][i],
+                "thickness": v["ssrr_thickness"][i],
+                "type": v["ssrr_type"][i],
+            },
+            "motionblur": {
+                "shutter_speed": v["motionblur_shutter_speed"][i],
+                "type": v["motionblur_type"][i],
+            },
+        }
+
+    def framing(self, index: int) -> Dict[str, Any]:
+        """
+        Returns the camera framing of one combination.
+
+        Args:
+            index (int): Index of the combination.
+
+        Returns:
+            Dict[str, Any]: Camera framing, with its FOV, coverage factor and name.
+        """
+        i = self._row(index)
+        v = self._values
+        return {
+            "fov": v["fov"][i],
+            "coverage_factor": v["coverage_factor"][i],
+            "name": v["framing_name"][i],
+        }
+
+    def animation_speed(self, index: int) -> float:
+        """
+        Returns the animation speed factor of one combination.
+
+        Args:
+            index (int): Index of the combination.
+
+        Returns:
+            float: Speed factor between 0.5 and 2.
+        """
+        return self._values["speed_factor"][self._row(index)]
+
+    def stage_uv(self, index: int) -> Dict[str, Any]:
+        """
+        Returns the stage UV transform of one combination.
+
+        Args:
+            index (int): Index of the combination.
+
+        Returns:
+            Dict[str, Any]: The "uv_scale" and "uv_rotation" of the stage.
+        """
+        i = self._row(index)
+        v = self._values
+        return {
+            "uv_scale": v["uv_scale"][i],
+            "uv_rotation": v["uv_rotation"][i],
+        }
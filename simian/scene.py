@@ -2,8 +2,11 @@ from math import cos, sin
 import bpy
 from typing import Tuple
 import bmesh
-import os
-import requests
+
+from .asset_cache import get_asset_cache
+
+# texture maps of the stage material that apply_stage_material loads
+TEXTURE_MAPS = ["Diffuse", "nor_gl", "AO", "Rough", "Roughness", "arm", "rough_ao", "Displacement"]
 
 
 def initialize_scene() -> None:
@@ -19,30 +22,57 @@ def initialize_scene() -> None:
     bpy.context.scene.render.engine = 'BLENDER_EEVEE'
 
 
-def download_texture(url: str, material_name: str, texture_name: str) -> str:
+def reset_scene() -> None:
     """
-    Downloads the texture from the given URL and saves it in the materials/<material_name> folder.
-    Returns the local file path of the downloaded texture.
+    Removes all scene data left over from a previous render without reloading
+    factory settings. Used by the render server between jobs, where reloading
+    the startup file and preferences for every combination is wasted work.
 
     Args:
-        url (str): The URL of the texture to download.
-        material_name (str): The name of the material.
-        texture_name (str): The name of the texture.
+        None
 
     Returns:
-        str: The local file path of the downloaded texture.
+        None
     """
-    materials_dir = os.path.join("materials", material_name)
-    os.makedirs(materials_dir, exist_ok=True)
+    if bpy.context.object is not None and bpy.context.object.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+
+    # remove every datablock a render creates, objects first so the rest become orphans
+    for data_collection in (
+        bpy.data.objects,
+        bpy.data.collections,
+        bpy.data.meshes,
+        bpy.data.curves,
+        bpy.data.armatures,
+        bpy.data.cameras,
+        bpy.data.lights,
+        bpy.data.materials,
+        bpy.data.node_groups,
+        bpy.data.textures,
+        bpy.data.images,
+        bpy.data.actions,
+        bpy.data.worlds,
+    ):
+        bpy.data.batch_remove(list(data_collection))
+
+    bpy.context.scene.frame_set(0)
 
-    local_path = os.path.join(materials_dir, f"{texture_name}.jpg")
+    # set render mode of blend file to eevee
+    bpy.context.scene.render.engine = 'BLENDER_EEVEE'
 
-    if not os.path.exists(local_path):
-        response = requests.get(url)
-        with open(local_path, "wb") as file:
-            file.write(response.content)
 
-    return local_path
+def download_texture(url: str) -> str:
+    """
+    Downloads the texture from the given URL to the asset cache, unless it is cached already.
+    Returns the local file path of the downloaded texture.
+
+    Args:
+        url (str): The URL of the texture to download.
+
+    Returns:
+        str: The local file path of the downloaded texture.
+    """
+    return get_asset_cache().fetch(url, "textures")
 
 
 def create_stage(
@@ -129,7 +159,12 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
     # Get the stage material settings from the combination
     stage_data = combination.get("stage", {})
     stage_material = stage_data.get("material", {})
-    material_name = stage_material.get("name", "DefaultMaterial")
+
+    # download every texture map of the material at the same time
+    maps = stage_material.get("maps", {})
+    texture_paths = get_asset_cache().fetch_many(
+        [maps[key] for key in TEXTURE_MAPS if key in maps], "textures"
+    )
 
     # Create a new material for the stage
     material = bpy.data.materials.new(name="StageMaterial")
@@ -160,7 +195,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
     # Load and connect diffuse texture
     if "Diffuse" in stage_material["maps"]:
         diffuse_url = stage_material["maps"]["Diffuse"]
-        diffuse_path = download_texture(diffuse_url, material_name, "Diffuse")
+        diffuse_path = texture_paths[diffuse_url]
         diffuse_tex = nodes.new(type="ShaderNodeTexImage")
         diffuse_tex.image = bpy.data.images.load(diffuse_path)
         links.new(mapping.outputs["Vector"], diffuse_tex.inputs["Vector"])
@@ -169,7 +204,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
     # Load and connect normal texture
     if "nor_gl" in stage_material["maps"]:
         normal_url = stage_material["maps"]["nor_gl"]
-        normal_path = download_texture(normal_url, material_name, "Normal")
+        normal_path = texture_paths[normal_url]
         normal_tex = nodes.new(type="ShaderNodeTexImage")
         normal_tex.image = bpy.data.images.load(normal_path)
         normal_map = nodes.new(type="ShaderNodeNormalMap")
@@ -179,7 +214,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
 
     if "AO" in stage_material["maps"]:
         ao_url = stage_material["maps"]["AO"]
-        ao_path = download_texture(ao_url, material_name, "AO")
+        ao_path = texture_paths[ao_url]
         ao_tex = nodes.new(type="ShaderNodeTexImage")
         ao_tex.image = bpy.data.images.load(ao_path)
         mixRGB = nodes.new(type="ShaderNodeMixRGB")
@@ -199,7 +234,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
 
     if "Rough" in stage_material["maps"]:
         rough_url = stage_material["maps"]["Rough"]
-        rough_path = download_texture(rough_url, material_name, "Rough")
+        rough_path = texture_paths[rough_url]
         rough_tex = nodes.new(type="ShaderNodeTexImage")
         rough_tex.image = bpy.data.images.load(rough_path)
         links.new(mapping.outputs["Vector"], rough_tex.inputs["Vector"])
@@ -207,7 +242,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
 
     if "Roughness" in stage_material["maps"]:
         roughness_url = stage_material["maps"]["Roughness"]
-        roughness_path = download_texture(roughness_url, material_name, "Roughness")
+        roughness_path = texture_paths[roughness_url]
         roughness_tex = nodes.new(type="ShaderNodeTexImage")
         roughness_tex.image = bpy.data.images.load(roughness_path)
         links.new(mapping.outputs["Vector"], roughness_tex.inputs["Vector"])
@@ -215,7 +250,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
 
     if "arm" in stage_material["maps"]:
         arm_url = stage_material["maps"]["arm"]
-        arm_path = download_texture(arm_url, material_name, "Arm")
+        arm_path = texture_paths[arm_url]
         arm_tex = nodes.new(type="ShaderNodeTexImage")
         arm_tex.image = bpy.data.images.load(arm_path)
         links.new(mapping.outputs["Vector"], arm_tex.inputs["Vector"])
@@ -251,7 +286,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
     # Load and connect rough_ao texture
     if "rough_ao" in stage_material["maps"]:
         rough_ao_url = stage_material["maps"]["rough_ao"]
-        rough_ao_path = download_texture(rough_ao_url, material_name, "RoughAO")
+        rough_ao_path = texture_paths[rough_ao_url]
         rough_ao_tex = nodes.new(type="ShaderNodeTexImage")
         rough_ao_tex.image = bpy.data.images.load(rough_ao_path)
         links.new(mapping.outputs["Vector"], rough_ao_tex.inputs["Vector"])
@@ -260,7 +295,7 @@ def apply_stage_material(stage: bpy.types.Object, combination: dict) -> None:
     # Load and connect displacement texture
     if "Displacement" in stage_material["maps"]:
         disp_url = stage_material["maps"]["Displacement"]
-        disp_path = download_texture(disp_url, material_name, "Displacement")
+        disp_path = texture_paths[disp_url]
         disp_tex = nodes.new(type="ShaderNodeTexImage")
         disp_tex.image = bpy.data.images.load(disp_path)
         disp_node = nodes.new(type="ShaderNodeDisplacement")
@@ -0,0 +1,453 @@
+import argparse
+import bisect
+import json
+import logging
+import mmap
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+STORE_EXTENSION = ".jsonl"
+INDEX_EXTENSION = ".idx"
+MANIFEST_FILE = "manifest.json"
+
+# offsets are stored as little-endian uint64 so the index is portable between machines
+OFFSET_DTYPE = np.dtype("<u8")
+
+
+def get_index_path(path: str) -> str:
+    """
+    Returns the path of the offset index that belongs to a combination store.
+
+    Args:
+        path (str): Path to the JSON-lines body of the store.
+
+    Returns:
+        str: Path to the index file.
+    """
+    return path + INDEX_EXTENSION
+
+
+def get_store_path(json_path: str) -> str:
+    """
+    Returns the path of the combination store converted from a legacy combinations JSON file.
+
+    Args:
+        json_path (str): Path to the legacy combinations JSON file.
+
+    Returns:
+        str: The same path with a ".jsonl" extension.
+    """
+    return os.path.splitext(json_path)[0] + STORE_EXTENSION
+
+
+class CombinationWriter:
+    """
+    Writes combinations to a combination store one at a time.
+
+    The body and index are written under temporary names and renamed into place on
+    close, so readers never see a half-written store.
+
+    Args:
+        path (str): Path to the JSON-lines body of the store.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # per-process temporary names let concurrent conversions of the same file race safely
+        self._suffix = f".{os.getpid()}.tmp"
+        self._body = open(path + self._suffix, "wb")
+        self._offsets = [0]
+
+    def write(self, combination: Dict[str, Any]) -> None:
+        """
+        Appends a combination to the store.
+
+        Args:
+            combination (Dict[str, Any]): The combination to write.
+
+        Returns:
+            None
+        """
+        line = (json.dumps(combination) + "\n").encode("utf-8")
+        self._body.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+
+    def close(self) -> None:
+        """
+        Finishes the store, writing its index and moving both files into place.
+
+        Returns:
+            None
+        """
+        self._body.close()
+        index_path = get_index_path(self.path)
+        np.asarray(self._offsets, dtype=OFFSET_DTYPE).tofile(index_path + self._suffix)
+        os.replace(self.path + self._suffix, self.path)
+        os.replace(index_path + self._suffix, index_path)
+
+    def __enter__(self) -> "CombinationWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CombinationStore:
+    """
+    Read-only, random-access view of a combination store.
+
+    A store is a JSON-lines file with one combination per line, plus an index file of
+    N + 1 little-endian uint64 byte offsets. Both are memory-mapped, so opening a store,
+    its length and reading one combination cost the same regardless of how many
+    combinations it holds, and only the combinations that are read get parsed.
+
+    Args:
+        path (str): Path to the JSON-lines body of the store.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        index_path = get_index_path(path)
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+            build_index(path)
+
+        self.offsets = np.memmap(index_path, dtype=OFFSET_DTYPE, mode="r")
+
+        self._file = open(path, "rb")
+        self._body = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(path) > 0
+            else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, index: int) -> Dict[str, Any]:
+        """
+        Reads one combination.
+
+        Args:
+            index (int): Index of the combination. Negative indices count from the end.
+
+        Returns:
+            Dict[str, Any]: The combination.
+
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Combination index {index} out of range for {len(self)} combinations")
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return json.loads(self._body[start:end])
+
+    def iter(self, start: int = 0, end: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over a range of combinations.
+
+        Args:
+            start (int): Index of the first combination.
+            end (Optional[int]): Index after the last combination. Defaults to the end of the store.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The combinations in order.
+        """
+        start, end, _ = slice(start, end).indices(len(self))
+        for index in range(start, end):
+            yield self.get(index)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self.get(i) for i in range(*index.indices(len(self)))]
+        return self.get(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter()
+
+    def close(self) -> None:
+        """
+        Closes the store files.
+
+        Returns:
+            None
+        """
+        if isinstance(self._body, mmap.mmap):
+            self._body.close()
+        self._file.close()
+
+    def __enter__(self) -> "CombinationStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CombinationShards:
+    """
+    Read-only, random-access view of combinations split over several shards.
+
+    The shards are combination stores listed in order in a manifest.json, each with the
+    range of combination indices it holds. A shard is opened the first time one of its
+    combinations is read.
+
+    Args:
+        path (str): Path to the manifest or the directory that holds it.
+    """
+
+    def __init__(self, path: str) -> None:
+        if os.path.isdir(path):
+            path = os.path.join(path, MANIFEST_FILE)
+        self.path = path
+        self.directory = os.path.dirname(path)
+
+        with open(path, "r") as file:
+            self.manifest = json.load(file)
+
+        self.shards = self.manifest["shards"]
+        self._starts = [shard["start"] for shard in self.shards]
+        self._stores: Dict[int, CombinationStore] = {}
+
+    def __len__(self) -> int:
+        return self.shards[-1]["end"] if self.shards else 0
+
+    def get(self, index: int) -> Dict[str, Any]:
+        """
+        Reads one combination.
+
+        Args:
+            index (int): Index of the combination. Negative indices count from the end.
+
+        Returns:
+            Dict[str, Any]: The combination.
+
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Combination index {index} out of range for {len(self)} combinations")
+
+        shard_index = bisect.bisect_right(self._starts, index) - 1
+        if shard_index not in self._stores:
+            shard_path = os.path.join(self.directory, self.shards[shard_index]["path"])
+            self._stores[shard_index] = CombinationStore(shard_path)
+        return self._stores[shard_index].get(index - self._starts[shard_index])
+
+    def iter(self, start: int = 0, end: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over a range of combinations.
+
+        Args:
+            start (int): Index of the first combination.
+            end (Optional[int]): Index after the last combination. Defaults to the last combination.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The combinations in order.
+        """
+        start, end, _ = slice(start, end).indices(len(self))
+        for index in range(start, end):
+            yield self.get(index)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self.get(i) for i in range(*index.indices(len(self)))]
+        return self.get(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter()
+
+    def close(self) -> None:
+        """
+        Closes the opened shards.
+
+        Returns:
+            None
+        """
+        for store in self._stores.values():
+            store.close()
+        self._stores = {}
+
+    def __enter__(self) -> "CombinationShards":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_manifest(directory: str, manifest: Dict[str, Any]) -> str:
+    """
+    Writes the manifest of a sharded combination set, replacing the previous one atomically.
+
+    Args:
+        directory (str): Directory that holds the shards.
+        manifest (Dict[str, Any]): The manifest.
+
+    Returns:
+        str: Path to the manifest.
+    """
+    path = os.path.join(directory, MANIFEST_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(temp_path, path)
+    return path
+
+
+def write_shards(
+    combinations: Iterable[Dict[str, Any]],
+    directory: str,
+    shard_size: int,
+    seed: Optional[int] = None,
+    count: Optional[int] = None,
+) -> str:
+    """
+    Streams combinations into combination store shards of a fixed size.
+
+    The manifest is rewritten after every finished shard, so an interrupted run keeps
+    every shard but the one being written, and "complete" is only set at the end.
+
+    Args:
+        combinations (Iterable[Dict[str, Any]]): The combinations, in index order.
+        directory (str): Directory to write the shards and manifest to.
+        shard_size (int): Number of combinations per shard.
+        seed (Optional[int]): Seed the combinations were generated with, recorded in the manifest.
+        count (Optional[int]): Number of combinations requested, recorded in the manifest.
+
+    Returns:
+        str: Path to the manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        "seed": seed,
+        "count": count,
+        "shard_size": shard_size,
+        "complete": False,
+        "shards": [],
+    }
+    write_manifest(directory, manifest)
+
+    writer = None
+    start = end = 0
+    for combination in combinations:
+        if writer is None:
+            shard_name = f"shard-{len(manifest['shards']):05d}{STORE_EXTENSION}"
+            writer = CombinationWriter(os.path.join(directory, shard_name))
+        writer.write(combination)
+        end += 1
+
+        if end - start == shard_size:
+            writer.close()
+            writer = None
+            manifest["shards"].append({"path": shard_name, "start": start, "end": end})
+            write_manifest(directory, manifest)
+            logger.info(f"Wrote combinations {start} to {end} to {shard_name}")
+            start = end
+
+    if writer is not None:
+        writer.close()
+        manifest["shards"].append({"path": shard_name, "start": start, "end": end})
+
+    manifest["count"] = end
+    manifest["complete"] = True
+    return write_manifest(directory, manifest)
+
+
+def build_index(path: str) -> str:
+    """
+    Builds the offset index of a JSON-lines combination store by scanning its body.
+
+    Args:
+        path (str): Path to the JSON-lines body of the store.
+
+    Returns:
+        str: Path to the index file.
+    """
+    offsets = [0]
+    with open(path, "rb") as file:
+        for line in file:
+            offsets.append(offsets[-1] + len(line))
+
+    index_path = get_index_path(path)
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    np.asarray(offsets, dtype=OFFSET_DTYPE).tofile(temp_path)
+    os.replace(temp_path, index_path)
+    logger.info(f"Indexed {len(offsets) - 1} combinations in {path}")
+    return index_path
+
+
+def convert_json(json_path: str, store_path: Optional[str] = None) -> str:
+    """
+    Converts a legacy combinations JSON file to a combination store.
+
+    Args:
+        json_path (str): Path to the combinations JSON file.
+        store_path (Optional[str]): Path of the store to write. Defaults to the JSON path
+            with a ".jsonl" extension.
+
+    Returns:
+        str: Path to the store.
+    """
+    store_path = store_path or get_store_path(json_path)
+    with open(json_path, "r") as file:
+        combinations = json.load(file)["combinations"]
+
+    with CombinationWriter(store_path) as writer:
+        for combination in combinations:
+            writer.write(combination)
+
+    logger.info(f"Converted {len(combinations)} combinations from {json_path} to {store_path}")
+    return store_path
+
+
+def open_combinations(path: str) -> Union[CombinationStore, CombinationShards]:
+    """
+    Opens a combinations file as a combination store.
+
+    A legacy combinations JSON file is converted to a store next to it the first time it
+    is opened, and again whenever the JSON file is newer than the store. A shard
+    directory or its manifest is opened as a sharded store.
+
+    Args:
+        path (str): Path to a combination store, a combinations JSON file, a shard
+            directory or a shard manifest.
+
+    Returns:
+        Union[CombinationStore, CombinationShards]: The opened store.
+    """
+    if os.path.isdir(path) or os.path.basename(path) == MANIFEST_FILE:
+        return CombinationShards(path)
+    if path.endswith(".json"):
+        store_path = get_store_path(path)
+        if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(path):
+            convert_json(path, store_path)
+        path = store_path
+    return CombinationStore(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a combinations JSON file to an indexed combination store."
+    )
+    parser.add_argument(
+        "--input_path",
+        type=str,
+        default="combinations.json",
+        help="Path to the combinations JSON file",
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        default=None,
+        help="Path to the combination store. Defaults to the input path with a .jsonl extension",
+    )
+    args = parser.parse_args()
+
+    convert_json(args.input_path, args.output_path)
@@ -0,0 +1,53 @@
+import bpy
+
+from ..animation import ensure_fcurve, get_action, set_keyframes
+from ..scene import initialize_scene
+
+
+def test_set_keyframes():
+    """
+    Test that keys written at once evaluate like keys inserted one by one.
+    """
+    initialize_scene()
+    bpy.ops.mesh.primitive_cube_add()
+    expected = bpy.context.active_object
+    bpy.ops.mesh.primitive_cube_add()
+    obj = bpy.context.active_object
+
+    frames = [1, 10, 30]
+    values = [(0, 0, 0), (1, 2, 3), (-1, 0, 2)]
+    for frame, value in zip(frames, values):
+        expected.location = value
+        expected.keyframe_insert(data_path="location", frame=frame)
+    set_keyframes(obj, "location", frames, values)
+
+    assert get_action(obj) == obj.animation_data.action
+    for index in range(3):
+        fcurve = ensure_fcurve(obj, "location", index)
+        assert len(fcurve.keyframe_points) == 3
+        expected_fcurve = ensure_fcurve(expected, "location", index)
+        for frame in (1, 4.5, 10, 17.25, 30, 40):
+            assert abs(fcurve.evaluate(frame) - expected_fcurve.evaluate(frame)) < 1e-5
+    print("============ Test Passed: test_set_keyframes ============")
+
+
+def test_set_keyframes_linear():
+    """
+    Test that linear keys replace the keys of a property and interpolate linearly.
+    """
+    initialize_scene()
+    camera = bpy.data.cameras.new("Lens")
+    set_keyframes(camera, "lens", [0, 10, 20], [50, 10, 20])
+    set_keyframes(camera, "lens", [0, 100], [10, 60], interpolation="LINEAR")
+
+    fcurve = ensure_fcurve(camera, "lens")
+    assert len(fcurve.keyframe_points) == 2
+    assert all(point.interpolation == "LINEAR" for point in fcurve.keyframe_points)
+    assert abs(fcurve.evaluate(25) - 22.5) < 1e-5
+    print("============ Test Passed: test_set_keyframes_linear ============")
+
+
+if __name__ == "__main__":
+    test_set_keyframes()
+    test_set_keyframes_linear()
+    print("============ ALL TESTS PASSED ============")
@@ -0,0 +1,249 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from ..asset_cache import AssetCache, get_file_hash
+from .http_server import start_server
+
+
+def test_fetch():
+    """
+    Test that assets are downloaded once, keep their extension and are counted.
+    """
+    server, url = start_server({"/a.hdr": b"a" * 10, "/b.jpg": b"b" * 20})
+    try:
+        with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+            assert cache.lookup(f"{url}/a.hdr", "backgrounds") is None
+            path = cache.fetch(f"{url}/a.hdr", "backgrounds")
+            assert path.startswith(os.path.join(directory, "backgrounds"))
+            assert path.endswith(".hdr")
+            assert cache.fetch(f"{url}/a.hdr", "backgrounds") == path
+            assert cache.lookup(f"{url}/a.hdr", "backgrounds") == path
+            cache.fetch(f"{url}/b.jpg", "textures")
+
+            assert server.requests == ["/a.hdr", "/b.jpg"]
+            stats = cache.stats()
+            assert stats["hits"] == 2 and stats["misses"] == 2
+            assert stats["bytes_downloaded"] == 30
+            assert stats["files"] == 2 and stats["bytes"] == cache.size() == 30
+
+            # the counts are shared with other processes through the index
+            with AssetCache(directory) as other:
+                other.fetch(f"{url}/b.jpg", "textures")
+            assert cache.stats()["hits"] == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_fetch ============")
+
+
+def test_eviction():
+    """
+    Test that the least recently used assets are evicted to stay within the budget.
+    """
+    files = {f"/{name}.jpg": name.encode() * 10 for name in "abcd"}
+    server, url = start_server(files)
+    try:
+        with tempfile.TemporaryDirectory() as directory, AssetCache(directory, max_bytes=30) as cache:
+            paths = {name: cache.fetch(f"{url}/{name}.jpg", "textures") for name in "abc"}
+            time.sleep(0.01)
+            cache.fetch(f"{url}/a.jpg", "textures")
+            # the assets were loaded, they may be evicted again
+            cache.release()
+
+            paths["d"] = cache.fetch(f"{url}/d.jpg", "textures")
+            assert not os.path.exists(paths["b"])
+            assert all(os.path.exists(paths[name]) for name in "acd")
+            assert cache.size() == 30
+
+            # the file just fetched is kept even when it alone is over the budget
+            assert cache.evict(5, keep=paths["d"]) == 20
+            assert os.path.exists(paths["d"]) and cache.size() == 10
+
+            stats = cache.stats()
+            assert stats["evictions"] == 3 and stats["bytes_evicted"] == 30
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_eviction ============")
+
+
+def test_pinned_eviction():
+    """
+    Test that assets fetched by another process and not released yet aren't evicted.
+    """
+    files = {f"/{name}.jpg": name.encode() * 10 for name in "abc"}
+    server, url = start_server(files)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with AssetCache(directory, max_bytes=20) as render, AssetCache(directory, max_bytes=20) as other:
+                # a render fetches two assets, and loads them later
+                paths = {name: render.fetch(f"{url}/{name}.jpg", "textures") for name in "ab"}
+                time.sleep(0.01)
+                paths["c"] = other.fetch(f"{url}/c.jpg", "textures")
+                assert all(os.path.exists(path) for path in paths.values())
+                assert other.size() == 30 and other.stats()["evictions"] == 0
+
+                # fetching twice pins twice
+                render.fetch(f"{url}/a.jpg", "textures")
+                render.release(paths["a"])
+                assert other.evict(20) == 0
+                render.release(paths["a"])
+                assert other.evict(20) == 10
+                assert not os.path.exists(paths["a"]) and os.path.exists(paths["b"])
+                # evicted assets don't leave their lock and pin files behind
+                assert not os.path.exists(paths["a"] + ".pin")
+                assert not os.path.exists(paths["a"] + ".lock")
+
+                # and are pinned again when fetched again
+                assert render.fetch(f"{url}/a.jpg", "textures") == paths["a"]
+                render.release(paths["b"])
+                other.release()
+                assert other.evict(0) == 20 and os.path.exists(paths["a"])
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_pinned_eviction ============")
+
+
+def test_remove_stale_lock_files():
+    """
+    Test that lock files of assets that aren't cached are deleted unless they are held.
+    """
+    def download(url, path, throttle=None):
+        with open(path, "wb") as f:
+            f.write(b"data")
+
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+        path = cache.fetch("https://example.com/a.jpg", "textures", download)
+        cache.release()
+        stale = [cache.get_path(f"https://example.com/{name}.jpg", "textures") for name in "bc"]
+        for stale_path in stale:
+            os.makedirs(os.path.dirname(stale_path), exist_ok=True)
+            for extension in (".lock", ".pin"):
+                open(stale_path + extension, "a").close()
+
+        with open(stale[1] + ".lock", "a") as held:
+            fcntl.flock(held, fcntl.LOCK_SH)
+            assert cache.remove_stale_lock_files() == 3
+        assert os.path.exists(stale[1] + ".lock")
+        assert not any(os.path.exists(stale[0] + extension) for extension in (".lock", ".pin"))
+        assert os.path.exists(path) and os.path.exists(path + ".pin")
+        assert cache.remove_stale_lock_files() == 1
+    print("============ Test Passed: test_remove_stale_lock_files ============")
+
+
+def test_concurrent_fetch():
+    """
+    Test that concurrent requests for an asset download it once.
+    """
+    server, url = start_server({"/big.glb": os.urandom(1000)}, delay=0.2)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            results = []
+
+            def fetch():
+                # one cache per thread, as separate processes would have
+                with AssetCache(directory) as cache:
+                    results.append(cache.fetch(f"{url}/big.glb", "objects"))
+
+            threads = [threading.Thread(target=fetch) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert len(set(results)) == 1 and len(results) == 4
+            assert server.requests == ["/big.glb"]
+            with AssetCache(directory) as cache:
+                stats = cache.stats()
+                assert stats["misses"] == 1 and stats["hits"] == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_concurrent_fetch ============")
+
+
+def test_fetch_many():
+    """
+    Test that several assets are downloaded at the same time.
+    """
+    files = {f"/{i}.jpg": b"x" * (i + 1) for i in range(4)}
+    server, url = start_server(files, delay=0.3)
+    try:
+        with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+            urls = [f"{url}/{i}.jpg" for i in range(4)]
+            start = time.monotonic()
+            paths = cache.fetch_many(urls + urls[:1], "textures")
+            assert time.monotonic() - start < 1.0
+
+            assert list(paths) == urls
+            assert paths[urls[2]] == cache.get_path(urls[2], "textures")
+            assert sorted(server.requests) == sorted(files)
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_fetch_many ============")
+
+
+def test_fetch_object():
+    """
+    Test that objects are downloaded with the objaverse downloader to the cache.
+    """
+    object_url = "https://huggingface.co/glbs/000-000/abc.glb"
+
+    def download(url, path, throttle=None):
+        with open(path, "wb") as f:
+            f.write(b"glb")
+
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache, patch(
+        "simian.asset_cache.objaverse.get_object_urls", return_value={"abc": object_url}
+    ), patch("simian.asset_cache.objaverse.download_file", side_effect=download) as mock_download:
+        path = cache.fetch_object("abc")
+        assert path == cache.get_path(object_url, "objects") and path.endswith(".glb")
+        assert cache.fetch_object("abc") == path
+        assert mock_download.call_count == 1
+    print("============ Test Passed: test_fetch_object ============")
+
+
+def test_get_file_hash():
+    """
+    Test that the hash of a file is remembered until the file changes.
+    """
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+        path = os.path.join(directory, "model.glb")
+        with open(path, "wb") as f:
+            f.write(b"model")
+
+        with patch("simian.asset_cache.get_file_hash", wraps=get_file_hash) as mock_hash:
+            digest = cache.get_file_hash(path)
+            assert digest == hashlib.sha256(b"model").hexdigest()
+            assert cache.get_file_hash(path) == digest
+            assert mock_hash.call_count == 1
+
+            # shared with other processes through the index
+            with AssetCache(directory) as other:
+                assert other.get_file_hash(path) == digest
+            assert mock_hash.call_count == 1
+
+            with open(path, "wb") as f:
+                f.write(b"changed")
+            assert cache.get_file_hash(path) == hashlib.sha256(b"changed").hexdigest()
+            assert mock_hash.call_count == 2
+    print("============ Test Passed: test_get_file_hash ============")
+
+
+if __name__ == "__main__":
+    test_fetch()
+    test_eviction()
+    test_pinned_eviction()
+    test_remove_stale_lock_files()
+    test_concurrent_fetch()
+    test_fetch_many()
+    test_fetch_object()
+    test_get_file_hash()
+    print("============ ALL TESTS PASSED ============")
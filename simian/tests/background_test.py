@@ -1,9 +1,13 @@
 import os
+import tempfile
 
 from unittest.mock import patch, MagicMock
 from ..background import (
+    get_background_url,
     get_hdri_path,
     get_background,
+    get_narrowest_fov,
+    select_hdri_resolution,
     set_background,
     create_photosphere,
     create_photosphere_material,
@@ -40,20 +44,88 @@ def test_get_background():
     }
     hdri_path = "/fake/path"
 
-    with patch("os.makedirs"), patch("os.path.exists", return_value=False), patch(
-        "requests.get"
-    ) as mock_get, patch("builtins.open", new_callable=MagicMock):
-        mock_response = MagicMock()
-        mock_response.content = b"fake data"
-        mock_get.return_value = mock_response
+    with patch("simian.background.get_asset_cache") as mock_get_asset_cache:
+        mock_cache = mock_get_asset_cache.return_value
+        mock_cache.get_path.return_value = "/cache/backgrounds/ab/abcd.hdr"
 
         get_background(hdri_path, combination)
         print("get_background called")
 
-        mock_get.assert_called_with("http://example.com/image.hdr")
+        # backgrounds that aren't saved locally are fetched through the asset cache
+        mock_cache.fetch.assert_called_with("http://example.com/image.hdr", "backgrounds")
+        assert get_hdri_path(hdri_path, combination) == "/cache/backgrounds/ab/abcd.hdr"
+
+        mock_cache.fetch.reset_mock()
+        with patch("os.path.exists", return_value=True):
+            get_background(hdri_path, combination)
+            assert get_hdri_path(hdri_path, combination) == "/fake/path/test_dataset/123.hdr"
+        mock_cache.fetch.assert_not_called()
         print("============ Test Passed: test_get_background ============")
 
 
+def test_select_hdri_resolution():
+    """
+    Test that the smallest HDRI resolution sharp enough for the render is selected.
+    """
+    resolutions = ["8k", "1k", "4k", "2k"]
+    # a 512 pixel wide render showing 90 degrees needs 2048 pixels across the panorama
+    assert select_hdri_resolution(resolutions, 512, 90) == "2k"
+    assert select_hdri_resolution(resolutions, 512, 180) == "1k"
+    assert select_hdri_resolution(resolutions, 1024, 90) == "4k"
+    assert select_hdri_resolution(resolutions, 1920, 20) == "8k"
+    assert select_hdri_resolution(["1k", "2k"], 1920, 20) == "2k"
+    assert select_hdri_resolution(["16k", "1k"], 256, 90) == "1k"
+    print("============ Test Passed: test_select_hdri_resolution ============")
+
+
+def test_get_background_url():
+    """
+    Test that the background URL is picked for the narrowest FOV of the animation.
+    """
+    urls = {resolution: f"http://example.com/{resolution}.hdr" for resolution in ["1k", "2k", "4k", "8k"]}
+    combination = {
+        "background": {"url": urls["8k"], "urls": urls, "id": "123", "from": "test_dataset"},
+        "framing": {"fov": 100},
+        "animation": {"keyframes": [{"Camera": {"angle_offset": 10}}, {"Camera": {"angle_offset": -10}}]},
+    }
+    assert get_narrowest_fov(combination) == 90
+    assert get_background_url(combination, 512) == urls["2k"]
+    assert get_background_url(combination, 1920) == urls["8k"]
+    # without a render width or resolution tiers the default URL is used
+    assert get_background_url(combination) == urls["8k"]
+    del combination["background"]["urls"]
+    assert get_background_url(combination, 512) == urls["8k"]
+    print("============ Test Passed: test_get_background_url ============")
+
+
+def test_shared_background_image():
+    """
+    Test that the world and the photosphere share one image datablock.
+    """
+    with tempfile.TemporaryDirectory() as hdri_path:
+        combination = {
+            "background": {"id": "shared", "from": "test_dataset", "url": "http://example.com/shared.hdr"}
+        }
+        path = os.path.join(hdri_path, "test_dataset", "shared.hdr")
+        os.makedirs(os.path.dirname(path))
+        image = bpy.data.images.new("shared_source", 8, 4, float_buffer=True)
+        image.filepath_raw = path
+        image.file_format = "HDR"
+        image.save()
+        bpy.data.images.remove(image)
+
+        set_background(hdri_path, combination)
+        sphere = create_photosphere(hdri_path, combination)
+
+        world_nodes = bpy.context.scene.world.node_tree.nodes
+        world_image = [node for node in world_nodes if node.type == "TEX_ENVIRONMENT"][0].image
+        sphere_nodes = sphere.data.materials[0].node_tree.nodes
+        sphere_image = [node for node in sphere_nodes if node.type == "TEX_ENVIRONMENT"][0].image
+        assert world_image == sphere_image
+        assert len([image for image in bpy.data.images if image.filepath == path]) == 1
+    print("============ Test Passed: test_shared_background_image ============")
+
+
 def test_set_background():
     """
     Test the set_background function.
@@ -191,6 +263,9 @@ def test_create_photosphere_material():
 if __name__ == "__main__":
     test_get_hdri_path()
     test_get_background()
+    test_select_hdri_resolution()
+    test_get_background_url()
+    test_shared_background_image()
     # test_set_background()
     test_create_photosphere()
     # test_create_photosphere_material()
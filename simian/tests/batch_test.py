@@ -1,4 +1,79 @@
-from ..batch import render_objects
+import os
+import tempfile
+import threading
+import time
+
+from ..batch import (
+    find_outputs,
+    get_default_processes,
+    get_render_threads,
+    render_objects,
+    run_scheduler,
+)
+
+
+def test_get_render_threads():
+    """
+    Test that CPU cores are split between concurrent renders.
+    """
+    assert get_render_threads(4, cpu_count=64) == 16
+    assert get_render_threads(3, cpu_count=8) == 2
+    assert get_render_threads(192, cpu_count=64) == 1
+    print("============ Test Passed: get_render_threads ============")
+
+
+def test_get_default_processes():
+    # the default never runs more renders than the cores can give threads to
+    for cpu_count in (1, 3, 8, 64):
+        processes = get_default_processes(cpu_count)
+        assert 1 <= processes <= cpu_count
+        assert processes * get_render_threads(processes, cpu_count) <= max(cpu_count, 1)
+    assert get_default_processes(64) == 16
+    print("============ Test Passed: get_default_processes ============")
+
+
+def test_run_scheduler():
+    """
+    Test that the scheduler keeps the requested number of renders in flight and
+    collects a status for every index.
+    """
+    lock = threading.Lock()
+    in_flight = []
+    max_in_flight = []
+
+    def render_index(index, render_server):
+        with lock:
+            in_flight.append(index)
+            max_in_flight.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.remove(index)
+        return None if index == 3 else index % 2
+
+    statuses = run_scheduler(list(range(10)), 4, render_index)
+
+    assert max(max_in_flight) == 4
+    assert sorted(statuses) == list(range(10))
+    assert statuses[3] is None
+    assert statuses[4] == 0 and statuses[5] == 1
+    print("============ Test Passed: run_scheduler ============")
+
+
+def test_find_outputs():
+    """
+    Test that only complete renders are reported as outputs.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name in ["0.mp4", "1.mp4", "1.blend", "2_frame_32_1920x1080.partial.png"]:
+            open(os.path.join(output_dir, name), "w").close()
+
+        assert find_outputs(output_dir, 0) == []
+        assert find_outputs(output_dir, 1) == [
+            os.path.join(output_dir, "1.mp4"),
+            os.path.join(output_dir, "1.blend"),
+        ]
+        assert find_outputs(output_dir, 2, images=True) == []
+    print("============ Test Passed: find_outputs ============")
 
 
 def test_render_objects():
@@ -34,5 +109,9 @@ def test_render_objects():
 
 
 if __name__ == "__main__":
+    test_get_render_threads()
+    test_get_default_processes()
+    test_run_scheduler()
+    test_find_outputs()
     test_render_objects()
     print("============ ALL TESTS PASSED ============")
@@ -0,0 +1,77 @@
+import json
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from ..caption_store import CaptionStore, open_captions, write_caption_store
+
+
+def test_caption_store():
+    """
+    Test that captions are read back by uid and uids in the order of the map.
+    """
+    captions = {
+        "e3e70682c2094cac629f6fbed82c07cd": "red chair",
+        "4da5e709d4713d60c8a70639eb1167b3": "wooden table ✓",
+        "23c6612f": "",
+        "00aa": "a lamp",
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_caption_store(captions, os.path.join(directory, "captions.captions"))
+        with CaptionStore(path) as store:
+            assert len(store) == 4
+            assert list(store.uids) == list(captions.keys())
+            for uid, caption in captions.items():
+                assert store.caption(uid) == caption
+                assert store[uid] == caption
+                assert uid in store
+            assert "missing" not in store
+            try:
+                store.caption("missing")
+                assert False, "Expected a KeyError"
+            except KeyError:
+                pass
+
+            # draws match drawing from the keys of the map
+            rng, expected_rng = random.Random(0), random.Random(0)
+            uids = list(captions.keys())
+            for _ in range(100):
+                assert store.random_uid(rng) == expected_rng.choice(uids)
+
+            # worker processes reopen the file instead of copying the captions
+            copy = pickle.loads(pickle.dumps(store))
+            assert copy["00aa"] == "a lamp"
+            copy.close()
+    print("============ Test Passed: test_caption_store ============")
+
+
+def test_open_captions():
+    """
+    Test that a captions JSON file is converted once, and again when it changes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "cap3d_captions.json")
+        with open(json_path, "w") as file:
+            json.dump({"a": "first"}, file)
+
+        with open_captions(json_path) as store:
+            assert store.path == os.path.join(directory, "cap3d_captions.captions")
+            assert store["a"] == "first"
+
+        with open(json_path, "w") as file:
+            json.dump({"a": "second", "b": "third"}, file)
+        modified = time.time() + 10
+        os.utime(json_path, (modified, modified))
+        with open_captions(json_path) as store:
+            assert len(store) == 2
+            assert store["a"] == "second"
+    print("============ Test Passed: test_open_captions ============")
+
+
+if __name__ == "__main__":
+    test_caption_store()
+    test_open_captions()
+    print("============ ALL TESTS PASSED ============")
@@ -0,0 +1,80 @@
+import json
+import os
+import random
+
+from ..captions import (
+    OBJECT_REPLACEMENTS,
+    ORIENTATION_REPLACEMENTS,
+    CaptionTemplate,
+    CaptionTemplates,
+    NearestLabels,
+    apply_replacements,
+)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "../../"))
+
+
+def test_caption_template():
+    """
+    Test that compiled templates render exactly like the chained replaces.
+    """
+    with open(os.path.join(project_root, "data/object_data.json"), "r") as file:
+        object_data = json.load(file)
+
+    template = CaptionTemplate("The <name> is <size_in_feet> <size>, <size>.", OBJECT_REPLACEMENTS)
+    values = ["chair", "wooden", "big", "1m", "3ft"]
+    assert template.render(values) == "The chair is 3ft big, <size>."
+
+    # the pitch fills every <degrees>, since it is substituted first
+    template = CaptionTemplate("<pitch> <degrees>, <yaw> <degrees> {0}", ORIENTATION_REPLACEMENTS)
+    assert template.render(["low", "10", "left", "90"]) == "low 10, left 10 {0}"
+
+    rng = random.Random(0)
+    words = ["chair", "<description>", "{0}", "", "a > b", "<size", "name>"]
+    for text in object_data["name_description_relationship"] + ["<na<name>e>"]:
+        template = CaptionTemplate(text, OBJECT_REPLACEMENTS)
+        for _ in range(50):
+            values = [rng.choice(words) for _ in OBJECT_REPLACEMENTS]
+            assert template.render(values) == apply_replacements(text, OBJECT_REPLACEMENTS, values)
+    print("============ Test Passed: test_caption_template ============")
+
+
+def test_nearest_labels():
+    """
+    Test that the bisect lookup picks the same label as a min() over the keys.
+    """
+    rng = random.Random(0)
+    for _ in range(200):
+        labels = {str(rng.randint(-90, 90)): ["label"] for _ in range(rng.randint(1, 6))}
+        table = NearestLabels(labels)
+        for value in range(-120, 121):
+            expected = min(labels.keys(), key=lambda x: abs(int(x) - value))
+            assert table.nearest(value) == expected
+    print("============ Test Passed: test_nearest_labels ============")
+
+
+def test_caption_templates():
+    """
+    Test that the templates of the data files are compiled in order.
+    """
+    with open(os.path.join(project_root, "data/camera_data.json"), "r") as file:
+        camera_data = json.load(file)
+    with open(os.path.join(project_root, "data/object_data.json"), "r") as file:
+        object_data = json.load(file)
+
+    templates = CaptionTemplates(camera_data, object_data)
+    for text in camera_data["orientation"]["descriptions"]:
+        assert templates.orientation[text].text == text
+    for text in object_data["name_description_relationship"]:
+        assert templates.object_name_description[text].text == text
+    assert templates.yaw_labels.nearest(350) == "345"
+    assert templates.fov["The focal length is <mm> mm."].render(["45", "42"]) == "The focal length is 42 mm."
+    print("============ Test Passed: test_caption_templates ============")
+
+
+if __name__ == "__main__":
+    test_caption_template()
+    test_nearest_labels()
+    test_caption_templates()
+    print("============ ALL TESTS PASSED ============")
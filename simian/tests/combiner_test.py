@@ -5,6 +5,7 @@ import argparse
 import math
 from unittest.mock import patch, mock_open
 import random
+import tempfile
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, "../../"))
@@ -34,6 +35,10 @@ with patch("argparse.ArgumentParser.parse_args", new=mock_parse_args):
     from ..combiner import (
         read_json_file,
         generate_combinations,
+        generate_combination,
+        iter_combinations,
+        CombinerContext,
+        WeightedSampler,
         generate_stage_captions,
         generate_orientation_caption,
         generate_object_name_description_captions,
@@ -43,16 +48,19 @@ with patch("argparse.ArgumentParser.parse_args", new=mock_parse_args):
         generate_framing_caption,
         flatten_descriptions,
         generate_animation_captions,
-        generate_postprocessing,
         generate_orientation,
-        generate_framing,
         generate_animation,
         generate_objects,
         generate_background,
         generate_stage,
         flatten_descriptions,
         speed_factor_to_percentage,
+        add_object_locations,
     )
+from ..object_cache import PIPELINE_VERSION
+from ..transform import adjust_positions, determine_relationships
+from ..object_index import ObjectIndex
+from ..sampling import ScalarParameters
 
 
 def test_generate_postprocessing_caption():
@@ -430,6 +438,87 @@ def test_generate_combinations():
         ), "Pitch is out of the specified range."
         print("============ Test Passed: test_generate_combinations ============")
 
+    # streaming from a context yields the same combinations
+    context = CombinerContext(
+        camera_data=camera_data,
+        object_data=object_data,
+        dataset_dict=dataset_dict,
+        captions_data=captions_data,
+        background_dict=background_dict,
+        background_names=background_names,
+        background_weights=background_weights,
+        texture_data=texture_data,
+        dataset_names=dataset_names,
+        dataset_weights=dataset_weights,
+        movement=movement,
+    )
+    streamed = iter_combinations(context, count, seed)
+    assert list(streamed) == combinations["combinations"]
+    print("============ Test Passed: test_iter_combinations ============")
+
+    # a process pool yields the same combinations, and any index can be regenerated alone
+    parallel = iter_combinations(context, count, seed, processes=2, chunk_size=1)
+    assert list(parallel) == combinations["combinations"]
+    single = generate_combination(count - 1, seed, context)
+    assert single == combinations["combinations"][-1]
+    print("============ Test Passed: test_parallel_combinations ============")
+
+    # objects that failed to preprocess are redrawn, without copying the dataset uids
+    with tempfile.TemporaryDirectory() as directory:
+        with ObjectIndex(os.path.join(directory, "index.sqlite")) as index:
+            index.add({"uid": "2", "valid": False, "error": "broken", "pipeline_version": PIPELINE_VERSION})
+            failed_context = CombinerContext(
+                camera_data=camera_data,
+                object_data=object_data,
+                dataset_dict=dataset_dict,
+                captions_data=captions_data,
+                background_dict=background_dict,
+                background_names=background_names,
+                background_weights=background_weights,
+                texture_data=texture_data,
+                object_index=index,
+            )
+            assert failed_context.dataset_dict is dataset_dict
+            uids = {
+                obj["uid"]
+                for combination in iter_combinations(failed_context, 50, seed, processes=2)
+                for obj in combination["objects"]
+            }
+            assert uids == {"1", "3"}, "A failed object was drawn."
+
+            for uid in ("1", "3"):
+                index.add({"uid": uid, "valid": False, "error": "broken", "pipeline_version": PIPELINE_VERSION})
+            try:
+                CombinerContext(
+                    camera_data=camera_data,
+                    object_data=object_data,
+                    dataset_dict=dataset_dict,
+                    captions_data=captions_data,
+                    background_dict=background_dict,
+                    background_names=background_names,
+                    background_weights=background_weights,
+                    texture_data=texture_data,
+                    object_index=index,
+                )
+                assert False, "A dataset without valid objects was accepted."
+            except ValueError:
+                pass
+    print("============ Test Passed: test_failed_objects ============")
+
+
+def test_weighted_sampler():
+    """
+    Test that a precomputed sampler draws the same items as random.choices with the same weights.
+    """
+    items = ["a", "b", "c", "d"]
+    weights = [0.1, 0.4, 0.3, 0.2]
+    sampler = WeightedSampler(items, weights)
+
+    rng_choices = random.Random(7)
+    rng_sampler = random.Random(7)
+    for _ in range(1000):
+        assert sampler.sample(rng_sampler) == rng_choices.choices(items, weights=weights)[0]
+    print("============ Test Passed: test_weighted_sampler ============")
 
 
 def test_generate_stage_captions():
@@ -558,23 +647,24 @@ def test_generate_object_name_description_captions():
 
 def test_generate_relationship_captions():
     combination = {
-        "objects": [{"name": "Box"}, {"name": "Ball"}],
+        "objects": [{"name": "Box", "placement": 4}, {"name": "Ball", "placement": 5}],
         "orientation": {"yaw": 0},
     }
 
-    with patch(
-        "simian.combiner.adjust_positions",
-        return_value=[
-            {"transformed_position": [0, 0]},
-            {"transformed_position": [1, 0]},
-        ],
-    ):
-        with patch(
-            "simian.combiner.determine_relationships", return_value=["Box is near Ball"]
-        ):
-            captions = generate_relationship_captions(combination)
-            print("Generated captions:", captions)  # Add this line for debugging
-            assert "Box is near Ball" in captions, "Relationship caption is incorrect."
+    captions = generate_relationship_captions(combination)
+    assert captions == [
+        "Box is  and behind Ball.",
+        "Ball is  and in front of Box.",
+    ], "Relationship caption is incorrect."
+    assert combination["objects"][0]["relationships"] == "Box is  and behind Ball."
+
+    # with more relationships than objects, as many are sampled as there are objects
+    combination["objects"].append({"name": "Cup", "placement": 0})
+    captions = generate_relationship_captions(combination, random.Random(0))
+    assert len(captions) == 3 and len(set(captions)) == 3, "Relationship captions aren't sampled."
+    assert "Cup is to the right of and behind Box." in determine_relationships(
+        adjust_positions(combination["objects"], 0), 0
+    )
 
     print("============ Test Passed: test_generate_relationship_captions ============")
 
@@ -621,37 +711,6 @@ def test_generate_fov_caption():
     print("============ Test Passed: test_generate_fov_caption ============")
 
 
-def test_generate_postprocessing():
-    camera_data = {
-        "postprocessing": {
-            "bloom": {
-                "threshold_min": 0.1,
-                "threshold_max": 0.9,
-                "intensity_min": 0.1,
-                "intensity_max": 0.9,
-                "radius_min": 0.1,
-                "radius_max": 0.9,
-                "types": {
-                    "type1": {"intensity_min": 0.1, "intensity_max": 0.5},
-                    "type2": {"intensity_min": 0.6, "intensity_max": 0.9},
-                },
-            },
-            # Add similar data for ssao, ssrr, and motionblur
-        }
-    }
-
-    with patch("random.uniform", side_effect=[0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4]):
-        postprocessing = generate_postprocessing(camera_data)
-
-        assert postprocessing["bloom"]["threshold"] == 0.3
-        assert postprocessing["bloom"]["intensity"] == 0.4
-        assert postprocessing["bloom"]["radius"] == 0.5
-        assert postprocessing["bloom"]["type"] == "type1"
-
-        # Add similar assertions for ssao, ssrr, and motionblur
-    print("============ Test Passed: test_generate_postprocessing ============")
-
-
 def test_generate_framing_caption():
     combination = {"framing": {"name": "wide", "fov": 45, "coverage_factor": 1}}
 
@@ -768,13 +827,18 @@ def test_generate_postprocessing():
                 "shutter_speed_max": 1,
                 "types": {"low": {"shutter_speed_min": 0, "shutter_speed_max": 1}},
             },
-        }
+        },
+        "framings": [
+            {"name": "wide", "fov_min": 30, "fov_max": 60, "coverage_factor_min": 1, "coverage_factor_max": 2}
+        ],
     }
-    postprocessing = generate_postprocessing(camera_data)
+    postprocessing = ScalarParameters(camera_data, 0, 0, 1).postprocessing(0)
     assert "bloom" in postprocessing, "Postprocessing generation is incorrect."
     assert "ssao" in postprocessing, "Postprocessing generation is incorrect."
     assert "ssrr" in postprocessing, "Postprocessing generation is incorrect."
     assert "motionblur" in postprocessing, "Postprocessing generation is incorrect."
+    assert postprocessing["bloom"]["type"] == "low", "Postprocessing type is incorrect."
+    assert 0 <= postprocessing["bloom"]["radius"] <= 10, "Bloom radius is out of range."
     print("============ Test Passed: test_generate_postprocessing ============")
 
 
@@ -788,11 +852,29 @@ def test_generate_orientation():
         orientation = generate_orientation(camera_data, objects, background)
         assert orientation["yaw"] <= 180, "Orientation yaw is out of range."
         assert orientation["pitch"] <= 90, "Orientation pitch is out of range."
+
+    # the camera never looks within 15 degrees of the object on the +x axis
+    camera_data["orientation"]["yaw_min"] = -180
+    rng = random.Random(0)
+    yaws = [generate_orientation(camera_data, objects, background, rng)["yaw"] for _ in range(500)]
+    assert all(abs(yaw) >= 15 for yaw in yaws), "Orientation is occluded."
+    assert min(yaws) < -90 and max(yaws) > 90, "Orientation doesn't cover the clear yaws."
+
+    # with objects all around, the least occluded yaws are used
+    objects = [{"transformed_position": [0, 0]}] + [
+        {"transformed_position": [math.cos(math.radians(a)), math.sin(math.radians(a)), 0]}
+        for a in range(-180, 180, 20)
+    ]
+    orientation = generate_orientation(camera_data, objects, background, rng)
+    assert orientation["yaw"] % 20 == 10, "Orientation isn't the least occluded one."
     print("============ Test Passed: test_generate_orientation ============")
 
 
 def test_generate_framing():
     camera_data = {
+        "postprocessing": read_json_file(
+            os.path.join(data_dir, "camera_data.json")
+        )["postprocessing"],
         "framings": [
             {
                 "name": "wide",
@@ -803,7 +885,7 @@ def test_generate_framing():
             }
         ]
     }
-    framing = generate_framing(camera_data)
+    framing = ScalarParameters(camera_data, 0, 0, 1).framing(0)
     assert framing["fov"] >= 30, "FOV is out of range."
     assert framing["fov"] <= 60, "FOV is out of range."
     assert framing["name"] == "wide", "Framing name is incorrect."
@@ -884,7 +966,16 @@ def test_generate_background():
             background = generate_background(background_dict, background_names, background_weights)
             assert background["name"] == "Sky", "Background name is incorrect."
             assert background["url"] == "sky_url", "Background url is incorrect."
-    
+            assert "urls" not in background, "Background urls should only be set when known."
+
+    # the URLs of each resolution are passed on to the renderer
+    urls = {"1k": "sky_1k_url", "8k": "sky_url"}
+    background_dict["background1"]["id1"]["urls"] = urls
+    with patch("simian.combiner.random.choices", return_value=["background1"]):
+        with patch("simian.combiner.random.choice", return_value="id1"):
+            background = generate_background(background_dict, background_names, background_weights)
+            assert background["urls"] == urls, "Background urls are incorrect."
+
     print("============ Test Passed: test_generate_background ============")
 
 
@@ -903,10 +994,43 @@ def test_generate_stage():
     print("============ Test Passed: test_generate_stage ============")
 
 
+def test_add_object_locations():
+    """
+    Test that object locations are planned from the object index.
+    """
+    record = {
+        "valid": True,
+        "width": 1.0,
+        "depth": 1.0,
+        "height": 1.0,
+        "center_x": 0.0,
+        "center_y": 0.0,
+        "pipeline_version": PIPELINE_VERSION,
+    }
+    objects = [
+        {"uid": "a", "scale": {"factor": 1}, "transformed_position": (0, 0)},
+        {"uid": "b", "scale": {"factor": 1}, "transformed_position": (0.1, -0.2)},
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        with ObjectIndex(os.path.join(directory, "index.sqlite")) as index:
+            index.add({**record, "uid": "a"})
+            add_object_locations(objects, index)
+            assert all("location" not in obj for obj in objects), "Objects missing from the index can't be planned."
+
+            index.add({**record, "uid": "b"})
+            add_object_locations(objects, index)
+            # both objects are on the same grid position, so the second one is stacked
+            assert objects[0]["location"] == [0, 0, 0]
+            assert objects[1]["location"] == [0, 0, 1.0]
+
+    print("============ Test Passed: test_add_object_locations ============")
+
+
 if __name__ == "__main__":
     test_read_json_file()
     test_combination_caption()
     test_generate_combinations()
+    test_weighted_sampler()
     test_generate_stage_captions()
     test_generate_orientation_caption()
     test_generate_object_name_description_captions()
@@ -923,4 +1047,5 @@ if __name__ == "__main__":
     test_generate_objects()
     test_generate_background()
     test_generate_stage()
+    test_add_object_locations()
     print("============ ALL TESTS PASSED ============")
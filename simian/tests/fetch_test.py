@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from .. import fetch
+from ..fetch import download_file, get_session
+from .http_server import start_server
+
+
+def test_get_session():
+    """
+    Test that the session is shared within a process and recreated after a fork.
+    """
+    session = get_session()
+    assert get_session() is session
+    with patch.object(fetch, "_session_pid", -1):
+        assert get_session() is not session
+    print("============ Test Passed: test_get_session ============")
+
+
+def test_download_file():
+    """
+    Test that files are streamed into place over one kept-alive connection.
+    """
+    data = os.urandom(3 * (1 << 20) + 5)
+    server, url = start_server({"/a.hdr": data, "/b.jpg": b"texture"})
+    try:
+        with tempfile.TemporaryDirectory() as directory, patch.object(fetch, "_session", None):
+            path = os.path.join(directory, "poly_haven", "a.hdr")
+            assert download_file(f"{url}/a.hdr", path) == len(data)
+            with open(path, "rb") as f:
+                assert f.read() == data
+            download_file(f"{url}/b.jpg", os.path.join(directory, "b.jpg"))
+            assert server.connections == 1
+
+            try:
+                download_file(f"{url}/missing.hdr", os.path.join(directory, "c.hdr"))
+                assert False, "a missing file should raise"
+            except Exception:
+                pass
+            assert sorted(os.listdir(directory)) == ["b.jpg", "poly_haven"]
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_download_file ============")
+
+
+def test_download_retries():
+    """
+    Test that server errors are retried.
+    """
+    server, url = start_server({"/a.jpg": b"texture"})
+    server.faults = {"/a.jpg": ["error", "error"]}
+    try:
+        with tempfile.TemporaryDirectory() as directory, patch.object(fetch, "_session", None):
+            path = os.path.join(directory, "a.jpg")
+            assert download_file(f"{url}/a.jpg", path) == 7
+            assert server.requests == ["/a.jpg"] * 3
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_download_retries ============")
+
+
+if __name__ == "__main__":
+    test_get_session()
+    test_download_file()
+    test_download_retries()
+    print("============ ALL TESTS PASSED ============")
@@ -0,0 +1,58 @@
+import math
+
+import bpy
+import numpy as np
+from mathutils import Vector
+
+from ..geometry import (
+    get_local_bbox_corners,
+    get_world_bbox_corners,
+    get_world_bounds,
+    get_world_points,
+    transform_points,
+)
+from ..scene import initialize_scene
+
+
+def test_world_bbox_corners():
+    """
+    Test that the corners match the bounding box transformed by mathutils.
+    """
+    initialize_scene()
+    bpy.ops.mesh.primitive_cube_add(size=2, location=(1, 2, 3), rotation=(0.3, 0.2, 0.1))
+    obj = bpy.context.active_object
+    obj.scale = (1, 2, 3)
+    bpy.context.view_layer.update()
+
+    expected = np.array([(obj.matrix_world @ Vector(corner))[:] for corner in obj.bound_box])
+    assert np.allclose(get_world_bbox_corners(obj), expected, atol=1e-5)
+    assert np.allclose(get_local_bbox_corners(obj), np.array([corner[:] for corner in obj.bound_box]))
+    assert np.allclose(transform_points(np.zeros((1, 3)), np.eye(4)), 0)
+    print("============ Test Passed: test_world_bbox_corners ============")
+
+
+def test_world_bounds():
+    """
+    Test the bounds of several objects, from bounding boxes and from vertices.
+    """
+    initialize_scene()
+    bpy.ops.mesh.primitive_cube_add(size=2, location=(0, 0, 0))
+    bpy.ops.mesh.primitive_uv_sphere_add(radius=1, location=(5, 0, 0), rotation=(0, 0, math.pi / 4))
+    objects = list(bpy.context.scene.objects)
+    bpy.context.view_layer.update()
+
+    bbox_min, bbox_max = get_world_bounds(objects)
+    assert np.allclose(bbox_min, (-1, -math.sqrt(2), -1), atol=1e-5)
+    assert np.allclose(bbox_max, (5 + math.sqrt(2), math.sqrt(2), 1), atol=1e-5)
+
+    # the vertices of the rotated sphere are bounded tighter than its bounding box
+    vertex_min, vertex_max = get_world_bounds(objects, use_vertices=True)
+    assert vertex_max[0] < bbox_max[0] and vertex_max[0] <= 6 + 1e-5
+    assert len(get_world_points(objects[1], use_vertices=True)) == len(objects[1].data.vertices)
+    print("============ Test Passed: test_world_bounds ============")
+
+
+if __name__ == "__main__":
+    test_world_bbox_corners()
+    test_world_bounds()
+    print("============ ALL TESTS PASSED ============")
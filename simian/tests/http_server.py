@@ -0,0 +1,106 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    Local file server for the download tests, with Range support and injected faults.
+
+    Args:
+        files (dict): Contents of each path, such as "/a.jpg".
+        delay (float): Seconds each request waits before it is answered, so concurrent
+            requests of the same file overlap.
+    """
+
+    def __init__(self, files, delay=0.0):
+        super().__init__(("127.0.0.1", 0), FileRequestHandler)
+        self.files = files
+        self.delay = delay
+        self.faults = {}  # path -> list of "cut", "error" or "ignore_range", one per request
+        self.requests = []
+        self.range_headers = {}  # path -> Range header of each request, None if it had none
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def send_empty(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get("Range")
+        with server.lock:
+            server.requests.append(self.path)
+            server.range_headers.setdefault(self.path, []).append(range_header)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            faults = server.faults.get(self.path, [])
+            fault = faults.pop(0) if faults else None
+        try:
+            time.sleep(server.delay)
+            data = server.files.get(self.path)
+            if data is None:
+                self.send_empty(404)
+                return
+            if fault == "error":
+                self.send_empty(503)
+                return
+
+            start = 0
+            if range_header and fault != "ignore_range":
+                start = int(range_header[len("bytes="):].rstrip("-"))
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(data) - start))
+            self.end_headers()
+
+            body = data[start:]
+            if fault == "cut":
+                # send half of the body and drop the connection
+                self.wfile.write(body[: len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def start_server(files, delay=0.0):
+    """
+    Serves files from a background thread until `shutdown` is called.
+
+    Args:
+        files (dict): Contents of each path, such as "/a.jpg".
+        delay (float): Seconds each request waits before it is answered.
+
+    Returns:
+        tuple: The server and its base URL.
+    """
+    server = FileServer(files, delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.url
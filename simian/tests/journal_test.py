@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+
+from ..journal import JobJournal, DONE, FAILED, PENDING
+
+
+def test_journal_records_states():
+    """
+    Test that state changes are written to disk and replayed when the journal is reopened.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_path = os.path.join(output_dir, "0.mp4")
+        open(output_path, "w").close()
+
+        with JobJournal(output_dir) as journal:
+            journal.add([0, 1, 2])
+            journal.start(0)
+            journal.finish(0, [output_path])
+            journal.start(1)
+            journal.fail(1, "boom")
+
+        with JobJournal(output_dir) as journal:
+            assert journal.get(0)["state"] == DONE
+            assert journal.get(0)["outputs"] == [output_path]
+            assert journal.get(1)["state"] == FAILED
+            assert journal.get(1)["attempts"] == 1
+            assert journal.get(1)["error"] == "boom"
+            assert journal.get(2)["state"] == PENDING
+            assert journal.remaining([0, 1, 2], max_attempts=3) == [1, 2]
+            assert journal.remaining([0, 1, 2], max_attempts=1) == [2]
+
+        # reopening compacts the journal to one line per index
+        with open(os.path.join(output_dir, "journal.jsonl")) as file:
+            assert len(file.readlines()) == 3
+    print("============ Test Passed: test_journal_records_states ============")
+
+
+def test_journal_recovers_from_crash():
+    """
+    Test that running indices and a truncated last line from a killed run are handled.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        with JobJournal(output_dir) as journal:
+            journal.add([0, 1])
+            journal.start(0)
+            journal.start(1)
+            journal.finish(1, [os.path.join(output_dir, "missing.mp4")])
+
+        with open(os.path.join(output_dir, "journal.jsonl"), "a") as file:
+            file.write(json.dumps({"index": 1, "state": "done"})[:10])
+
+        with JobJournal(output_dir) as journal:
+            assert journal.get(0)["state"] == FAILED
+            assert journal.get(0)["attempts"] == 1
+            # done but its outputs were deleted, so it is rendered again
+            assert not journal.is_done(1)
+            assert journal.remaining([0, 1], max_attempts=2) == [0, 1]
+    print("============ Test Passed: test_journal_recovers_from_crash ============")
+
+
+if __name__ == "__main__":
+    test_journal_records_states()
+    test_journal_recovers_from_crash()
+    print("============ ALL TESTS PASSED ============")
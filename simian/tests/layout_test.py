@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+from ..layout import (
+    bring_to_origin,
+    get_approach_distances,
+    get_contact_distance,
+    get_footprint,
+    place_on_grid,
+    plan_layout,
+)
+
+
+def test_get_contact_distance():
+    direction = np.array([-1.0, 0.0])
+    box = np.array([4.0, -0.5, 5.0, 0.5])
+    others = np.array([[-0.5, -0.5, 0.5, 0.5]])
+    # stops within padding of the box in the way
+    assert abs(get_contact_distance(box, direction, others, 10) - 3.42) < 1e-9
+    # boxes off to the side or behind don't stop it
+    others = np.array([[-0.5, 2.0, 0.5, 3.0], [6.0, -0.5, 7.0, 0.5]])
+    assert get_contact_distance(box, direction, others, 10) == 10
+    # nor does a box it is touching and moving away from
+    others = np.array([[5.08, -0.5, 6.0, 0.5]])
+    assert get_contact_distance(box, direction, others, 10) == 10
+    # a box that already overlaps it keeps it in place
+    others = np.array([[4.5, -0.5, 5.5, 0.5]])
+    assert get_contact_distance(box, direction, others, 10) == 0
+
+    # a diagonal approach clipping the corner of a box is stopped by it
+    box = np.array([1.5, 1.5, 2.5, 2.5])
+    others = np.array([[1.2, -0.5, 2.8, 0.4]])
+    diagonal = np.array([-1.0, -1.0]) / math.sqrt(2)
+    assert get_contact_distance(box, diagonal, others, 2 * math.sqrt(2)) < 2 * math.sqrt(2)
+    print("============ Test Passed: test_get_contact_distance ============")
+
+
+def test_get_approach_distances():
+    steps = get_approach_distances(4.0)
+    assert steps[0] == 0 and abs(steps[1] - 0.4) < 1e-9
+    assert np.all(np.diff(steps) > 0) and steps[-1] < 4.0
+    assert abs(steps[-1] - 4.0) < 1e-6
+    # long approaches are taken in steps of at most 0.5
+    assert abs(get_approach_distances(20.0)[1] - 0.5) < 1e-9
+    print("============ Test Passed: test_get_approach_distances ============")
+
+
+def test_bring_to_origin():
+    locations = np.array([[0, 0, 0], [4, 0, 0], [0, -4, 0]], dtype=float)
+    boxes = np.array([[-0.5, -0.5, 0.5, 0.5], [3.5, -0.5, 4.5, 0.5], [-0.5, -4.5, 0.5, -3.5]])
+    result = bring_to_origin(locations, boxes)
+    assert np.all(result[0] == 0)
+    # the others come up against the box at the origin, keeping the padding
+    assert 1.08 <= result[1, 0] < 1.08 + 0.5 and result[1, 1] == 0
+    assert -1.08 - 0.5 < result[2, 1] <= -1.08
+    # the input is left as it was
+    assert locations[1, 0] == 4
+    print("============ Test Passed: test_bring_to_origin ============")
+
+
+def test_get_footprint():
+    record = {"width": 4.0, "depth": 2.0, "height": 1.0, "center_x": 1.0, "center_y": 0.0}
+    footprint, height = get_footprint(record, 0.5)
+    # the largest dimension is scaled to 1 / factor, around the pivot
+    assert np.allclose(footprint, [-0.5, -0.5, 1.5, 0.5])
+    assert abs(height - 0.5) < 1e-9
+    print("============ Test Passed: test_get_footprint ============")
+
+
+def test_place_on_grid():
+    footprints = np.array([[-0.5, -0.5, 0.5, 0.5], [-1.0, -0.25, 1.0, 0.25], [-0.5, -0.5, 0.5, 0.5]])
+    positions = [(0, 0), (0.2, -0.1), (1, 0)]
+    locations = place_on_grid(positions, footprints, [1.0, 0.5, 1.0])
+    # objects at the same grid position are stacked
+    assert np.allclose(locations[:2], [[0, 0, 0], [0, 0, 1.0]])
+    # the grid is spaced by the largest footprint, then brought to the origin
+    assert locations[2, 2] == 0 and 1.08 <= locations[2, 0] <= 2
+    print("============ Test Passed: test_place_on_grid ============")
+
+
+def test_plan_layout():
+    record = {"valid": True, "width": 1.0, "depth": 1.0, "height": 1.0, "center_x": 0.0, "center_y": 0.0}
+    objects = [
+        {"uid": "a", "scale": {"factor": 2}, "transformed_position": (0, 0)},
+        {"uid": "b", "scale": {"factor": 0.5}, "transformed_position": (-1, 0)},
+    ]
+    locations = plan_layout(objects, {"a": record, "b": record})
+    assert len(locations) == 2 and locations[0] == [0, 0, 0]
+    # the large object sets the spacing of the grid and comes up to the small one
+    assert -1.83 < locations[1][0] <= -1.33 and locations[1][1] == 0
+    # objects missing from the index or failed can't be planned
+    assert plan_layout(objects, {"a": record}) is None
+    assert plan_layout(objects, {"a": record, "b": {**record, "valid": False}}) is None
+    print("============ Test Passed: test_plan_layout ============")
+
+
+if __name__ == "__main__":
+    test_get_contact_distance()
+    test_get_approach_distances()
+    test_bring_to_origin()
+    test_get_footprint()
+    test_place_on_grid()
+    test_plan_layout()
+    print("============ ALL TESTS PASSED ============")
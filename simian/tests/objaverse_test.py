@@ -0,0 +1,148 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from ..vendor import objaverse
+from .http_server import start_server
+
+
+def write_object_paths(directory, object_paths):
+    with gzip.open(os.path.join(directory, "object-paths.json.gz"), "wt") as f:
+        json.dump(object_paths, f)
+
+
+def test_lookup_object_paths():
+    """
+    Test that object paths are looked up in the index, which is rebuilt when the file changes.
+    """
+    object_paths = {f"uid{i}": f"glbs/000-{i // 10:03d}/uid{i}.glb" for i in range(25)}
+
+    with tempfile.TemporaryDirectory() as directory, patch.object(
+        objaverse, "_VERSIONED_PATH", directory
+    ):
+        write_object_paths(directory, object_paths)
+
+        found = objaverse._lookup_object_paths(["uid3", "missing", "uid24", "uid3"])
+        assert found == {"uid3": object_paths["uid3"], "uid24": object_paths["uid24"]}
+        assert os.path.exists(os.path.join(directory, "object-paths.sqlite"))
+        assert objaverse.load_uids() == list(object_paths.keys())
+
+        # the gzipped file isn't parsed again for lookups
+        with patch.object(objaverse, "_load_object_paths", side_effect=AssertionError):
+            assert objaverse._lookup_object_paths(["uid7"]) == {"uid7": object_paths["uid7"]}
+
+        write_object_paths(directory, {"uid3": "glbs/001-000/uid3.glb"})
+        modified = time.time() + 10
+        os.utime(os.path.join(directory, "object-paths.json.gz"), (modified, modified))
+        # the index is checked once per process, start over as a new process would
+        objaverse._index_connection = None
+        assert objaverse._lookup_object_paths(["uid3", "uid7"]) == {"uid3": "glbs/001-000/uid3.glb"}
+    print("============ Test Passed: test_lookup_object_paths ============")
+
+
+def test_load_objects():
+    """
+    Test that downloaded objects are found without downloading or parsing the paths file.
+    """
+    object_paths = {"abc": "glbs/000-000/abc.glb", "def": "glbs/000-000/def.glb"}
+
+    with tempfile.TemporaryDirectory() as directory, patch.object(
+        objaverse, "_VERSIONED_PATH", directory
+    ):
+        write_object_paths(directory, object_paths)
+        local_path = os.path.join(directory, object_paths["abc"])
+        os.makedirs(os.path.dirname(local_path))
+        open(local_path, "w").close()
+
+        assert objaverse.load_objects(["abc.glb"]) == {"abc": local_path}
+        with patch.object(objaverse, "_load_object_paths", side_effect=AssertionError):
+            assert objaverse.load_objects(["abc", "missing"]) == {"abc": local_path}
+    print("============ Test Passed: test_load_objects ============")
+
+
+def test_download_objects():
+    """
+    Test concurrent downloads with resumed partials, retries and size checks.
+    """
+    object_paths = {f"obj{i}": f"glbs/000-000/obj{i}.glb" for i in range(6)}
+    files = {f"/{path}": os.urandom(5000 + i) for i, path in enumerate(object_paths.values())}
+
+    server, url = start_server(files, delay=0.02)
+    try:
+        with tempfile.TemporaryDirectory() as directory, patch.object(
+            objaverse, "_VERSIONED_PATH", directory
+        ), patch.object(objaverse, "_BASE_URL", url), patch.object(
+            objaverse, "_DOWNLOAD_BACKOFF", 0.0
+        ):
+            write_object_paths(directory, object_paths)
+            objaverse._index_connection = None
+
+            # a partial left by an interrupted run is resumed, not downloaded again
+            partial_path = os.path.join(directory, object_paths["obj0"] + ".tmp")
+            os.makedirs(os.path.dirname(partial_path))
+            with open(partial_path, "wb") as f:
+                f.write(files[f"/{object_paths['obj0']}"][:1000])
+
+            server.faults = {
+                f"/{object_paths['obj1']}": ["cut"],
+                f"/{object_paths['obj2']}": ["error", "error"],
+                f"/{object_paths['obj3']}": ["cut", "ignore_range"],
+            }
+            out = objaverse.load_objects(list(object_paths), download_processes=3)
+
+            assert sorted(out) == sorted(object_paths)
+            for uid, local_path in out.items():
+                with open(local_path, "rb") as f:
+                    assert f.read() == files[f"/{object_paths[uid]}"], f"{uid} is corrupted"
+                assert not os.path.exists(local_path + ".tmp")
+            assert 1 < server.max_in_flight <= 3
+
+            range_headers = server.range_headers
+            assert range_headers[f"/{object_paths['obj0']}"] == ["bytes=1000-"]
+            assert range_headers[f"/{object_paths['obj1']}"] == [None, "bytes=2500-"]
+            assert len(range_headers[f"/{object_paths['obj2']}"]) == 3
+
+            # downloads of the same file wait for each other instead of sharing a partial
+            os.remove(out["obj4"])
+            server.requests = []
+            threads = [
+                threading.Thread(
+                    target=objaverse.download_file,
+                    args=(f"{url}/{object_paths['obj4']}", out["obj4"]),
+                )
+                for _ in range(4)
+            ]
+            for download_thread in threads:
+                download_thread.start()
+            for download_thread in threads:
+                download_thread.join()
+            with open(out["obj4"], "rb") as f:
+                assert f.read() == files[f"/{object_paths['obj4']}"]
+            assert len(server.requests) == 1
+
+            # missing files aren't retried
+            files.pop(f"/{object_paths['obj5']}")
+            os.remove(out["obj5"])
+            server.requests = []
+            try:
+                objaverse.load_objects(["obj5"])
+                assert False, "Expected an HTTPError"
+            except objaverse.urllib.error.HTTPError as e:
+                assert e.code == 404
+            assert len(server.requests) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        objaverse._index_connection = None
+    print("============ Test Passed: test_download_objects ============")
+
+
+if __name__ == "__main__":
+    test_lookup_object_paths()
+    test_load_objects()
+    test_download_objects()
+    print("============ ALL TESTS PASSED ============")
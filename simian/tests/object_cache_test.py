@@ -0,0 +1,95 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import bpy
+
+from ..asset_cache import AssetCache
+from ..object import preprocess_object
+from ..object_cache import get_preprocessed_key, load_preprocessed_object
+from ..scene import initialize_scene
+
+
+def export_model(path, location):
+    """
+    Exports a model of two cubes under an empty to a GLB file.
+    """
+    initialize_scene()
+    bpy.ops.object.empty_add(location=(0, 0, 0))
+    root = bpy.context.active_object
+    for x in (0, 3):
+        bpy.ops.mesh.primitive_cube_add(size=2, location=(x + location, 0, 1))
+        bpy.context.active_object.parent = root
+    bpy.ops.export_scene.gltf(filepath=path, export_format="GLB")
+
+
+def get_world_vertices(obj):
+    return sorted(tuple(round(c, 4) for c in obj.matrix_world @ v.co) for v in obj.data.vertices)
+
+
+def test_preprocessed_key():
+    """
+    Test that the key changes with the model contents and the pipeline version.
+    """
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+        paths = [os.path.join(directory, name) for name in ("a.glb", "b.glb", "c.glb")]
+        for path, data in zip(paths, (b"model", b"model", b"other")):
+            with open(path, "wb") as f:
+                f.write(data)
+
+        key = get_preprocessed_key(paths[0], cache)
+        assert key.endswith(".blend")
+        assert get_preprocessed_key(paths[1], cache) == key
+        assert get_preprocessed_key(paths[2], cache) != key
+        with patch("simian.object_cache.PIPELINE_VERSION", 2):
+            assert get_preprocessed_key(paths[0], cache) != key
+
+        # the hash is remembered, and the key follows the model when it changes
+        with patch("simian.asset_cache.get_file_hash") as mock_hash:
+            assert get_preprocessed_key(paths[0], cache) == key
+            assert mock_hash.call_count == 0
+        with open(paths[0], "wb") as f:
+            f.write(b"changed model")
+        assert get_preprocessed_key(paths[0], cache) not in (key, get_preprocessed_key(paths[2], cache))
+    print("============ Test Passed: test_preprocessed_key ============")
+
+
+def test_load_preprocessed_object():
+    """
+    Test that a model is preprocessed once and the saved mesh is appended after that.
+    """
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+        model_path = os.path.join(directory, "model.glb")
+        export_model(model_path, 0)
+
+        initialize_scene()
+        with patch("simian.object_cache.preprocess_object", wraps=preprocess_object) as mock_preprocess:
+            obj = load_preprocessed_object(model_path, cache)
+            expected = get_world_vertices(obj)
+            assert obj.type == "MESH" and len(obj.data.vertices) == 16
+            assert obj.parent is None
+            assert abs(min(v[2] for v in expected)) < 1e-4
+
+            initialize_scene()
+            obj = load_preprocessed_object(model_path, cache)
+            assert mock_preprocess.call_count == 1
+            assert get_world_vertices(obj) == expected
+            assert obj.name in bpy.context.scene.objects and obj.select_get()
+            assert bpy.context.view_layer.objects.active == obj
+
+            # a changed model is preprocessed again
+            export_model(model_path, 5)
+            initialize_scene()
+            obj = load_preprocessed_object(model_path, cache)
+            assert mock_preprocess.call_count == 2
+            assert get_world_vertices(obj) != expected
+
+        stats = cache.stats()
+        assert stats["misses"] == 2 and stats["hits"] == 1
+    print("============ Test Passed: test_load_preprocessed_object ============")
+
+
+if __name__ == "__main__":
+    test_preprocessed_key()
+    test_load_preprocessed_object()
+    print("============ ALL TESTS PASSED ============")
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from ..object_index import ObjectIndex
+
+
+def test_object_index():
+    """
+    Test that records are stored, replaced and looked up by uid.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index", "objects.sqlite")
+        with ObjectIndex(path) as index:
+            index.add(
+                {
+                    "uid": "a",
+                    "valid": True,
+                    "width": 1.0,
+                    "depth": 2.0,
+                    "height": 0.5,
+                    "faces": 12,
+                    "vertices": 8,
+                    "materials": 1,
+                    "import_time": 0.25,
+                    "pipeline_version": 1,
+                }
+            )
+            index.add({"uid": "b", "valid": False, "error": "crashed", "pipeline_version": 1})
+            assert len(index) == 2
+
+            record = index.get("a")
+            assert record["valid"] is True and record["error"] is None
+            assert (record["width"], record["depth"], record["height"]) == (1.0, 2.0, 0.5)
+            assert record["faces"] == 12 and record["updated"] > 0
+            assert index.get("missing") is None
+            assert index.get_failed() == {"b": "crashed"}
+
+            index.add({"uid": "b", "valid": True, "pipeline_version": 1})
+            assert index.get_failed() == {}
+
+        # records are kept on disk, and large lookups are split into chunks
+        with ObjectIndex(path) as index:
+            records = index.get_many(["a", "b"] + [str(i) for i in range(2000)])
+            assert sorted(records) == ["a", "b"]
+    print("============ Test Passed: test_object_index ============")
+
+
+if __name__ == "__main__":
+    test_object_index()
+    print("============ ALL TESTS PASSED ============")
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from ..asset_cache import AssetCache
+from ..prefetch import BandwidthLimiter, Prefetcher, get_combination_assets
+from .http_server import start_server
+
+
+def make_combination(url, i):
+    return {
+        "objects": [{"uid": f"uid{i}"}],
+        "background": {"id": f"bg{i}", "from": "poly_haven", "url": f"{url}/bg{i}.hdr"},
+        "stage": {
+            "material": {
+                "name": "Tiles",
+                "maps": {"Diffuse": f"{url}/diff{i}.jpg", "nor_gl": f"{url}/nor{i}.jpg"},
+            }
+        },
+    }
+
+
+def test_get_combination_assets():
+    """
+    Test that the assets of a combination are listed, except locally saved backgrounds.
+    """
+    combination = make_combination("http://host", 3)
+    combination["stage"]["material"]["maps"]["unknown"] = "http://host/x.jpg"
+
+    with tempfile.TemporaryDirectory() as hdri_path:
+        assert get_combination_assets(combination, hdri_path) == [
+            ("objects", "uid3"),
+            ("backgrounds", "http://host/bg3.hdr"),
+            ("textures", "http://host/diff3.jpg"),
+            ("textures", "http://host/nor3.jpg"),
+        ]
+
+        os.makedirs(os.path.join(hdri_path, "poly_haven"))
+        open(os.path.join(hdri_path, "poly_haven", "bg3.hdr"), "w").close()
+        kinds = [asset.kind for asset in get_combination_assets(combination, hdri_path)]
+        assert kinds == ["objects", "textures", "textures"]
+    assert get_combination_assets({"objects": []}) == []
+    print("============ Test Passed: test_get_combination_assets ============")
+
+
+def test_bandwidth_limiter():
+    """
+    Test that the limiter allows a one second burst and then paces to the cap.
+    """
+    limiter = BandwidthLimiter(100000)
+    start = time.monotonic()
+    limiter.consume(100000)
+    assert time.monotonic() - start < 0.1
+
+    for _ in range(4):
+        limiter.consume(10000)
+    elapsed = time.monotonic() - start
+    assert 0.35 < elapsed < 0.7
+    print("============ Test Passed: test_bandwidth_limiter ============")
+
+
+def test_prefetcher():
+    """
+    Test that the prefetcher stays within its window and fetches every asset.
+    """
+    files = {}
+    for i in range(6):
+        for name in [f"bg{i}.hdr", f"diff{i}.jpg", f"nor{i}.jpg"]:
+            files[f"/{name}"] = name.encode()
+    del files["/nor5.jpg"]
+    server, url = start_server(files)
+
+    loaded = []
+    try:
+        with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache, patch.object(
+            cache, "fetch_object", side_effect=lambda uid, throttle=None: loaded.append(uid)
+        ):
+            combinations = [make_combination(url, i) for i in range(6)]
+            indices = [5, 0, 1, 2, 3, 4]
+
+            with Prefetcher(
+                combinations, indices, window=2, hdri_path=directory, cache=cache
+            ) as prefetcher:
+                assert prefetcher.wait(2, timeout=10)
+                time.sleep(0.2)
+                assert prefetcher.prefetched == 2
+                assert loaded == ["uid5", "uid0"]
+
+                prefetcher.mark_started(4)
+                assert prefetcher.wait(6, timeout=10)
+
+            assert loaded == [f"uid{i}" for i in indices]
+            for i in range(6):
+                assert cache.lookup(f"{url}/bg{i}.hdr", "backgrounds") is not None
+                with open(cache.get_path(f"{url}/diff{i}.jpg", "textures"), "rb") as f:
+                    assert f.read() == f"diff{i}.jpg".encode()
+            # the missing normal map of the first combination is left to the renderer
+            assert prefetcher.failures == 1
+            assert cache.stats()["misses"] == 17
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("============ Test Passed: test_prefetcher ============")
+
+
+def test_prefetcher_close():
+    """
+    Test that closing the prefetcher stops it before the end of its window.
+    """
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+        prefetcher = Prefetcher([{"objects": []}] * 10, range(10), window=3, cache=cache)
+        assert prefetcher.wait(3, timeout=10)
+        prefetcher.close()
+        assert prefetcher.prefetched == 3
+    print("============ Test Passed: test_prefetcher_close ============")
+
+
+if __name__ == "__main__":
+    test_get_combination_assets()
+    test_bandwidth_limiter()
+    test_prefetcher()
+    test_prefetcher_close()
+    print("============ ALL TESTS PASSED ============")
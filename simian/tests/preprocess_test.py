@@ -0,0 +1,135 @@
+import os
+import subprocess
+import tempfile
+import threading
+from unittest.mock import patch
+
+import bpy
+
+from ..asset_cache import AssetCache
+from ..object_cache import get_preprocessed_key
+from ..object_index import ObjectIndex
+from ..preprocess import preprocess_objects, preprocess_uid
+from ..scene import initialize_scene
+
+
+def export_model(path):
+    """
+    Exports a model of two 2x2x2 cubes 3 meters apart to a GLB file.
+    """
+    initialize_scene()
+    bpy.ops.object.empty_add(location=(0, 0, 0))
+    root = bpy.context.active_object
+    for x in (0, 3):
+        bpy.ops.mesh.primitive_cube_add(size=2, location=(x, 0, 1))
+        bpy.context.active_object.parent = root
+    bpy.ops.export_scene.gltf(filepath=path, export_format="GLB")
+
+
+def test_preprocess_uid():
+    """
+    Test that an object is measured and its preprocessed mesh saved to the cache.
+    """
+    with tempfile.TemporaryDirectory() as directory, AssetCache(directory) as cache:
+        model_path = os.path.join(directory, "model.glb")
+        export_model(model_path)
+        initialize_scene()
+
+        with patch.object(cache, "fetch_object", return_value=model_path):
+            record = preprocess_uid("abc", cache)
+
+        assert record["uid"] == "abc" and record["valid"]
+        assert abs(record["width"] - 5) < 1e-4
+        assert abs(record["depth"] - 2) < 1e-4 and abs(record["height"] - 2) < 1e-4
+        assert record["vertices"] == 16 and record["faces"] == 24
+        assert record["import_time"] > 0
+        assert cache.lookup(get_preprocessed_key(model_path, cache), "preprocessed") is not None
+
+        # a model without meshes is recorded as invalid
+        broken_path = os.path.join(directory, "broken.glb")
+        initialize_scene()
+        bpy.ops.object.empty_add(location=(0, 0, 0))
+        bpy.ops.export_scene.gltf(filepath=broken_path, export_format="GLB")
+        initialize_scene()
+        with patch.object(cache, "fetch_object", return_value=broken_path):
+            record = preprocess_uid("broken", cache)
+        assert not record["valid"] and record["error"]
+        assert "width" not in record
+    print("============ Test Passed: test_preprocess_uid ============")
+
+
+def test_preprocess_objects():
+    """
+    Test that objects are recorded, a crashing object is marked invalid without losing
+    the rest of its chunk, and recorded objects are skipped by the next run.
+    """
+    commands = []
+
+    class Worker:
+        # stands in for a Blender worker process that crashes on the "crash" object, hangs
+        # on the "hang" object and takes a while on the others
+        def __init__(self, command, env):
+            commands.append(command)
+            self.returncode = None
+            self.killed = threading.Event()
+            self.thread = threading.Thread(target=self.run, args=(command,))
+            self.thread.start()
+
+        def run(self, command):
+            index_path = command[command.index("--index_path") + 1]
+            uids = command[command.index("--uids") + 1 :]
+            with ObjectIndex(index_path) as index:
+                for uid in uids:
+                    if uid == "crash":
+                        self.returncode = -11
+                        return
+                    if self.killed.wait(None if uid == "hang" else 0.1):
+                        self.returncode = -9
+                        return
+                    index.add({"uid": uid, "valid": True, "faces": 1, "pipeline_version": 1})
+            self.returncode = 0
+
+        def wait(self, timeout=None):
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                raise subprocess.TimeoutExpired("worker", timeout)
+            return self.returncode
+
+        def kill(self):
+            self.killed.set()
+
+    uids = ["a", "b", "crash", "c", "d"]
+    with tempfile.TemporaryDirectory() as directory, patch(
+        "simian.preprocess.subprocess.Popen", Worker
+    ), patch("simian.preprocess.WORKER_POLL_INTERVAL", 0.02):
+        records = preprocess_objects(uids, processes=2, chunk_size=4, cache_dir=directory)
+        assert sorted(records) == sorted(uids)
+        assert not records["crash"]["valid"]
+        assert records["crash"]["error"] == "Blender exited with code -11"
+        assert all(records[uid]["valid"] for uid in "abcd")
+        # one worker per chunk, and one more to finish the chunk of the crash
+        assert len(commands) == 3
+        assert os.path.exists(os.path.join(directory, "object-index.sqlite"))
+
+        preprocess_objects(uids, processes=2, chunk_size=4, cache_dir=directory)
+        assert len(commands) == 3
+
+        preprocess_objects(uids, processes=2, chunk_size=4, cache_dir=directory, retry_failed=True)
+        assert commands[-1][-1:] == ["crash"]
+
+        # the timeout applies to each object, not to the whole chunk
+        start = len(commands)
+        records = preprocess_objects(
+            ["e", "f", "g", "hang", "h"], processes=1, chunk_size=8, timeout=0.25, cache_dir=directory
+        )
+        assert all(records[uid]["valid"] for uid in "efgh")
+        assert not records["hang"]["valid"]
+        assert records["hang"]["error"].startswith("Timed out after")
+        assert len(commands) == start + 2
+    print("============ Test Passed: test_preprocess_objects ============")
+
+
+if __name__ == "__main__":
+    test_preprocess_uid()
+    test_preprocess_objects()
+    print("============ ALL TESTS PASSED ============")
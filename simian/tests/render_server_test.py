@@ -0,0 +1,76 @@
+import io
+import json
+from unittest.mock import patch
+
+from ..render import serve
+
+
+defaults = {
+    "combination_file": "combinations.json",
+    "combination": None,
+    "output_dir": "renders",
+    "hdri_path": "backgrounds",
+    "start_frame": 1,
+    "end_frame": 65,
+    "animation_length": 120,
+    "images": False,
+    "blend": None,
+    "threads": 0,
+}
+
+
+def test_serve_renders_each_job():
+    """
+    Test that serve renders one result line per job and only clears the scene between jobs.
+    """
+    jobs = [
+        {"id": "a", "combination_index": 0, "combination": {"objects": []}},
+        {"id": "b", "combination_index": 1, "combination": {"objects": []}, "images": True},
+        {"command": "shutdown"},
+        {"id": "never", "combination_index": 2},
+    ]
+    input_stream = io.StringIO("".join(json.dumps(job) + "\n" for job in jobs))
+    output_stream = io.StringIO()
+
+    with patch("simian.render.render_scene", return_value=["renders/0.mp4"]) as mock_render:
+        serve(input_stream, output_stream, defaults)
+
+    results = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+    assert [result["id"] for result in results] == ["a", "b"]
+    assert all(result["status"] == "done" for result in results)
+    assert results[0]["outputs"] == ["renders/0.mp4"]
+
+    assert mock_render.call_count == 2
+    for call in mock_render.call_args_list:
+        assert call.kwargs["factory_reset"] is False
+    assert mock_render.call_args_list[1].kwargs["render_images"] is True
+    print("============ Test Passed: test_serve_renders_each_job ============")
+
+
+def test_serve_reports_failures():
+    """
+    Test that a failing job is reported and the server keeps serving.
+    """
+    jobs = [
+        {"combination_index": 0, "combination": {"objects": []}},
+        {"combination_index": 1, "combination": {"objects": []}},
+    ]
+    input_stream = io.StringIO("".join(json.dumps(job) + "\n" for job in jobs))
+    output_stream = io.StringIO()
+
+    with patch(
+        "simian.render.render_scene", side_effect=[RuntimeError("boom"), ["renders/1.mp4"]]
+    ), patch("simian.render.traceback.print_exc"), patch("simian.render.logger"):
+        serve(input_stream, output_stream, defaults)
+
+    results = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+    assert results[0]["status"] == "failed"
+    assert results[0]["error"] == "boom"
+    assert results[1]["status"] == "done"
+    print("============ Test Passed: test_serve_reports_failures ============")
+
+
+if __name__ == "__main__":
+    test_serve_renders_each_job()
+    test_serve_reports_failures()
+    print("============ ALL TESTS PASSED ============")
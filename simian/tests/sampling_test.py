@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+
+from ..sampling import ScalarParameters, classify, counter_uniforms
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "../../"))
+
+
+def test_counter_uniforms():
+    """
+    Test that draws only depend on the seed, index and column.
+    """
+    batch = counter_uniforms(42, np.arange(100, 200), 4)
+    single = counter_uniforms(42, np.array([150]), 4)
+    assert batch.shape == (100, 4)
+    assert np.array_equal(batch[50], single[0])
+    assert np.all((batch >= 0) & (batch < 1))
+    assert not np.array_equal(batch, counter_uniforms(43, np.arange(100, 200), 4))
+    print("============ Test Passed: test_counter_uniforms ============")
+
+
+def test_classify():
+    """
+    Test that vectorized classification picks the first matching type, like the combiner loops.
+    """
+    types = {
+        "none": {"min": 0.0, "max": 0.02},
+        "low": {"min": 0.02, "max": 0.2},
+        "high": {"min": 0.2, "max": 1.0},
+    }
+    values = np.array([0.0, 0.01, 0.02, 0.1, 0.2, 0.9, 1.0, 1.5])
+    expected = ["none", "none", "none", "low", "low", "high", "high", "none"]
+    assert list(classify(values, types, "min", "max")) == expected
+
+    # ranges out of order are checked one by one
+    unsorted_types = {"b": {"min": 0.5, "max": 1.0}, "a": {"min": 0.0, "max": 0.6}}
+    assert list(classify(np.array([0.55, 0.3, 2.0]), unsorted_types, "min", "max")) == [
+        "b",
+        "a",
+        "none",
+    ]
+    print("============ Test Passed: test_classify ============")
+
+
+def test_scalar_parameters():
+    """
+    Test that scalar parameters are drawn in range and are the same alone or in a batch.
+    """
+    with open(os.path.join(project_root, "data/camera_data.json"), "r") as file:
+        camera_data = json.load(file)
+
+    batch = ScalarParameters(camera_data, 7, 0, 1000)
+    single = ScalarParameters(camera_data, 7, 500, 501)
+    assert batch.postprocessing(500) == single.postprocessing(500)
+    assert batch.framing(500) == single.framing(500)
+    assert batch.stage_uv(500) == single.stage_uv(500)
+
+    for index in range(1000):
+        framing = batch.framing(index)
+        matching = [f for f in camera_data["framings"] if f["name"] == framing["name"]][0]
+        assert matching["fov_min"] <= framing["fov"] <= matching["fov_max"]
+        assert (
+            matching["coverage_factor_min"]
+            <= framing["coverage_factor"]
+            <= matching["coverage_factor_max"]
+        )
+        assert 0.5 <= batch.animation_speed(index) <= 2.0
+
+    bloom_types = camera_data["postprocessing"]["bloom"]["types"]
+    bloom = batch.postprocessing(3)["bloom"]
+    assert bloom_types[bloom["type"]]["intensity_min"] <= bloom["intensity"]
+    print("============ Test Passed: test_scalar_parameters ============")
+
+
+if __name__ == "__main__":
+    test_counter_uniforms()
+    test_classify()
+    test_scalar_parameters()
+    print("============ ALL TESTS PASSED ============")
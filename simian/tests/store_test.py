@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+
+from ..store import (
+    CombinationShards,
+    CombinationStore,
+    CombinationWriter,
+    build_index,
+    open_combinations,
+    write_shards,
+)
+
+
+def test_combination_store():
+    """
+    Test that combinations written to a store are read back by index and by range.
+    """
+    combinations = [{"index": i, "caption": f"combination {i} ✓"} for i in range(10)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "combinations.jsonl")
+        with CombinationWriter(path) as writer:
+            for combination in combinations:
+                writer.write(combination)
+
+        with CombinationStore(path) as store:
+            assert len(store) == 10
+            assert store.get(3) == combinations[3]
+            assert store[-1] == combinations[-1]
+            assert store[2:5] == combinations[2:5]
+            assert list(store.iter(8)) == combinations[8:]
+            assert list(store) == combinations
+            try:
+                store.get(10)
+                assert False, "Expected an IndexError"
+            except IndexError:
+                pass
+
+        # a missing index is rebuilt from the body
+        os.remove(path + ".idx")
+        with CombinationStore(path) as store:
+            assert store.get(7) == combinations[7]
+    print("============ Test Passed: test_combination_store ============")
+
+
+def test_open_combinations_converts_json():
+    """
+    Test that a combinations JSON file is converted to a store next to it.
+    """
+    combinations = [{"index": i} for i in range(5)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "combinations.json")
+        with open(json_path, "w") as file:
+            json.dump({"seed": 1, "count": 5, "combinations": combinations}, file)
+
+        with open_combinations(json_path) as store:
+            assert store.path == os.path.join(directory, "combinations.jsonl")
+            assert len(store) == 5
+            assert store.get(4) == combinations[4]
+
+        empty_path = os.path.join(directory, "empty.jsonl")
+        open(empty_path, "w").close()
+        build_index(empty_path)
+        with CombinationStore(empty_path) as store:
+            assert len(store) == 0
+    print("============ Test Passed: test_open_combinations_converts_json ============")
+
+
+def test_write_shards():
+    """
+    Test that streamed combinations are split into shards that read back as one set.
+    """
+    combinations = [{"index": i} for i in range(10)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        manifest_path = write_shards(iter(combinations), directory, 4, seed=42, count=10)
+
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        assert manifest["seed"] == 42 and manifest["complete"]
+        assert [(shard["start"], shard["end"]) for shard in manifest["shards"]] == [
+            (0, 4),
+            (4, 8),
+            (8, 10),
+        ]
+
+        with open_combinations(directory) as shards:
+            assert isinstance(shards, CombinationShards)
+            assert len(shards) == 10
+            assert shards.get(5) == combinations[5]
+            assert shards[3:9] == combinations[3:9]
+            assert list(shards) == combinations
+    print("============ Test Passed: test_write_shards ============")
+
+
+if __name__ == "__main__":
+    test_combination_store()
+    test_open_combinations_converts_json()
+    test_write_shards()
+    print("============ ALL TESTS PASSED ============")
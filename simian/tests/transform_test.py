@@ -1,11 +1,20 @@
 import math
 
+import bpy
+
+from ..scene import initialize_scene
 from ..transform import (
     degrees_to_radians,
     compute_rotation_matrix,
     apply_rotation,
     adjust_positions,
+    bring_objects_to_origin,
     determine_relationships,
+    get_relationship_pairs,
+    intersect_frustums_with_plane,
+    rotate_positions,
+    get_world_bounding_box_xy,
+    check_overlap_xy,
 )
 
 
@@ -90,10 +99,75 @@ def test_determine_relationships():
         ), f"Expected relationship '{relationship}' not found in results."
 
 
+def test_rotate_positions():
+    rotation_matrix = compute_rotation_matrix(math.radians(30))
+    points = [[1, 0], [0.5, -2], [-1, 1]]
+    rotated = rotate_positions(points, math.radians(30))
+    for point, expected in zip(rotated.tolist(), points):
+        assert point == apply_rotation(expected, rotation_matrix)
+    # coordinates close to integers are rounded
+    assert rotate_positions([[1, 0]], math.pi / 2).tolist() == [[0, 1]]
+    print("============ Test Passed: test_rotate_positions ============")
+
+
+def test_get_relationship_pairs():
+    positions = [[0, 0], [1, 1], [0, 0]]
+    pairs = get_relationship_pairs(positions, 0)
+    # objects at the same position aren't related
+    assert [(i, j) for i, j, _ in pairs] == [(0, 1), (1, 0), (1, 2), (2, 1)]
+    assert pairs[0][2] == "to the left of and behind"
+    assert pairs[1][2] == "to the right of and in front of"
+    print("============ Test Passed: test_get_relationship_pairs ============")
+
+
+def test_intersect_frustums_with_plane():
+    # a camera 10 above the plane looking straight down, and one looking at the horizon
+    down = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 10], [0, 0, 0, 1]]
+    level = [[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 2], [0, 0, 0, 1]]
+    view_frame = [[0.5, 0.5, -1], [0.5, -0.5, -1], [-0.5, -0.5, -1], [-0.5, 0.5, -1]]
+    points = intersect_frustums_with_plane(
+        [down, level], [view_frame, view_frame], [0, 0, 1], max_distance=50
+    )
+    assert points.shape == (2, 4, 3)
+    assert all(abs(a - b) < 1e-9 for a, b in zip(points[0, 0], (4.5, -4.5, 1)))
+    assert all(abs(a - b) < 1e-9 for a, b in zip(points[0, 1], (4.5, 4.5, 1)))
+    # the lower rays of the level camera meet the plane, the upper ones are cut short
+    assert abs(points[1, 0, 1] - 2) < 1e-9 and abs(points[1, 1, 1] - 25 / 1.5 ** 0.5) < 1e-9
+    assert all(point[2] == 1 for point in points[1])
+    print("============ Test Passed: test_intersect_frustums_with_plane ============")
+
+
+def test_bring_objects_to_origin():
+    initialize_scene()
+    objects = []
+    for location in [(0, 0, 0), (4, 0, 0), (0, -4, 0), (4, 4, 0)]:
+        bpy.ops.mesh.primitive_cube_add(size=1, location=location)
+        objects.append({bpy.context.active_object: {}})
+    bpy.context.view_layer.update()
+
+    bring_objects_to_origin(objects)
+
+    objs = [list(obj_dict.keys())[0] for obj_dict in objects]
+    assert tuple(objs[0].location) == (0, 0, 0)
+    # the others come up against the cube at the origin, keeping the padding
+    assert 1.08 <= objs[1].location.x < 1.08 + 0.5 and objs[1].location.y == 0
+    assert -1.08 - 0.5 < objs[2].location.y <= -1.08
+    assert objs[3].location.x < 4 and objs[3].location.x == objs[3].location.y
+    bboxes = [get_world_bounding_box_xy(obj) for obj in objs]
+    for i in range(len(objs)):
+        for j in range(i + 1, len(objs)):
+            assert not check_overlap_xy(bboxes[i], bboxes[j], padding=0.079)
+    print("============ Test Passed: test_bring_objects_to_origin ============")
+
+
 if __name__ == "__main__":
     test_degrees_to_radians()
     test_compute_rotation_matrix()
     test_apply_rotation()
     test_adjust_positions()
     test_determine_relationships()
+    test_rotate_positions()
+    test_get_relationship_pairs()
+    test_intersect_frustums_with_plane()
+    test_bring_objects_to_origin()
     print("============ ALL TESTS PASSED ============")
@@ -1,14 +1,14 @@
-import json
-import sys
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from ..worker import run_job
 
 
-@patch("..worker.subprocess.run")
-def test_run_job(mock_subprocess_run):
-    combination_index = 0
-    combination = {"objects": []}
+@patch("simian.worker.distributaur", create=True)
+@patch("simian.worker.Prefetcher")
+@patch("simian.worker.RenderServer")
+def test_run_job(mock_render_server, mock_prefetcher, mock_distributaur):
+    combination_indeces = [0, 1]
+    combinations = [{"objects": []}, {"objects": [{"uid": "abc"}]}]
     width = 1920
     height = 1080
     output_dir = "test_output"
@@ -16,29 +16,41 @@ def test_run_job(mock_subprocess_run):
     start_frame = 0
     end_frame = 10
 
-    run_job(
-        combination_index,
-        combination,
-        width,
-        height,
-        output_dir,
-        hdri_path,
-        start_frame,
-        end_frame,
+    server = MagicMock()
+    server.render.return_value = {"status": "done", "outputs": [], "error": None}
+    mock_render_server.return_value.__enter__.return_value = server
+
+    with patch("os.makedirs"):
+        run_job(
+            combination_indeces,
+            combinations,
+            width,
+            height,
+            output_dir,
+            hdri_path,
+            start_frame,
+            end_frame,
+        )
+
+    server_args = mock_render_server.call_args[0][0]
+    assert server_args[server_args.index("--hdri_path") + 1] == hdri_path
+    assert server_args[server_args.index("--end_frame") + 1] == str(end_frame)
+
+    # one server handles every combination in the batch
+    assert mock_render_server.call_count == 1
+    assert server.render.call_count == len(combination_indeces)
+    server.render.assert_any_call(
+        {"combination_index": 1, "combination": {"objects": [{"uid": "abc"}]}}
     )
+    mock_distributaur.upload_directory.assert_called_once()
 
-    combination_str = json.dumps(combination)
-    combination_str = '"' + combination_str.replace('"', '\\"') + '"'
-
-    command = f"{sys.executable} -m simian.render -- --width {width} --height {height} --combination_index {combination_index}"
-    command += f" --output_dir {output_dir}"
-    command += f" --hdri_path {hdri_path}"
-    command += f" --start_frame {start_frame} --end_frame {end_frame}"
-    command += f" --combination {combination_str}"
-
-    mock_subprocess_run.assert_called_once_with(["bash", "-c", command], check=False)
+    # the assets of the batch are prefetched while it renders
+    assert mock_prefetcher.call_args[0][0] == combinations
+    assert mock_prefetcher.return_value.mark_started.call_count == len(combination_indeces)
+    mock_prefetcher.return_value.close.assert_called_once()
+    print("============ Test Passed: test_run_job ============")
 
 
 if __name__ == "__main__":
-    # test_run_job()
-    pass
+    test_run_job()
+    print("============ ALL TESTS PASSED ============")
@@ -1,12 +1,16 @@
 import logging
 from math import radians, cos, sin
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 import numpy as np
 
 import bpy
 import mathutils
 from mathutils import Vector
 
+from .animation import set_keyframes
+from .geometry import get_local_bbox_corners, get_world_bbox_corners
+from .layout import bring_to_origin
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -53,6 +57,52 @@ def apply_rotation(
     ]
 
 
+def rotate_positions(positions: np.ndarray, theta: float) -> np.ndarray:
+    """Rotate 2D points by an angle and round coordinates to integers if close.
+
+    Matches `apply_rotation` on each point, with all points in one matrix multiply.
+
+    Args:
+        positions (np.ndarray): 2D points of shape (n, 2).
+        theta (float): Angle in radians.
+
+    Returns:
+        np.ndarray: Rotated points with rounded coordinates, of shape (n, 2).
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    rotated = positions @ np.array(compute_rotation_matrix(theta)).T
+    rounded = np.round(rotated)
+    return np.where(np.abs(rotated - rounded) < 1e-9, rounded, rotated)
+
+
+# grid position of each object placement, from the back left to the front right
+PLACEMENT_GRID = {
+    0: (-1, 1),
+    1: (0, 1),
+    2: (1, 1),
+    3: (-1, 0),
+    4: (0, 0),
+    5: (1, 0),
+    6: (-1, -1),
+    7: (0, -1),
+    8: (1, -1),
+}
+
+
+def get_placement_positions(objects: List[Dict], camera_yaw: float) -> np.ndarray:
+    """Get the grid positions of objects rotated by the camera yaw.
+
+    Args:
+        objects (List[Dict]): List of object dictionaries with a placement.
+        camera_yaw (float): Camera yaw angle in degrees.
+
+    Returns:
+        np.ndarray: Rotated positions of shape (n, 2).
+    """
+    grid = [PLACEMENT_GRID[obj["placement"]] for obj in objects]
+    return rotate_positions(grid, radians(camera_yaw))
+
+
 def adjust_positions(objects: List[Dict], camera_yaw: float) -> List[Dict]:
     """Adjust the positions of objects based on the camera yaw.
 
@@ -63,71 +113,81 @@ def adjust_positions(objects: List[Dict], camera_yaw: float) -> List[Dict]:
     Returns:
         List[Dict]: List of object dictionaries with adjusted positions.
     """
-    rotation_matrix = compute_rotation_matrix(radians(camera_yaw))
-    lookup_table = {
-        0: (-1, 1),
-        1: (0, 1),
-        2: (1, 1),
-        3: (-1, 0),
-        4: (0, 0),
-        5: (1, 0),
-        6: (-1, -1),
-        7: (0, -1),
-        8: (1, -1),
-    }
+    positions = get_placement_positions(objects, camera_yaw)
 
     empty_objs = []
-    for obj in objects:
-        grid_x, grid_y = lookup_table[obj["placement"]]
+    for obj, position in zip(objects, positions.tolist()):
         empty_obj = obj.copy()
-        empty_obj["transformed_position"] = apply_rotation(
-            [grid_x, grid_y], rotation_matrix
-        )
+        # coordinates rounded to the grid are kept as integers
+        empty_obj["transformed_position"] = [
+            int(val) if val.is_integer() else val for val in position
+        ]
         empty_objs.append(empty_obj)
     return empty_objs
 
 
-def determine_relationships(objects: List[Dict], camera_yaw: float) -> List[str]:
-    """Determine the spatial relationships between objects based on camera yaw.
+# phrases of the sign of the position of a second object relative to a first one
+LATERAL_RELATIONSHIPS = {1: "to the left of", -1: "to the right of", 0: ""}
+DEPTH_RELATIONSHIPS = {1: " and behind", -1: " and in front of", 0: ""}
+
+
+def get_relationship_pairs(
+    positions: np.ndarray, camera_yaw: float
+) -> List[Tuple[int, int, str]]:
+    """Find the spatial relationships between objects based on camera yaw.
+
+    The positions are rotated to the camera at once, and every ordered pair of objects
+    is compared in pairwise sign matrices, so no relationship string is built.
 
     Args:
-        objects (List[Dict]): List of object dictionaries.
+        positions (np.ndarray): Transformed positions of the objects, of shape (n, 2).
         camera_yaw (float): Camera yaw angle in degrees.
 
     Returns:
-        List[str]: List of relationship strings.
+        List[Tuple[int, int, str]]: Index of the first object, index of the second object
+        and the relationship phrase of each related pair, in the order of
+        `determine_relationships`.
     """
-    inverse_rotation_matrix = compute_rotation_matrix(radians(-camera_yaw))
+    positions = rotate_positions(positions, radians(-camera_yaw))
+    # [i, j] is how the second object j lies relative to the first object i
+    lateral = np.sign(positions[None, :, 1] - positions[:, None, 1]).astype(int)
+    depth = np.sign(positions[None, :, 0] - positions[:, None, 0]).astype(int)
+    first, second = np.nonzero((lateral != 0) | (depth != 0))
+    return [
+        (i, j, LATERAL_RELATIONSHIPS[lateral[i, j]] + DEPTH_RELATIONSHIPS[depth[i, j]])
+        for i, j in zip(first.tolist(), second.tolist())
+    ]
 
-    relationships = []
-    for i, obj1 in enumerate(objects):
-        for j, obj2 in enumerate(objects):
-            if i != j:
-                pos1 = apply_rotation(
-                    obj1["transformed_position"], inverse_rotation_matrix
-                )
-                pos2 = apply_rotation(
-                    obj2["transformed_position"], inverse_rotation_matrix
-                )
 
-                relationship = ""
+def format_relationship(objects: List[Dict], pair: Tuple[int, int, str]) -> str:
+    """Build the relationship string of a pair from `get_relationship_pairs`.
+
+    Args:
+        objects (List[Dict]): List of object dictionaries.
+        pair (Tuple[int, int, str]): Indices of the objects and the relationship phrase.
+
+    Returns:
+        str: Relationship string.
+    """
+    first, second, relationship = pair
+    return f"{objects[first]['name']} is {relationship} {objects[second]['name']}."
 
-                if pos2[1] > pos1[1]:
-                    relationship = "to the left of"
-                elif pos2[1] < pos1[1]:
-                    relationship = "to the right of"
 
-                if pos2[0] > pos1[0]:
-                    relationship += " and behind"
-                elif pos2[0] < pos1[0]:
-                    relationship += " and in front of"
+def determine_relationships(objects: List[Dict], camera_yaw: float) -> List[str]:
+    """Determine the spatial relationships between objects based on camera yaw.
 
-                if relationship:
-                    relationships.append(
-                        f"{obj1['name']} is {relationship} {obj2['name']}."
-                    )
+    Args:
+        objects (List[Dict]): List of object dictionaries.
+        camera_yaw (float): Camera yaw angle in degrees.
 
-    return relationships
+    Returns:
+        List[str]: List of relationship strings.
+    """
+    positions = [obj["transformed_position"][:2] for obj in objects]
+    return [
+        format_relationship(objects, pair)
+        for pair in get_relationship_pairs(positions, camera_yaw)
+    ]
 
 
 def find_largest_length(objects: List[Dict[bpy.types.Object, Dict]]) -> float:
@@ -139,21 +199,15 @@ def find_largest_length(objects: List[Dict[bpy.types.Object, Dict]]) -> float:
     Returns:
         float: Largest dimension.
     """
-    largest_dimension = 0
-    for obj_dict in objects:
-        obj = list(obj_dict.keys())[0]
-        bpy.context.view_layer.update()
-        bbox_corners = obj.bound_box
-        width = (
-            max(bbox_corners, key=lambda v: v[0])[0]
-            - min(bbox_corners, key=lambda v: v[0])[0]
-        )
-        height = (
-            max(bbox_corners, key=lambda v: v[1])[1]
-            - min(bbox_corners, key=lambda v: v[1])[1]
-        )
-        current_max = max(width, height)
-        largest_dimension = max(largest_dimension, current_max)
+    if not objects:
+        return 0
+
+    bpy.context.view_layer.update()
+    # largest width or depth of the local bounding boxes, all objects at once
+    corners = np.stack(
+        [get_local_bbox_corners(list(obj_dict.keys())[0]) for obj_dict in objects]
+    )
+    largest_dimension = float(np.ptp(corners[:, :, :2], axis=1).max())
 
     return largest_dimension
 
@@ -167,11 +221,9 @@ def get_world_bounding_box_xy(obj: bpy.types.Object) -> List[Vector]:
     Returns:
         List[Vector]: List of 2D bounding box corners in world space.
     """
-    world_bbox = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
-    min_x = min(corner.x for corner in world_bbox)
-    max_x = max(corner.x for corner in world_bbox)
-    min_y = min(corner.y for corner in world_bbox)
-    max_y = max(corner.y for corner in world_bbox)
+    world_bbox = get_world_bbox_corners(obj)
+    min_x, min_y = world_bbox[:, :2].min(axis=0)
+    max_x, max_y = world_bbox[:, :2].max(axis=0)
     corners_xy = [
         Vector((min_x, min_y, 0)),
         Vector((max_x, min_y, 0)),
@@ -222,55 +274,41 @@ def check_overlap_xy(
 def bring_objects_to_origin(objects: List[Dict[bpy.types.Object, Dict]]) -> None:
     """Bring objects to the origin while avoiding collisions.
 
+    Objects are moved in order, each straight toward the origin in shrinking steps until
+    the next step would bring its XY bounding box within padding of another object's.
+    The contacts are computed from the bounding boxes by `layout.bring_to_origin`, the
+    same as the combiner plans layouts with, and the locations are written once at the end.
+
     Args:
         objects (List[Dict[bpy.types.Object, Dict]]): List of object dictionaries.
     """
-    object_bboxes = []
-    for obj_dict in objects:
-        obj = list(obj_dict.keys())[0]
-        xy_corners = get_world_bounding_box_xy(obj)
-        object_bboxes.append({obj: xy_corners})
-
-    for obj_dict in objects:
-        obj = list(obj_dict.keys())[0]
-        if obj.location.x == 0 and obj.location.y == 0:
-            continue
-
-        direction = Vector((-obj.location.x, -obj.location.y, 0)).normalized()
-        distance_to_origin = obj.location.length
-        step_size = min(distance_to_origin / 10, 0.5)  # Dynamic step size
-        iterations = 0
-        max_iterations = 1000
-
-        while iterations < max_iterations:
-            obj.location += direction * step_size
-            bpy.context.view_layer.update()
-            current_obj_bbox = get_world_bounding_box_xy(obj)
-            collision = False
-
-            for other_obj_dict in object_bboxes:
-                other_obj = list(other_obj_dict.keys())[0]
-                other_bbox = other_obj_dict[other_obj]
+    objs = [list(obj_dict.keys())[0] for obj_dict in objects]
+    boxes = np.array(
+        [
+            np.concatenate([corners.min(axis=0), corners.max(axis=0)])
+            for corners in (get_world_bbox_corners(obj)[:, :2] for obj in objs)
+        ]
+    )
+    locations = bring_to_origin(np.array([obj.location[:] for obj in objs]), boxes)
 
-                if other_obj != obj and check_overlap_xy(current_obj_bbox, other_bbox):
-                    obj.location -= direction * step_size
-                    bpy.context.view_layer.update()
-                    collision = True
-                    break
+    for obj, (x, y, _) in zip(objs, locations):
+        obj.location.x = x
+        obj.location.y = y
+    bpy.context.view_layer.update()
 
-            if collision or (obj.location.x == 0 and obj.location.y == 0):
-                break
 
-            iterations += 1
-            distance_to_origin = obj.location.length
-            step_size = min(
-                distance_to_origin / 10, 0.5
-            )  # Update step size dynamically
+def apply_object_locations(objects: List[Dict[bpy.types.Object, Dict]]) -> None:
+    """Move objects to the locations planned for them by the combiner.
 
-        for bbox_dict in object_bboxes:
-            if list(bbox_dict.keys())[0] == obj:
-                bbox_dict[obj] = current_obj_bbox
-                break
+    Args:
+        objects (List[Dict[bpy.types.Object, Dict]]): List of object dictionaries, whose
+            object data holds a "location".
+    """
+    for obj_dict in objects:
+        obj = list(obj_dict.keys())[0]
+        obj.location = Vector(obj_dict[obj]["location"])
+        logger.info(f"Placed object {obj.name} at {obj.location}")
+    bpy.context.view_layer.update()
 
 
 def place_objects_on_grid(
@@ -362,77 +400,101 @@ def get_plane_dimensions(plane):
     return width, height
 
 
-def get_camera_plane_vertices(camera, frame_number):
-    scene = bpy.context.scene
-    depsgraph = bpy.context.evaluated_depsgraph_get()
-    cam_data = camera.data
+def intersect_frustums_with_plane(
+    camera_matrices: np.ndarray,
+    view_frames: np.ndarray,
+    plane_center: np.ndarray,
+    max_distance: float,
+) -> np.ndarray:
+    """Intersect the corner rays of camera frustums with a horizontal plane.
 
-    # Set the frame and update the scene
-    bpy.context.scene.frame_set(frame_number)
-    bpy.context.view_layer.update()
+    Each ray from the camera through a corner of its view frame meets the plane at the
+    distance that brings it down to the height of the plane. Rays that don't reach the
+    plane, or meet it further than `max_distance` from its center, are cut short at half
+    that distance from the camera and flattened onto the plane. All frames are solved at
+    once.
+
+    Args:
+        camera_matrices (np.ndarray): World matrices of the camera, of shape (f, 4, 4).
+        view_frames (np.ndarray): Corners of the view frame of the camera in camera space,
+            as returned by `view_frame`, of shape (f, 4, 3).
+        plane_center (np.ndarray): Location of the center of the plane.
+        max_distance (float): Distance from the center beyond which points are cut short.
+
+    Returns:
+        np.ndarray: The 4 points of each frame on the plane, of shape (f, 4, 3), ordered
+        like the corners of `view_frame` with the first two and last two swapped.
+    """
+    camera_matrices = np.asarray(camera_matrices, dtype=np.float64).reshape(-1, 4, 4)
+    view_frames = np.asarray(view_frames, dtype=np.float64).reshape(-1, 4, 3)
+    plane_center = np.asarray(plane_center, dtype=np.float64)
+
+    origins = camera_matrices[:, None, :3, 3]
+    corners = view_frames @ camera_matrices[:, :3, :3].transpose(0, 2, 1) + origins
+    directions = corners - origins
+    directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = (plane_center[2] - origins[..., 2]) / directions[..., 2]
+    hit = np.isfinite(distances) & (distances > 0)
+    points = origins + directions * np.where(hit, distances, 0)[..., None]
+    hit &= np.linalg.norm(points - plane_center, axis=-1) <= max_distance
 
-    cam_matrix_world = camera.matrix_world
+    # points off the plane are clamped to half the maximum distance
+    clamped = origins + directions * (max_distance / 2)
+    points = np.where(hit[..., None], points, clamped)
+    points[..., 2] = plane_center[2]
+    return points[:, [1, 0, 3, 2]]
 
-    # Log camera settings
-    # logger.info(f"Camera Focal Length: {cam_data.lens}")
-    # logger.info(f"Camera Sensor Width: {cam_data.sensor_width}")
-    # logger.info(f"Camera Sensor Height: {cam_data.sensor_height}")
-    # logger.info(f"Camera Aspect Ratio: {cam_data.sensor_width / cam_data.sensor_height}")
 
-    # Get the camera's frustum
-    frame = cam_data.view_frame(scene=scene)
+def get_camera_plane_vertices_at_frames(camera, frame_numbers):
+    """Get the corners of the camera view on the stage at several frames.
 
-    # Convert the frame coordinates to world coordinates
-    frame_world = [cam_matrix_world @ v for v in frame]
+    Args:
+        camera (bpy.types.Object): The camera.
+        frame_numbers (List[int]): The frames.
+
+    Returns:
+        np.ndarray: The 4 corners on the stage at each frame, of shape (f, 4, 3), or an
+        empty array if there is no stage.
+    """
+    scene = bpy.context.scene
 
     # Get the stage's position
     stage = bpy.data.objects.get("Stage")
     if not stage:
         logger.error("Stage object not found!")
-        return []
+        return np.empty((0, 4, 3))
+
+    # Get plane dimensions
+    plane_width, plane_height = get_plane_dimensions(stage)
+    max_distance = min(plane_width, plane_height) / 2  # Define a maximum reasonable distance based on plane size
+
+    camera_matrices = []
+    view_frames = []
+    for frame_number in frame_numbers:
+        # the camera rig and lens are animated
+        scene.frame_set(frame_number)
+        camera_matrices.append(np.array(camera.matrix_world))
+        view_frames.append([v[:] for v in camera.data.view_frame(scene=scene)])
+
+    return intersect_frustums_with_plane(
+        np.array(camera_matrices), np.array(view_frames), np.array(stage.location), max_distance
+    )
 
-    stage_position = stage.location
-    plane_point = stage_position
 
-    # Calculate intersection of rays with the plane
-    plane_vertices = []
-    for v in frame_world:
-        direction = v - cam_matrix_world.translation
-        direction.normalize()
+def get_camera_plane_vertices(camera, frame_number):
+    """Get the corners of the camera view on the stage at a frame.
 
-        result, location, normal, index, obj, matrix = scene.ray_cast(depsgraph, cam_matrix_world.translation, direction)
+    Args:
+        camera (bpy.types.Object): The camera.
+        frame_number (int): The frame.
 
-        # Get plane dimensions
-        plane_width, plane_height = get_plane_dimensions(stage)
-        max_distance = min(plane_width, plane_height) / 2  # Define a maximum reasonable distance based on plane size
-        
-        if result:
-            # Flatten Z value to the plane height if above it
-            if location.z > plane_point.z:
-                location.z = plane_point.z
-                logger.warning(f"Flattened location to plane height: {location}")
-
-            # Check if the location extends beyond the plane boundaries
-            if (location - stage_position).length > max_distance:
-                location = cam_matrix_world.translation + direction * (max_distance / 2)
-                location.z = plane_point.z
-                logger.warning(f"Clamped location to half the maximum distance: {location}")
-            else:
-                logger.info(f"Ray hit at: {location}")
-            
-            plane_vertices.append(location)
-        else:
-            # If the ray does not hit the plane, use a default position on the plane
-            intersection_point = cam_matrix_world.translation + direction * 10.0  # Adjust as needed
-            intersection_point.z = plane_point.z
-            logger.warning(f"Ray did not hit the plane, using default position: {intersection_point}")
-            plane_vertices.append(intersection_point)
-
-    # Ensure vertices form a rectangle
-    if len(plane_vertices) == 4:
-        plane_vertices = [plane_vertices[i] for i in [1, 0, 3, 2]]
-    else:
-        logger.warning(f"Expected 4 plane vertices, got {len(plane_vertices)}")
+    Returns:
+        List[Vector]: The 4 corners on the stage, empty if there is no stage.
+    """
+    vertices = get_camera_plane_vertices_at_frames(camera, [frame_number])
+    plane_vertices = [Vector(v) for frame in vertices for v in frame]
 
     logger.info(f"Plane vertices: {plane_vertices}")
     return plane_vertices
@@ -542,12 +604,18 @@ def apply_movement(objects, yaw, start_frame, end_frame):
         # Position object at initial location at the start frame
         scene.frame_set(start_frame)
         obj.location = obj.location + initial_position - offset
-        obj.keyframe_insert(data_path="location", frame=start_frame)
 
-        # Animate object from start_frame to end_frame
-        for frame in range(start_frame + 1, end_frame + 1):
-            obj.location += step_vector
-            obj.keyframe_insert(data_path="location", frame=frame)
+        # Animate object from start_frame to end_frame, one step per frame. The motion
+        # is linear, so two linear keys hold it for any clip length
+        start_location = np.array(obj.location[:])
+        end_location = start_location + np.array(step_vector[:]) * (end_frame - start_frame)
+        set_keyframes(
+            obj,
+            "location",
+            [start_frame, end_frame],
+            [start_location, end_location],
+            interpolation="LINEAR",
+        )
 
     logger.info(f"Movement applied from frame {start_frame} to {end_frame}")
     bpy.context.view_layer.update()
@@ -1,10 +1,11 @@
-import json
 import logging
 import os
 import sys
-import subprocess
 import time
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from .prefetch import Prefetcher
+from .render_server import RenderServer
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -19,6 +20,8 @@ def run_job(
     hdri_path: str,
     start_frame: int = 0,
     end_frame: int = 65,
+    prefetch: int = 8,
+    max_bandwidth: Optional[float] = None,
 ) -> None:
     """
     Run a rendering job with the specified combination index and settings.
@@ -32,34 +35,51 @@ def run_job(
         hdri_path (str): The path to the HDRI file.
         start_frame (int, optional): The starting frame number. Defaults to 0.
         end_frame (int, optional): The ending frame number. Defaults to 65.
+        prefetch (int, optional): Number of combinations whose assets are downloaded
+            ahead of the render. 0 disables prefetching. Defaults to 8.
+        max_bandwidth (Optional[float], optional): Cap of the prefetch download rate in
+            bytes per second. Defaults to None, unlimited.
 
     Returns:
         None
     """
-    combination_strings = []
-    for combo in combinations:
-        combination_string = json.dumps(combo)
-        combination_string = '"' + combination_string.replace('"', '\\"') + '"'
-        combination_strings.append(combination_string)
-
     # create output directory, add time to name so each new directory is unique
     output_dir += str(time.time())
     os.makedirs(output_dir, exist_ok=True)
 
-    # render images in batches (batches to handle rate limiting of uploads)
-    batch_size = len(combination_indeces)
-    for i in range(batch_size):
-
-        args = f" --width {width} --height {height} --combination_index {combination_indeces[i]}"
-        args += f" --output_dir {output_dir}"
-        args += f" --hdri_path {hdri_path}"
-        args += f" --start_frame {start_frame} --end_frame {end_frame}"
-        args += f" --combination {combination_strings[i]}"
-
-        command = f"{sys.executable} -m simian.render -- {args}"
-        logger.info(f"Worker running simian.render")
-
-        subprocess.run(["bash", "-c", command], check=True)
+    server_args = [
+        "--width", str(width),
+        "--height", str(height),
+        "--output_dir", output_dir,
+        "--hdri_path", hdri_path,
+        "--start_frame", str(start_frame),
+        "--end_frame", str(end_frame),
+    ]
+
+    # download the assets of the next combinations while the current one renders
+    prefetcher = None
+    if prefetch > 0:
+        prefetcher = Prefetcher(
+            combinations, range(len(combinations)), prefetch, max_bandwidth, hdri_path
+        )
+
+    # render the whole batch on one render server so bpy is only loaded once
+    try:
+        with RenderServer(server_args) as render_server:
+            for combination_index, combination in zip(combination_indeces, combinations):
+                logger.info(f"Worker rendering combination {combination_index}")
+                if prefetcher is not None:
+                    prefetcher.mark_started()
+                result = render_server.render(
+                    {"combination_index": combination_index, "combination": combination}
+                )
+                if result["status"] != "done":
+                    raise RuntimeError(
+                        f"Rendering combination {combination_index} failed: {result['error']}"
+                    )
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
 
     distributaur.upload_directory(output_dir)
 